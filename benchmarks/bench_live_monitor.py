@@ -0,0 +1,64 @@
+"""
+Benchmark: live AR/CAR monitoring on a replayed bar feed.
+
+Builds a synthetic history and feed (no data files needed) and reports
+bars/sec and the cost per event update for a growing number of open
+events; the per-update cost should stay flat.
+    python benchmarks/bench_live_monitor.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+N_TICKERS = 50
+HISTORY_DAYS = 300
+FEED_DAYS = 60
+EVENTS_PER_TICKER = (1, 10, 100)
+
+
+def synthetic_prices(n_tickers, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_days)
+    market = rng.normal(0.0, 0.01, n_days)
+    frames = [pd.DataFrame({"date": dates, "ticker": "SP500", "adj_close": 100 * np.cumprod(1 + market)})]
+    for i in range(n_tickers):
+        r = rng.normal(0.0, 0.01) / 100 + rng.uniform(0.5, 1.5) * market + rng.normal(0.0, 0.015, n_days)
+        frames.append(pd.DataFrame({"date": dates, "ticker": f"T{i:03d}", "adj_close": 50 * np.cumprod(1 + r)}))
+    prices = pd.concat(frames, ignore_index=True).sort_values(["ticker", "date"], ignore_index=True)
+    prices["return"] = prices.groupby("ticker")["adj_close"].pct_change()
+    prices["market_return"] = prices["date"].map(prices[prices["ticker"] == "SP500"].set_index("date")["return"])
+    return prices
+
+
+def main():
+    from eventstudy.features.live_monitor import LiveMonitor, replay_benchmark
+
+    prices = synthetic_prices(N_TICKERS, HISTORY_DAYS + FEED_DAYS)
+    cut = np.sort(prices["date"].unique())[HISTORY_DAYS - 1]
+    history, feed = prices[prices["date"] <= cut], prices[prices["date"] > cut]
+    feed_dates = np.sort(feed["date"].unique())
+    tickers = [t for t in history["ticker"].unique() if t != "SP500"]
+
+    print(f"Feed: {len(feed)} bars, {N_TICKERS} tickers x {FEED_DAYS} days\n")
+    for per_ticker in EVENTS_PER_TICKER:
+        rng = np.random.default_rng(per_ticker)
+        events = pd.DataFrame({
+            "event_id": [f"{t}_{k}" for t in tickers for k in range(per_ticker)],
+            "ticker": np.repeat(tickers, per_ticker),
+            "event_date": rng.choice(feed_dates[5:-10], len(tickers) * per_ticker),
+        })
+        monitor = LiveMonitor.from_history(history, events, window=(-5, 5), sink=lambda update: None)
+        stats = replay_benchmark(monitor, feed)
+        print(f"{len(events):>6} events: {stats['bars_per_sec']:>10,.0f} bars/sec  "
+              f"{stats['updates']:>8} updates  "
+              f"{1e6 * stats['seconds'] / max(stats['updates'], 1):.2f} us/update")
+
+
+if __name__ == "__main__":
+    main()
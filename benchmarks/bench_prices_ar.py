@@ -0,0 +1,60 @@
+"""
+Benchmark: row-wise vs vectorized abnormal-return computation.
+
+Runs on data/processed/prices_with_returns.csv and reports rows/sec.
+    python benchmarks/bench_prices_ar.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+
+def compute_prices_ar_rowwise(prices, ab_table):
+    """Original implementation: one dict lookup per price row"""
+    prices["expected_return"] = prices.apply(
+        lambda r: ab_table[r["ticker"]]["alpha"] + ab_table[r["ticker"]]["beta"] * r["market_return"]
+        if pd.notnull(r["market_return"]) and ab_table[r["ticker"]]["alpha"] is not None else None,
+        axis=1
+    )
+    prices["AR"] = prices["return"] - prices["expected_return"]
+    return prices
+
+
+def time_it(func, prices, ab_table, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        df = prices.copy()
+        start = time.perf_counter()
+        out = func(df, ab_table)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    from eventstudy.features import compute_ar_car
+
+    prices = compute_ar_car.load_prices()
+    ab_table = compute_ar_car.build_alpha_beta_table(prices)
+    n = len(prices)
+
+    t_row, out_row = time_it(compute_prices_ar_rowwise, prices, ab_table, repeat=1)
+    t_vec, out_vec = time_it(compute_ar_car.compute_prices_ar, prices, ab_table, repeat=20)
+
+    diff = np.nanmax(np.abs(out_row["AR"].astype(float) - out_vec["AR"]))
+
+    print(f"\nRows: {n}")
+    print(f"Row-wise apply : {t_row:.4f}s  ({n / t_row:,.0f} rows/sec)")
+    print(f"Vectorized     : {t_vec:.4f}s  ({n / t_vec:,.0f} rows/sec)")
+    print(f"Speedup        : {t_row / t_vec:,.1f}x")
+    print(f"Max |AR diff|  : {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
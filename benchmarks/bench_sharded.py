@@ -0,0 +1,123 @@
+"""
+Benchmark: sharded per-ticker stages on a process pool.
+
+Builds a synthetic universe (no data files needed) and times returns,
+alpha/beta, ticker context, event alignment and the event CARs for a
+growing number of jobs, checking every run against the one-job result.
+Every job count reports its speedup over one job and its efficiency
+(speedup / jobs), per stage and in total. By default the job counts go up
+to the machine's core count; --jobs runs the given counts (more jobs than
+cores only measures the pool overhead).
+    python benchmarks/bench_sharded.py
+    python benchmarks/bench_sharded.py --jobs 1 2 4 8 16 32
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+N_TICKERS = 500
+N_DAYS = 2520
+EVENTS_PER_TICKER = 20
+JOBS = (1, 2, 4, 8, 16)
+
+
+def synthetic_universe(n_tickers, n_days, events_per_ticker, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2010-01-01", periods=n_days)
+    market = rng.normal(0.0, 0.01, n_days)
+    frames = [pd.DataFrame({"date": dates, "ticker": "SP500", "adj_close": 100 * np.cumprod(1 + market)})]
+    for i in range(n_tickers):
+        r = rng.uniform(0.5, 1.5) * market + rng.normal(0.0, 0.015, n_days)
+        start = rng.integers(0, n_days // 2)    # uneven history lengths
+        frames.append(pd.DataFrame({
+            "date": dates[start:], "ticker": f"T{i:03d}", "adj_close": 50 * np.cumprod(1 + r)[start:],
+        }))
+    prices = pd.concat(frames, ignore_index=True)
+
+    tickers = [f"T{i:03d}" for i in range(n_tickers)]
+    events = pd.DataFrame({
+        "event_id": [f"{t}_{k}" for t in tickers for k in range(events_per_ticker)],
+        "ticker": np.repeat(tickers, events_per_ticker),
+        "date": rng.choice(dates[n_days // 2:], n_tickers * events_per_ticker),
+    })
+    return prices, events
+
+
+def run_stages(prices, events, jobs):
+    """The per-ticker stages end to end; returns (events, ticker context, seconds per stage)"""
+    from eventstudy.features.car_into_label import add_car_windows
+    from eventstudy.features.compute_ar_car import (
+        build_alpha_beta_table,
+        compute_events_car,
+    )
+    from eventstudy.features.compute_returns import add_market_returns, add_returns
+    from eventstudy.features.market_context import build_ticker_context
+    from eventstudy.features.merge_event_returns import attach_trading_days
+
+    seconds = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        prices = add_market_returns(add_returns(prices, jobs=jobs))
+        seconds["returns"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_alpha_beta_table(prices, jobs=jobs)
+        seconds["alpha_beta"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        context = build_ticker_context(prices, jobs=jobs)
+        seconds["context"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        merged, _ = attach_trading_days(events, prices, jobs=jobs)
+        seconds["align"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        merged = compute_events_car(merged, prices, jobs=jobs)
+        merged = add_car_windows(merged, prices, jobs=jobs)
+        seconds["car"] = time.perf_counter() - start
+    return merged, context, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the sharded stages for several job counts.")
+    parser.add_argument("--jobs", type=int, nargs="+", help="job counts to run (default: up to the cores)")
+    args = parser.parse_args()
+
+    prices, events = synthetic_universe(N_TICKERS, N_DAYS, EVENTS_PER_TICKER)
+    cores = os.cpu_count() or 1
+    job_counts = sorted({1, *args.jobs}) if args.jobs else [j for j in JOBS if j <= cores]
+    print(f"Universe: {N_TICKERS} tickers, {len(prices):,} price rows, {len(events):,} events, {cores} cores\n")
+
+    baseline, base_context, base_seconds = None, None, None
+    for jobs in job_counts:
+        merged, context, seconds = run_stages(prices, events, jobs)
+        seconds["total"] = sum(seconds.values())
+        if baseline is None:
+            baseline, base_context, base_seconds = merged, context, seconds
+        else:
+            cols = ["alpha", "beta", "CAR_m1_p1", "CAR_m5_p5", "CAR_0_5"]
+            assert merged["event_id"].tolist() == baseline["event_id"].tolist()
+            np.testing.assert_allclose(merged[cols], baseline[cols], rtol=1e-12)
+            pd.testing.assert_frame_equal(context, base_context)
+
+        note = f" (oversubscribed: {cores} cores)" if jobs > cores else ""
+        print(f"{jobs:>3} jobs{note}")
+        for name, s in seconds.items():
+            speedup = base_seconds[name] / s
+            print(f"    {name:<10} {s:7.2f}s  speedup {speedup:5.2f}x  efficiency {speedup / jobs:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
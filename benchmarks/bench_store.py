@@ -0,0 +1,84 @@
+"""
+Benchmark: legacy CSV hand-offs vs the columnar Parquet/Arrow store.
+
+Converts every processed CSV into a temporary store and compares load time
+(including the date parsing / ticker normalization the stages used to
+redo) and disk footprint.
+    python benchmarks/bench_store.py
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+TABLES = [
+    "prices_long",
+    "prices_with_returns",
+    "prices_with_ar",
+    "events_with_returns",
+    "events_with_car",
+    "events_labeled",
+]
+
+
+def best_of(func, *args, repeat=5, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_csv_legacy(path, sep):
+    """What every stage did: parse CSV, then re-parse dates and tickers"""
+    from eventstudy.data import store
+
+    df = pd.read_csv(path, sep=sep)
+    for col in store.DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    if "ticker" in df.columns:
+        df["ticker"] = df["ticker"].astype(str).str.upper()
+    return df
+
+
+def main():
+    from eventstudy.data import store
+
+    src = store.DATA_PROCESSED
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'table':<22}{'csv KB':>10}{'pq KB':>10}{'csv ms':>10}{'pq ms':>10}{'arrow ms':>10}")
+        for name in TABLES:
+            csv_path = src / f"{name}.csv"
+            if not csv_path.exists():
+                continue
+            sep = store.csv_sep(name)
+
+            df = load_csv_legacy(csv_path, sep)
+            pq_path = store.write_table(df, name, root=tmp, csv=False)
+            arrow_path = store.write_table(df, name + "_ipc", root=tmp, fmt="arrow", csv=False)
+
+            t_csv = best_of(load_csv_legacy, csv_path, sep)
+            t_pq = best_of(store.read_table, name, root=tmp)
+            t_arrow = best_of(store.read_table, name + "_ipc", root=tmp, memory_map=True)
+
+            print(
+                f"{name:<22}"
+                f"{csv_path.stat().st_size / 1024:>10.0f}"
+                f"{Path(pq_path).stat().st_size / 1024:>10.0f}"
+                f"{t_csv * 1000:>10.1f}"
+                f"{t_pq * 1000:>10.1f}"
+                f"{t_arrow * 1000:>10.1f}"
+            )
+            Path(arrow_path).unlink()
+
+
+if __name__ == "__main__":
+    main()
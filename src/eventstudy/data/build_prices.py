@@ -1,95 +1,167 @@
 """
 Build merged stock prices from multiple sources.
+
+The ticker universe is declared in PRICE_SOURCES (or data/raw/universe.json,
+same format): each entry is a glob pattern relative to data/raw plus
+optional tickers / exclude filters. Every matching file is parsed by the
+same generic reader:
+
+- wide CSVs: a date column followed by one column per ticker
+- yfinance single-ticker CSVs (Price / Ticker / Date header rows)
+- long store tables (date, ticker, adj_close), e.g. the fetcher's bars
+
+Files are parsed in parallel and the long and wide panels come out of a
+single sort.
 """
 
-import pandas as pd
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from ..sharded import parse_jobs
+from .store import read_table, write_table
+
 # Get the project root directory (go up 3 folders from this file)
 BASE_DIR = Path(__file__).resolve().parents[3]
 
 DATA_RAW = BASE_DIR / "data" / "raw"
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
+UNIVERSE_FILE = DATA_RAW / "universe.json"
 
-print(f"Looking for data in: {DATA_RAW}")
-print(f"Data raw exists: {DATA_RAW.exists()}")
-
-
-def load_ea():
-    path = DATA_RAW / "EA_2010_2025.csv"
-    df = pd.read_csv(path, skiprows=3, header=None, names=['date', 'adj_close'])
-    df["date"] = pd.to_datetime(df["date"])
-    df["ticker"] = "EA"
-    return df[["date", "ticker", "adj_close"]]
-
-
-def load_ttwo():
-    """TTWO has normal headers - use them"""
-    path = DATA_RAW / "TTWO_2010_2025.csv"
-    df = pd.read_csv(path, skiprows=3, header=None, names=['date', 'adj_close'])
-    df = df.rename(columns={"Date": "date", "Adj Close": "adj_close"})
-    df["date"] = pd.to_datetime(df["date"])
-    df["ticker"] = "TTWO"
-    return df[["date", "ticker", "adj_close"]]
-
-
-def load_gamestocks():
-    """GameStocks has normal headers"""
-    path = DATA_RAW / "GameStocks_SP500_2010_2025.csv"
-    df = pd.read_csv(path)
-    df["Date"] = pd.to_datetime(df["Date"])
-    
-    # Skip EA column (it's empty), use only: ATVI, UBSFY, NTDOY, ^GSPC
-    long_df = df.melt(
-        id_vars=["Date"],
-        value_vars=["ATVI", "UBSFY", "NTDOY", "^GSPC"],  # Removed EA
-        var_name="ticker",
-        value_name="adj_close",
-    )
-    long_df = long_df.rename(columns={"Date": "date"})
-    return long_df
+PRICE_SOURCES = [
+    {"pattern": "TTWO_2010_2025.csv"},
+    {"pattern": "EA_2010_2025.csv"},
+    # The EA column of this file is empty, EA comes from its own file
+    {"pattern": "GameStocks_SP500_2010_2025.csv", "exclude": ["EA"]},
+]
+
+CSV_ENGINE = "pyarrow"
+MAX_WORKERS = 8
+
+
+# === DISCOVERY ============================================================= #
+
+def load_universe(path=UNIVERSE_FILE):
+    """Source entries from universe.json if present, else PRICE_SOURCES"""
+    if Path(path).exists():
+        return json.loads(Path(path).read_text())
+    return PRICE_SOURCES
+
+
+def discover(sources, root=DATA_RAW):
+    """(path, entry) pairs for every file matched by the source entries"""
+    found, seen = [], set()
+    for entry in sources:
+        for path in sorted(Path(root).glob(entry["pattern"])):
+            if path not in seen:
+                seen.add(path)
+                found.append((path, entry))
+    return found
+
+
+def price_files(root=DATA_RAW):
+    """Raw files the price panel is built from (plus the universe config)"""
+    files = [path for path, _ in discover(load_universe(), root)]
+    if UNIVERSE_FILE.exists():
+        files.append(UNIVERSE_FILE)
+    return files
+
+
+# === PARSING =============================================================== #
+
+def read_header(path, n=3):
+    with open(path, encoding="utf-8-sig") as f:
+        return [f.readline().rstrip("\r\n").split(",") for _ in range(n)]
 
 
-def build_prices():
-    ttwo = load_ttwo()
-    ea = load_ea()
-    gs = load_gamestocks()
+def read_price_file(path, entry=None):
+    """Parse any supported price file into long format (date, ticker, adj_close)"""
+    entry = entry or {}
+    path = Path(path)
 
-    prices = pd.concat([ttwo, ea, gs], ignore_index=True)
+    if path.suffix in (".parquet", ".arrow"):
+        long_df = read_table(path.stem, path.parent, columns=["date", "ticker", "adj_close"])
+        long_df["ticker"] = long_df["ticker"].astype(str)
+    else:
+        header = read_header(path)
+        if header[1][0] == "Ticker":
+            # yfinance layout: Price / Ticker / Date rows before the data
+            names, skiprows = ["date", *header[1][1:]], 3
+        else:
+            names, skiprows = ["date", *header[0][1:]], 1
 
-    # clean tickers
+        wide = pd.read_csv(
+            path, skiprows=skiprows, header=None, names=names, engine=CSV_ENGINE,
+        )
+        wide = wide.dropna(axis=1, how="all")
+        long_df = wide.melt(id_vars=["date"], var_name="ticker", value_name="adj_close")
+
+    if "tickers" in entry:
+        long_df = long_df[long_df["ticker"].isin(entry["tickers"])]
+    if "exclude" in entry:
+        long_df = long_df[~long_df["ticker"].isin(entry["exclude"])]
+
+    long_df["date"] = pd.to_datetime(long_df["date"])
+    return long_df[["date", "ticker", "adj_close"]]
+
+
+def read_all(files, max_workers=MAX_WORKERS):
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(lambda f: read_price_file(*f), files))
+    return pd.concat(frames, ignore_index=True)
+
+
+# === PANELS ================================================================ #
+
+def build_panels(prices):
+    """
+    Long panel sorted by (ticker, date) and the date x ticker wide panel,
+    from one sort. Duplicate (ticker, date) rows keep the first source.
+    """
+    prices = prices.copy()
     prices["ticker"] = prices["ticker"].str.upper()
-    prices = prices.sort_values(["date", "ticker"]).reset_index(drop=True)
 
-    # Long Format
-    prices_long = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
-    
+    codes, _ = pd.factorize(prices["ticker"], sort=True)
+    order = np.lexsort((prices["date"].to_numpy(), codes))
+    prices_long = prices.iloc[order].drop_duplicates(["ticker", "date"]).reset_index(drop=True)
+
+    # Already (ticker, date)-sorted, so unstacking needs no further sort
+    prices_wide = (
+        prices_long.set_index(["date", "ticker"])["adj_close"]
+        .unstack("ticker")
+        .reset_index()
+    )
+    prices_wide.columns.name = "ticker"
+    return prices_long, prices_wide
+
+
+def build_prices(max_workers=MAX_WORKERS):
+    files = discover(load_universe())
+    if not files:
+        raise FileNotFoundError(f"No price files matched the universe in {DATA_RAW}")
+    print(f"Parsing {len(files)} price file(s)...")
+
+    prices_long, prices_wide = build_panels(read_all(files, max_workers))
+
     DATA_PROCESSED.mkdir(parents=True, exist_ok=True)
-    out_long = DATA_PROCESSED / "prices_long.csv"
-    prices_long.to_csv(out_long, index=False)
+    out_long = write_table(prices_long, "prices_long")
     print(f"✅ Saved long format: {out_long}")
     print(f"   Shape: {prices_long.shape}")
     print(f"   Columns: {prices_long.columns.tolist()}")
 
-    # Convert from long to wide format
-    prices_wide = prices.pivot_table(
-        index="date",
-        columns="ticker",
-        values="adj_close",
-        aggfunc="first"  # In case of duplicates, take the first value
-    )
-    
-    # Reset index to make date a column
-    prices_wide = prices_wide.reset_index()
-    
-    # Sort by date
-    prices_wide = prices_wide.sort_values("date").reset_index(drop=True)
-
-    DATA_PROCESSED.mkdir(parents=True, exist_ok=True)
-    out = DATA_PROCESSED / "prices_wide.csv"
-    prices_wide.to_csv(out, index=False)
+    out = write_table(prices_wide, "prices_wide")
     print(f"✅ Saved: {out}")
+    print(f"   Tickers: {prices_wide.shape[1] - 1}")
+
+
+def main():
+    print(f"Looking for data in: {DATA_RAW}")
+    print(f"Data raw exists: {DATA_RAW.exists()}")
+    build_prices(parse_jobs(default=MAX_WORKERS))
 
 
 if __name__ == "__main__":
-    build_prices()
\ No newline at end of file
+    main()
@@ -1,88 +1,158 @@
 """
-Clean video game sales data for analysis. 
+Clean video game sales data for analysis.
 Keep only games from 2013 onwards and specific publishers.
                                     vgsales.csv
+
+The raw dump is streamed in chunks: only the needed columns are parsed,
+with compact dtypes (categorical publisher/platform, float32 sales), the
+filters run per chunk and every chunk is written as one part of the
+partitioned vgsales_cleaned table. Peak memory is one chunk, whatever the
+size of the input (vgsales.csv or the much larger VGChartz dump).
 """
 
-import pandas as pd
 from pathlib import Path
 
+import pandas as pd
+
+from ..sharded import warn_serial
+from .store import DATA_PROCESSED, clear_table, write_partition
+
 # Setup paths
 project_root = Path(__file__).parent.parent.parent.parent
 raw_file = project_root / "data" / "raw" / "vgsales.csv"
-output_file = project_root / "data" / "processed" / "vgsales_cleaned.csv"
-
-# Load the data
-print("Loading vgsales.csv...")
-df = pd.read_csv(raw_file)
-
-print(f"\n{'='*60}")
-print("ORIGINAL DATA")
-print(f"{'='*60}")
-print(f"Total games: {len(df)}")
-print(f"Year range: {df['Year'].min()} to {df['Year'].max()}")
-print(f"Columns: {df.columns.tolist()}")
-
-# STEP 1: Filter by year (2013 onwards)
-print(f"\n{'='*60}")
-print("STEP 1: Filtering by Year >= 2013")
-print(f"{'='*60}")
-df_filtered = df[df['Year'] >= 2013].copy()
-print(f"Games after 2013 filter: {len(df_filtered)}")
-
-# STEP 2: Filter by publishers
-print(f"\n{'='*60}")
-print("STEP 2: Filtering by Publishers")
-print(f"{'='*60}")
-publishers = ['Take-Two Interactive', 'Ubisoft', 'Activision', 'Nintendo', 'Electronic Arts']
-print(f"Keeping only: {publishers}")
-
-df_filtered = df_filtered[df_filtered['Publisher'].isin(publishers)].copy()
-print(f"Games from target publishers: {len(df_filtered)}")
-
-# STEP 3: Keep only relevant columns
-print(f"\n{'='*60}")
-print("STEP 3: Selecting Columns")
-print(f"{'='*60}")
-print("Keeping: Name, Year, Publisher, Global_Sales")
-
-columns_to_keep = ['Name', 'Year', 'Publisher', 'Global_Sales']
-df_cleaned = df_filtered[columns_to_keep].copy()
-
-# STEP 4: Remove any rows with missing data
-print(f"\n{'='*60}")
-print("STEP 4: Removing Missing Values")
-print(f"{'='*60}")
-print(f"Missing values before:\n{df_cleaned.isnull().sum()}")
-
-df_cleaned = df_cleaned.dropna()
-
-print(f"\nMissing values after: {df_cleaned.isnull().sum().sum()}")
-print(f"Games remaining: {len(df_cleaned)}")
-
-# STEP 5: Summary statistics
-print(f"\n{'='*60}")
-print("CLEANED DATA SUMMARY")
-print(f"{'='*60}")
-print(f"\nTotal games: {len(df_cleaned)}")
-print(f"Year range: {df_cleaned['Year'].min()} to {df_cleaned['Year'].max()}")
-print(f"\nGames by Publisher:")
-print(df_cleaned['Publisher'].value_counts())
-print(f"\nGlobal Sales Statistics:")
-print(df_cleaned['Global_Sales'].describe())
-
-# STEP 6: Save cleaned data
-print(f"\n{'='*60}")
-print("SAVING CLEANED DATA")
-print(f"{'='*60}")
-output_file.parent.mkdir(parents=True, exist_ok=True)
-df_cleaned.to_csv(output_file, index=False)
-print(f"✅ Saved to: {output_file}")
-
-# Show sample
-print(f"\n{'='*60}")
-print("SAMPLE OF CLEANED DATA (first 10 rows)")
-print(f"{'='*60}")
-print(df_cleaned.head(10))
-
-
+OUTPUT_TABLE = "vgsales_cleaned"
+
+MIN_YEAR = 2013
+PUBLISHERS = ['Take-Two Interactive', 'Ubisoft', 'Activision', 'Nintendo', 'Electronic Arts']
+# Platform keeps per-platform rows distinguishable for sales aggregation
+COLUMNS_TO_KEEP = ['Name', 'Platform', 'Year', 'Publisher', 'Global_Sales']
+CHUNK_ROWS = 200_000
+
+# Column names of other dumps (VGChartz 2024) mapped to the vgsales ones
+COLUMN_ALIASES = {
+    'title': 'Name',
+    'console': 'Platform',
+    'publisher': 'Publisher',
+    'total_sales': 'Global_Sales',
+    'release_date': 'Year',
+}
+READ_DTYPES = {'Platform': 'category', 'Publisher': 'category', 'Global_Sales': 'float32'}
+
+
+def section(title):
+    print(f"\n{'='*60}")
+    print(title)
+    print(f"{'='*60}")
+
+
+# === LOAD ================================================================== #
+
+def resolve_columns(path=raw_file, aliases=COLUMN_ALIASES, columns=COLUMNS_TO_KEEP):
+    """Source column -> vgsales column for every column to keep (header only)"""
+    header = pd.read_csv(path, nrows=0).columns
+    rename = {c: aliases.get(c, c) for c in header if aliases.get(c, c) in columns}
+    missing = set(columns) - set(rename.values())
+    if missing:
+        raise ValueError(f"{Path(path).name} has no column for: {sorted(missing)}")
+    return rename
+
+
+def read_chunks(path=raw_file, chunk_rows=CHUNK_ROWS):
+    """Chunks of the needed columns only, renamed to the vgsales names"""
+    rename = resolve_columns(path)
+    dtypes = {src: READ_DTYPES[dst] for src, dst in rename.items() if dst in READ_DTYPES}
+    reader = pd.read_csv(path, usecols=list(rename), dtype=dtypes, chunksize=chunk_rows)
+    for chunk in reader:
+        yield chunk.rename(columns=rename)
+
+
+def parse_year(values):
+    """Release year as float32; accepts years or full dates (VGChartz)"""
+    year = pd.to_numeric(values, errors="coerce")
+    if year.isna().all() and values.notna().any():
+        year = pd.to_datetime(values, errors="coerce").dt.year
+    return year.astype("float32")
+
+
+# === CLEAN ================================================================= #
+
+def clean_vgsales(df, min_year=MIN_YEAR, publishers=PUBLISHERS):
+    """Year, publisher and missing-value filters as one mask, one copy"""
+    year = parse_year(df['Year'])
+    keep = (year >= min_year) & df['Publisher'].isin(publishers)
+    keep &= df[COLUMNS_TO_KEEP].notna().all(axis=1)
+
+    df_cleaned = df.loc[keep, COLUMNS_TO_KEEP].assign(Year=year[keep].astype('int16'))
+    # Same categories in every chunk, so the parts share one schema
+    df_cleaned['Publisher'] = df_cleaned['Publisher'].cat.set_categories(publishers)
+    return df_cleaned
+
+
+def output_schema():
+    import pyarrow as pa
+
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('Name', pa.string()),
+        ('Platform', categorical),
+        ('Year', pa.int16()),
+        ('Publisher', categorical),
+        ('Global_Sales', pa.float32()),
+    ])
+
+
+def stream_clean(path=raw_file, name=OUTPUT_TABLE, min_year=MIN_YEAR,
+                 publishers=PUBLISHERS, chunk_rows=CHUNK_ROWS, root=DATA_PROCESSED):
+    """
+    Clean the dump chunk by chunk into the partitioned table `name`.
+    Returns running statistics (rows read/kept, years, per-publisher counts).
+    """
+    schema = output_schema()
+    clear_table(name, root)
+
+    stats = {'rows': 0, 'kept': 0, 'min_year': None, 'max_year': None,
+             'by_publisher': pd.Series(0, index=publishers), 'sales': 0.0, 'sample': None}
+    for part, chunk in enumerate(read_chunks(path, chunk_rows)):
+        cleaned = clean_vgsales(chunk, min_year, publishers)
+        write_partition(cleaned, name, part, root, schema=schema)
+
+        stats['rows'] += len(chunk)
+        stats['kept'] += len(cleaned)
+        if len(cleaned):
+            lo, hi = int(cleaned['Year'].min()), int(cleaned['Year'].max())
+            stats['min_year'] = lo if stats['min_year'] is None else min(stats['min_year'], lo)
+            stats['max_year'] = hi if stats['max_year'] is None else max(stats['max_year'], hi)
+            stats['by_publisher'] += cleaned['Publisher'].value_counts().reindex(publishers)
+            stats['sales'] += float(cleaned['Global_Sales'].sum())
+            if stats['sample'] is None:
+                stats['sample'] = cleaned.head(10)
+    return stats
+
+
+def summarize(stats):
+    section("CLEANED DATA SUMMARY")
+    print(f"\nRows read: {stats['rows']}")
+    print(f"Games kept: {stats['kept']}")
+    print(f"Year range: {stats['min_year']} to {stats['max_year']}")
+    print("\nGames by Publisher:")
+    print(stats['by_publisher'].sort_values(ascending=False))
+    print(f"\nGlobal Sales total: {stats['sales']:.2f}M")
+
+
+# === MAIN ================================================================== #
+
+def main():
+    warn_serial("clean_vgsales")
+    section(f"STREAMING {raw_file.name} (Year >= {MIN_YEAR}, {len(PUBLISHERS)} publishers)")
+    print(f"Keeping: {', '.join(COLUMNS_TO_KEEP)}")
+    stats = stream_clean()
+    summarize(stats)
+    print(f"✅ Saved to: {DATA_PROCESSED / OUTPUT_TABLE}")
+
+    # Show sample
+    section("SAMPLE OF CLEANED DATA (first 10 rows)")
+    print(stats['sample'])
+
+
+if __name__ == "__main__":
+    main()
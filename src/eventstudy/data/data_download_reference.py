@@ -1,71 +1,99 @@
-import yfinance as yf
+"""
+Reference script for downloading the raw price and sales data.
+yfinance and kagglehub are only imported when a download actually runs.
+For routine refreshes use eventstudy.data.fetcher, which only pulls new bars.
+"""
+
 import pandas as pd
 from pathlib import Path
 
 # Setup path
 BASE_DIR = Path(__file__).resolve().parents[3]
 data_dir = BASE_DIR / "data" / "raw"
-data_dir.mkdir(parents=True, exist_ok=True)
 
-print(f"📁 Saving to: {data_dir}\n")
+START = "2010-01-01"
+END = "2025-11-15"
+GAME_TICKERS = ["EA", "ATVI", "UBSFY", "NTDOY", "^GSPC"]
+KAGGLE_DATASETS = [
+    "patkle/video-game-sales-data-from-vgchartzcom",
+    "anandshaw2001/video-game-sales",
+]
 
-# ============================================================
-# TTWO
-# ============================================================
-print("Downloading TTWO...")
-data = yf.download("TTWO", start="2010-01-01", end="2025-11-15", progress=False)
-data = data[["Close"]].rename(columns={"Close": "Adj Close"})
-data.to_csv(data_dir / "TTWO_2010_2025.csv", index=True)
-print(f"✅ Saved: TTWO_2010_2025.csv\n")
 
 # ============================================================
-# Game Stocks
+# Prices (yfinance)
 # ============================================================
-print("Downloading game stocks...")
-tickers = ["EA", "ATVI", "UBSFY", "NTDOY", "^GSPC"]
-data = yf.download(tickers, start="2010-01-01", end="2025-11-15", progress=False)
-if isinstance(data.columns, pd.MultiIndex):
-    data = data["Close"]
-data.columns = tickers
-data.to_csv(data_dir / "GameStocks_SP500_2010_2025.csv", index=True)
-print(f"✅ Saved: GameStocks_SP500_2010_2025.csv\n")
 
-# ============================================================
-# EA
-# ============================================================
-print("Downloading EA...")
-df = yf.download("EA", start="2010-01-01", end="2025-11-15", progress=False)
-df = df[["Close"]].rename(columns={"Close": "Adj Close"})
-df.to_csv(data_dir / "EA_2010_2025.csv", index=True)
-print(f"✅ Saved: EA_2010_2025.csv\n")
+def download_single(ticker, filename):
+    """Download one ticker's close as an 'Adj Close' column"""
+    import yfinance as yf
+
+    print(f"Downloading {ticker}...")
+    data = yf.download(ticker, start=START, end=END, progress=False)
+    data = data[["Close"]].rename(columns={"Close": "Adj Close"})
+    data.to_csv(data_dir / filename, index=True)
+    print(f"✅ Saved: {filename}\n")
+
+
+def download_game_stocks(tickers=GAME_TICKERS, filename="GameStocks_SP500_2010_2025.csv"):
+    import yfinance as yf
+
+    print("Downloading game stocks...")
+    data = yf.download(tickers, start=START, end=END, progress=False)
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data["Close"]
+    data.columns = tickers
+    data.to_csv(data_dir / filename, index=True)
+    print(f"✅ Saved: {filename}\n")
+
+
+def download_vix(filename="VIX_2010_2025.csv"):
+    import yfinance as yf
+
+    print("Downloading VIX...")
+    df = yf.download("^VIX", start=START, end=END, progress=False)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df["Close"]
+    else:
+        df = df[["Close"]]
+    df = df.rename(columns={"Close": "VIX"})
+    df.to_csv(data_dir / filename, index=True)
+    print(f"✅ Saved: {filename}\n")
+
 
 # ============================================================
-# VIX
+# Video game sales (Kaggle)
 # ============================================================
-print("Downloading VIX...")
-df = yf.download("^VIX", start="2010-01-01", end="2025-11-15", progress=False)
-if isinstance(df.columns, pd.MultiIndex):
-    df = df["Close"]
-else:
-    df = df[["Close"]]
-df = df.rename(columns={"Close": "VIX"})
-df.to_csv(data_dir / "VIX_2010_2025.csv", index=True)
-print(f"✅ Saved: VIX_2010_2025.csv\n")
 
-print("🎉 All data downloaded to data/raw/")
+def download_kaggle(datasets=KAGGLE_DATASETS):
+    import kagglehub
+
+    paths = []
+    for dataset in datasets:
+        # Download latest version
+        path = kagglehub.dataset_download(dataset)
+        print("Path to dataset files:", path)
+        paths.append(path)
+    return paths
 
-import kagglehub
 
-# Download latest version
-path = kagglehub.dataset_download("patkle/video-game-sales-data-from-vgchartzcom")
+# ============================================================
+# MAIN
+# ============================================================
 
-print("Path to dataset files:", path)
+def main():
+    data_dir.mkdir(parents=True, exist_ok=True)
+    print(f"📁 Saving to: {data_dir}\n")
 
+    download_single("TTWO", "TTWO_2010_2025.csv")
+    download_game_stocks()
+    download_single("EA", "EA_2010_2025.csv")
+    download_vix()
 
-import kagglehub
+    print("🎉 All data downloaded to data/raw/")
 
-# Download latest version
-path = kagglehub.dataset_download("anandshaw2001/video-game-sales")
+    download_kaggle()
 
-print("Path to dataset files:", path)
 
+if __name__ == "__main__":
+    main()
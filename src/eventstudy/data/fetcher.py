@@ -0,0 +1,207 @@
+"""
+Concurrent, incremental market-data fetcher.
+
+Daily bars are kept per ticker in data/raw/bars (one store table each).
+A refresh asks the source only for dates after the last stored bar, runs
+the tickers on a bounded thread pool and retries failed requests with
+exponential backoff.
+
+    python -m eventstudy.data.fetcher                      # default universe, yfinance
+    python -m eventstudy.data.fetcher TTWO EA --jobs 4
+    python -m eventstudy.data.fetcher --source local --location data/raw/mirror
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from .store import read_table, table_exists, write_table
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_RAW = BASE_DIR / "data" / "raw"
+BARS_DIR = DATA_RAW / "bars"
+
+DEFAULT_START = "2010-01-01"
+DEFAULT_TICKERS = ["TTWO", "EA", "ATVI", "UBSFY", "NTDOY", "^GSPC", "^VIX"]
+BAR_COLUMNS = ["date", "ticker", "adj_close"]
+
+MAX_WORKERS = 8
+RETRIES = 3
+BACKOFF = 0.5  # seconds, doubled after every failed attempt
+# network/file failures (ConnectionError, HTTPError, missing mirror file)
+# and malformed payloads (parser errors, missing columns)
+FETCH_ERRORS = (OSError, ValueError, KeyError)
+
+
+# === SOURCES =============================================================== #
+
+class PriceSource:
+    """
+    Interface of a bar source. fetch returns a frame with date and
+    adj_close for start <= date < end (end=None means up to today).
+    """
+
+    def fetch(self, ticker, start, end=None):
+        raise NotImplementedError
+
+
+class YFinanceSource(PriceSource):
+    """Yahoo Finance through yfinance (imported on first use)"""
+
+    def fetch(self, ticker, start, end=None):
+        import yfinance as yf
+
+        data = yf.download(ticker, start=start, end=end, progress=False, auto_adjust=False)
+        if data.empty:
+            return pd.DataFrame(columns=["date", "adj_close"])
+
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        col = "Adj Close" if "Adj Close" in data.columns else "Close"
+
+        out = data[[col]].rename(columns={col: "adj_close"})
+        out.index.name = "date"
+        return out.reset_index()
+
+
+class LocalSource(PriceSource):
+    """
+    Stand-in source reading <location>/<ticker>.csv (date, adj_close).
+    location may be a directory or an http(s) base URL, so tests and
+    offline runs can serve a mirror without touching the network.
+    """
+
+    def __init__(self, location):
+        self.location = str(location).rstrip("/")
+
+    def fetch(self, ticker, start, end=None):
+        df = pd.read_csv(f"{self.location}/{ticker}.csv", parse_dates=["date"])
+
+        keep = df["date"] >= pd.Timestamp(start)
+        if end is not None:
+            keep &= df["date"] < pd.Timestamp(end)
+        return df.loc[keep, ["date", "adj_close"]].reset_index(drop=True)
+
+
+SOURCES = {"yfinance": YFinanceSource, "local": LocalSource}
+
+
+# === BAR STORE ============================================================= #
+
+def bars_name(ticker):
+    """Store table name of a ticker's bars (^GSPC -> bars__GSPC)"""
+    return "bars_" + "".join(c if c.isalnum() or c in "-." else "_" for c in ticker)
+
+
+def load_bars(ticker, root=BARS_DIR):
+    name = bars_name(ticker)
+    if not table_exists(name, root):
+        return None
+    return read_table(name, root)
+
+
+def last_bar_date(ticker, root=BARS_DIR):
+    bars = load_bars(ticker, root)
+    if bars is None or bars.empty:
+        return None
+    return bars["date"].max()
+
+
+# === FETCH ================================================================= #
+
+def with_retry(func, retries=RETRIES, backoff=BACKOFF):
+    """Call func(), retrying with exponential backoff on a fetch error"""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except FETCH_ERRORS:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def update_ticker(source, ticker, start=DEFAULT_START, end=None, root=BARS_DIR,
+                  retries=RETRIES, backoff=BACKOFF):
+    """
+    Append bars after the last stored one for a ticker.
+    Returns the number of new bars.
+    """
+    stored = load_bars(ticker, root)
+    last = None if stored is None or stored.empty else stored["date"].max()
+    fetch_start = pd.Timestamp(start) if last is None else last + pd.Timedelta(days=1)
+
+    if end is not None and fetch_start >= pd.Timestamp(end):
+        return 0
+
+    new = with_retry(
+        lambda: source.fetch(ticker, fetch_start.strftime("%Y-%m-%d"), end),
+        retries=retries, backoff=backoff,
+    )
+    new = new.dropna(subset=["adj_close"])
+    if last is not None:
+        new = new[pd.to_datetime(new["date"]) > last]
+    if new.empty:
+        return 0
+
+    new = new.assign(ticker=ticker)[BAR_COLUMNS]
+    bars = new if stored is None else pd.concat([stored[BAR_COLUMNS], new], ignore_index=True)
+    bars["date"] = pd.to_datetime(bars["date"])
+    bars = bars.drop_duplicates("date", keep="last").sort_values("date")
+
+    write_table(bars, bars_name(ticker), root)
+    return len(new)
+
+
+def update_all(source, tickers=DEFAULT_TICKERS, start=DEFAULT_START, end=None,
+               root=BARS_DIR, max_workers=MAX_WORKERS, retries=RETRIES, backoff=BACKOFF):
+    """
+    Refresh every ticker on a bounded thread pool.
+    Returns {ticker: new bar count}; failures map to the raised exception.
+    """
+    Path(root).mkdir(parents=True, exist_ok=True)
+
+    def job(ticker):
+        try:
+            return update_ticker(source, ticker, start, end, root, retries, backoff)
+        except FETCH_ERRORS as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(tickers, pool.map(job, tickers)))
+
+
+# === MAIN ================================================================== #
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally fetch daily bars.")
+    parser.add_argument("tickers", nargs="*", default=DEFAULT_TICKERS)
+    parser.add_argument("--source", choices=list(SOURCES), default="yfinance")
+    parser.add_argument("--location", help="directory or URL for --source local")
+    parser.add_argument("--start", default=DEFAULT_START)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    if args.source == "local":
+        if not args.location:
+            parser.error("--source local needs --location")
+        source = LocalSource(args.location)
+    else:
+        source = YFinanceSource()
+
+    start = time.perf_counter()
+    results = update_all(source, args.tickers, args.start, args.end, max_workers=args.jobs)
+
+    for ticker, result in results.items():
+        if isinstance(result, Exception):
+            print(f"[WARN] {ticker}: {result}")
+        else:
+            print(f"✅ {ticker}: {result} new bar(s)")
+    print(f"\n✅ Updated {len(results)} ticker(s) in {time.perf_counter() - start:.1f}s -> {BARS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Partitioned storage of intraday bars.
+
+Minute and 5-minute bars are a few hundred times the daily data, so they
+are never kept as one table. Every (ticker, session) is one Parquet file
+
+    data/raw/intraday/<ticker>/<YYYY-MM-DD>.parquet     (date, ticker, close)
+
+with exchange-local timestamps in `date`. Readers load only the sessions
+they need; listing the sessions of a ticker only reads its directory.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+INTRADAY_DIR = BASE_DIR / "data" / "raw" / "intraday"
+
+BAR_COLUMNS = ["date", "ticker", "close"]
+
+
+def ticker_dir(ticker, root=INTRADAY_DIR):
+    """Partition directory of a ticker (^GSPC -> _GSPC)"""
+    name = "".join(c if c.isalnum() or c in "-." else "_" for c in str(ticker))
+    return Path(root) / name
+
+
+# === WRITE ================================================================= #
+
+def write_sessions(bars, root=INTRADAY_DIR):
+    """
+    Split bars into one file per (ticker, session day), replacing the
+    files of the sessions present. Returns the number of files written.
+    """
+    bars = bars[BAR_COLUMNS].copy()
+    bars["date"] = pd.to_datetime(bars["date"])
+    bars["ticker"] = bars["ticker"].astype(str)
+    day = bars["date"].dt.normalize()
+
+    n_files = 0
+    for (ticker, session), part in bars.groupby(["ticker", day], sort=False):
+        path = ticker_dir(ticker, root) / f"{session:%Y-%m-%d}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part.sort_values("date").to_parquet(path, index=False)
+        n_files += 1
+    return n_files
+
+
+# === READ ================================================================== #
+
+def sessions(ticker, root=INTRADAY_DIR):
+    """Sorted session days stored for a ticker (datetime64[D])"""
+    folder = ticker_dir(ticker, root)
+    if not folder.is_dir():
+        return np.array([], dtype="datetime64[D]")
+    return np.sort(np.array([p.stem for p in folder.glob("*.parquet")], dtype="datetime64[D]"))
+
+
+def sessions_around(available, days, before, after):
+    """
+    Stored sessions needed around each day: the session on or after the
+    day, `before` sessions before it and `after` sessions after it.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    first = np.searchsorted(available, days)
+    wanted = set()
+    for i in first:
+        wanted.update(available[max(i - before, 0):i + after + 1].tolist())
+    return sorted(wanted)
+
+
+def load_sessions(ticker, days, root=INTRADAY_DIR, columns=BAR_COLUMNS):
+    """Bars of the given session days of one ticker (missing days are skipped)"""
+    folder = ticker_dir(ticker, root)
+    paths = [folder / f"{np.datetime64(d, 'D')}.parquet" for d in days]
+    frames = [pd.read_parquet(p, columns=columns) for p in paths if p.exists()]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,186 @@
+"""
+Columnar intermediate store for the processed data layer.
+
+Every pipeline stage reads and writes its tables through read_table /
+write_table. Tables are stored as Parquet with typed columns (datetime64
+dates, categorical tickers and labels), so downstream stages no longer
+re-parse dates or re-uppercase tickers. Legacy CSVs are still readable and
+CSV export can be switched on for inspection.
+
+Tables written by streaming stages are partitioned: a directory of
+Parquet parts (name/part-00000.parquet, ...) read back as one table.
+append_table adds rows to a table as one more part, without rewriting it.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_PROCESSED = BASE_DIR / "data" / "processed"
+
+# Also write a CSV copy next to every Parquet table
+EXPORT_CSV = False
+
+DATE_COLUMNS = ("date", "event_date", "trading_date")
+CATEGORICAL_COLUMNS = (
+    "ticker", "publisher", "studio", "franchise", "event_type", "sentiment",
+    "impact_expectation_manual", "impact_label",
+)
+
+# Event-level tables have always been semicolon-separated
+SEMICOLON_PREFIXES = ("events", "ml_")
+
+
+# === HELPERS =============================================================== #
+
+def csv_sep(name):
+    return ";" if name.startswith(SEMICOLON_PREFIXES) else ","
+
+
+def normalize(df):
+    """Apply the store's column types (dates, upper-case categorical tickers)"""
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if col == "ticker":
+            df[col] = df[col].astype(str).str.upper()
+        df[col] = df[col].astype("category")
+    return df
+
+
+def apply_filters(df, filters):
+    """Apply [(column, op, value), ...] row filters (AND) to a frame"""
+    if not filters:
+        return df
+    ops = {
+        "==": lambda a, b: a == b, "!=": lambda a, b: a != b,
+        "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+        ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+        "in": lambda a, b: a.isin(b),
+    }
+    keep = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        keep &= ops[op](df[col], value)
+    return df[keep].reset_index(drop=True)
+
+
+def table_path(name, root=DATA_PROCESSED, fmt="parquet"):
+    if fmt == "parts":
+        return Path(root) / name
+    return Path(root) / f"{name}.{fmt}"
+
+
+# === READ / WRITE ========================================================== #
+
+def write_table(df, name, root=DATA_PROCESSED, fmt="parquet", csv=None):
+    """
+    Write a table to the store as Parquet (fmt="parquet") or uncompressed
+    Arrow IPC (fmt="arrow", memory-mappable). Optionally export a CSV copy.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    df = normalize(df).reset_index(drop=True)
+    clear_table(name, root)
+
+    path = table_path(name, root, fmt)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "arrow":
+        df.to_feather(path, compression="uncompressed")
+    else:
+        raise ValueError(f"Unknown store format: {fmt}")
+
+    if EXPORT_CSV if csv is None else csv:
+        df.to_csv(root / f"{name}.csv", sep=csv_sep(name), index=False)
+
+    return path
+
+
+def clear_table(name, root=DATA_PROCESSED):
+    """Remove the Parquet, Arrow and partitioned versions of a table"""
+    for fmt in ("parquet", "arrow"):
+        table_path(name, root, fmt).unlink(missing_ok=True)
+    parts = table_path(name, root, "parts")
+    if parts.is_dir():
+        shutil.rmtree(parts)
+
+
+def write_partition(df, name, part, root=DATA_PROCESSED, schema=None):
+    """
+    Write one part of a partitioned table. A fixed pyarrow schema keeps the
+    column types identical across parts (e.g. categorical dictionaries).
+    Call clear_table first so parts of an earlier run do not linger.
+    """
+    parts = table_path(name, root, "parts")
+    parts.mkdir(parents=True, exist_ok=True)
+    path = parts / f"part-{part:05d}.parquet"
+    normalize(df).reset_index(drop=True).to_parquet(path, index=False, schema=schema)
+    return path
+
+
+def append_table(df, name, root=DATA_PROCESSED):
+    """
+    Append rows to a table as a new part. A single-file Parquet table is
+    first moved in place as part 0, so earlier rows are never rewritten.
+    """
+    single = table_path(name, root, "parquet")
+    parts = table_path(name, root, "parts")
+    if single.exists():
+        parts.mkdir(parents=True, exist_ok=True)
+        single.rename(parts / "part-00000.parquet")
+
+    n_parts = len(list(parts.glob("part-*.parquet"))) if parts.is_dir() else 0
+    return write_partition(df, name, n_parts, root)
+
+
+def read_table(name, root=DATA_PROCESSED, columns=None, memory_map=False, filters=None):
+    """
+    Read a table from the store. Looks for Parquet, then a partitioned
+    Parquet directory, then Arrow IPC, then falls back to the legacy CSV
+    (normalized to the store's types). filters (pyarrow row filters, e.g.
+    [("date", ">", ts)]) skip row groups of Parquet tables and are applied
+    after reading otherwise.
+    """
+    root = Path(root)
+
+    for fmt in ("parquet", "parts"):
+        path = table_path(name, root, fmt)
+        if path.exists():
+            if memory_map:
+                import pyarrow.parquet as pq
+                table = pq.read_table(path, columns=columns, memory_map=True, filters=filters)
+                return table.to_pandas()
+            return pd.read_parquet(path, columns=columns, filters=filters)
+
+    path = table_path(name, root, "arrow")
+    if path.exists():
+        import pyarrow.feather as feather
+        df = feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+        return apply_filters(df, filters)
+
+    path = table_path(name, root, "csv")
+    if path.exists():
+        df = normalize(pd.read_csv(path, sep=csv_sep(name), usecols=columns))
+        return apply_filters(df, filters)
+
+    raise FileNotFoundError(f"Table '{name}' not found in {root}")
+
+
+def table_file(name, root=DATA_PROCESSED):
+    """Path of the file backing a table (same lookup order as read_table), or None"""
+    for fmt in ("parquet", "parts", "arrow", "csv"):
+        path = table_path(name, root, fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def table_exists(name, root=DATA_PROCESSED):
+    return table_file(name, root) is not None
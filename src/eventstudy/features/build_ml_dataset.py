@@ -1,14 +1,29 @@
-import pandas as pd
 from pathlib import Path
 
+from ..data.store import read_table, table_exists, write_table
+from ..sharded import warn_serial
+from .category_encoder import CategoryEncoder
+
 
 BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_RAW = BASE_DIR / "data" / "raw"
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
-print("BASE_DIR:", BASE_DIR)
-print("DATA_RAW exists:", DATA_RAW.exists())
-print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
+# One-hot encoded columns; the vocabulary is fitted here and reused for scoring
+CATEGORICAL_COLUMNS = ["publisher", "studio", "event_type", "franchise", "sentiment"]
+MIN_CATEGORY_COUNT = 1
+ENCODER_PATH = DATA_PROCESSED / "ml_encoder.json"
+ONEHOT_PATH = DATA_PROCESSED / "ml_onehot.npz"
+
+
+def encode_features(df, path=ENCODER_PATH):
+    """
+    One-hot matrix of a frame on the saved training vocabulary (for
+    scoring new events). Returns (sparse matrix, feature names).
+    """
+    encoder = CategoryEncoder.load(path)
+    return encoder.transform(df), encoder.feature_names
+
 
 def build_ml_dataset() -> None:
     """
@@ -19,19 +34,19 @@ def build_ml_dataset() -> None:
     - Load data/processed/events_labeled.csv
     - Normalize text fields (e.g. sentiment)
     - Select useful features
-    - One-hot encode categorical variables
+    - Fit the one-hot vocabulary of the categorical variables
     - Map impact_label -> numeric labels
-    - Save data/processed/ml_dataset.csv
+    - Save the ml_dataset table, the sparse one-hot matrix
+      (ml_onehot.npz, rows aligned with ml_dataset) and the encoder
     """
 
     # ---- Paths ----
-    in_path = DATA_PROCESSED / "events_labeled.csv"
-    if not in_path.exists():
-        raise FileNotFoundError(f"Input file not found: {in_path}")
+    in_path = DATA_PROCESSED / "events_labeled"
+    if not table_exists("events_labeled"):
+        raise FileNotFoundError(f"Input table not found: {in_path}")
 
-    # ✅ ADD sep=";" to load correctly
-    df = pd.read_csv(in_path, sep=";")
-    print("Loaded events_labeled.csv with shape:", df.shape)
+    df = read_table("events_labeled")
+    print("Loaded events_labeled with shape:", df.shape)
     print("Columns:", df.columns.tolist())
 
     # ---- Basic normalization ----
@@ -39,10 +54,6 @@ def build_ml_dataset() -> None:
     if "sentiment" in df.columns:
         df["sentiment"] = df["sentiment"].astype(str).str.strip().str.lower()
     
-    # Keep other columns as-is (just strip whitespace)
-    for col in ["event_type", "franchise", "publisher", "studio"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip()
 
     # ---- Target column ----
     target_col = "impact_label"
@@ -109,38 +120,49 @@ def build_ml_dataset() -> None:
     # Build ML dataframe (features + targets)
     df_ml = df[present_features + [target_col, "impact_label_num"]].copy()
 
-    # ---- One-hot encode categorical columns ----
-    cat_cols = [
-        col
-        for col in ["publisher", "studio", "event_type", "franchise", "sentiment"]
-        if col in present_features
-    ]
+    # Drop rows with missing label
+    before = len(df_ml)
+    df_ml = df_ml.dropna(subset=["impact_label_num"]).reset_index(drop=True)
+    after = len(df_ml)
+    print(f"Dropped {before - after} rows with missing labels.")
 
+    # ---- One-hot encode categorical columns ----
+    cat_cols = [col for col in CATEGORICAL_COLUMNS if col in present_features]
     print("Categorical columns to encode:", cat_cols)
 
-    df_ml_encoded = pd.get_dummies(df_ml, columns=cat_cols, drop_first=True)
-
-    # Drop rows with missing label
-    before = len(df_ml_encoded)
-    df_ml_encoded = df_ml_encoded.dropna(subset=["impact_label_num"])
-    after = len(df_ml_encoded)
-    print(f"Dropped {before - after} rows with missing labels.")
+    # Fixed vocabulary: categories are kept as compact categoricals in the
+    # table and the one-hot matrix is sparse; unseen values map to __other__
+    encoder = CategoryEncoder.fit(
+        df_ml, cat_cols, min_count=MIN_CATEGORY_COUNT, lower=("sentiment",)
+    )
+    onehot = encoder.transform(df_ml)
 
     # ---- Final feature/target structure ----
-    feature_cols = [
-        c for c in df_ml_encoded.columns if c not in [target_col, "impact_label_num"]
-    ]
+    numeric_cols = [c for c in present_features if c not in cat_cols]
 
-    print("ML dataset – feature columns:", len(feature_cols))
-    print("ML dataset – total rows:", len(df_ml_encoded))
+    print("ML dataset – feature columns:", len(numeric_cols) + onehot.shape[1])
+    print("ML dataset – total rows:", len(df_ml))
     print("Label distribution (impact_label_num):")
-    print(df_ml_encoded["impact_label_num"].value_counts().sort_index())
+    print(df_ml["impact_label_num"].value_counts().sort_index())
 
     # ---- Save final ML dataset ----
-    out_path = DATA_PROCESSED / "ml_dataset.csv"
-    df_ml_encoded.to_csv(out_path, sep=";", index=False)  # ✅ Also save with sep=";"
+    from scipy import sparse
+
+    out_path = write_table(df_ml, "ml_dataset")
+    sparse.save_npz(ONEHOT_PATH, onehot)
+    encoder.save(ENCODER_PATH)
     print(f"✅ Saved ML dataset to: {out_path}")
+    print(f"✅ Saved one-hot matrix {onehot.shape} ({onehot.nnz} non-zeros) to: {ONEHOT_PATH}")
+    print(f"✅ Saved encoder to: {ENCODER_PATH}")
+
+
+def main():
+    warn_serial("build_ml_dataset")
+    print("BASE_DIR:", BASE_DIR)
+    print("DATA_RAW exists:", DATA_RAW.exists())
+    print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
+    build_ml_dataset()
 
 
 if __name__ == "__main__":
-    build_ml_dataset()
\ No newline at end of file
+    main()
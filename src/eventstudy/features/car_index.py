@@ -0,0 +1,64 @@
+"""
+Prefix-sum index over abnormal returns for fast CAR window queries.
+"""
+
+import numpy as np
+
+from .trading_calendar import TradingCalendar
+
+
+class CarIndex:
+    """
+    Per-ticker cumulative-AR index on top of a TradingCalendar.
+
+    The AR column is laid out in calendar order and turned into a running
+    sum, so the CAR over any trading-day window is the difference of two
+    cumulative sums at integer positions.
+
+    The running sum restarts at every ticker: a window sum never depends on
+    the other tickers in the calendar, so a one-ticker calendar gives the
+    same bits as the full universe.
+    """
+
+    def __init__(self, calendar, values):
+        self.calendar = calendar
+
+        # NaN ARs contribute nothing, matching DataFrame.sum() semantics.
+        # cumsum[p] is the sum of the ticker's values before position p
+        # (it is 0 at the ticker's first position, see window_sum)
+        values = np.nan_to_num(np.asarray(values, dtype=float))
+        self.cumsum = np.zeros(len(values) + 1)
+        for start, end in zip(calendar.starts, calendar.ends):
+            self.cumsum[start + 1:end + 1] = np.cumsum(values[start:end])
+
+        self.is_start = np.zeros(len(values) + 1, dtype=bool)
+        self.is_start[calendar.starts] = True
+
+    @classmethod
+    def from_prices(cls, prices, value_col="AR", calendar=None):
+        """Build the index from a long-format price frame"""
+        if calendar is None:
+            calendar = TradingCalendar.from_prices(prices)
+        return cls(calendar, calendar.column(prices, value_col))
+
+    def window_sum(self, lo, hi):
+        """
+        Sum of values over half-open calendar-position bounds [lo, hi)
+        within one ticker (as returned by TradingCalendar.window)
+        """
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        before = np.where(self.is_start[lo], 0.0, self.cumsum[lo])
+        return np.where(hi > lo, self.cumsum[hi] - before, 0.0)
+
+    def car_at(self, positions, start, end):
+        """CAR over [start, end] trading days around calendar positions"""
+        positions = np.asarray(positions, dtype=np.int64)
+        lo, hi = self.calendar.window(positions, start, end)
+
+        out = self.window_sum(lo, hi)
+        out[positions < 0] = np.nan
+        return out
+
+    def car(self, tickers, dates, start, end):
+        """CAR over [start, end] trading days around each event's trading day"""
+        return self.car_at(self.calendar.locate(tickers, dates), start, end)
@@ -1,92 +1,240 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from ..data.store import read_table, write_table
+from ..sharded import map_event_shards, parse_jobs
+from .market_model import MarketModel
+
 BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
-print("BASE_DIR:", BASE_DIR)
-print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
-
 
 # === LOAD DATA ============================================================= #
 
 def load_data():
-    # ✅ Load with correct separator
-    events = pd.read_csv(DATA_PROCESSED / "events_with_car.csv", sep=";")
-    events["trading_date"] = pd.to_datetime(events["trading_date"])
-    events["event_date"] = pd.to_datetime(events["event_date"])
-    
-    prices = pd.read_csv(DATA_PROCESSED / "prices_with_ar.csv")
-    prices["date"] = pd.to_datetime(prices["date"])
-    
+    events = read_table("events_with_car")
+    prices = read_table("prices_with_ar")
+
     return events, prices
 
 
 # === COMPUTE CAR WINDOWS ================================================== #
 
-def compute_car(prices, ticker, trading_date, start, end):
-    """Compute CAR over a custom window [start, end] days from trading_date"""
-    mask = (
-        (prices["ticker"] == ticker) &
-        (prices["date"] >= trading_date + pd.Timedelta(days=start)) &
-        (prices["date"] <= trading_date + pd.Timedelta(days=end))
-    )
-    return prices.loc[mask, "AR"].sum()
-
-
-def add_car_windows(events, prices):
-    """Add multiple CAR window columns"""
-    events["CAR_0_1"] = events.apply(
-        lambda r: compute_car(prices, r["ticker"], r["trading_date"], 0, 1),
-        axis=1
-    )
-    
-    events["CAR_0_3"] = events.apply(
-        lambda r: compute_car(prices, r["ticker"], r["trading_date"], 0, 3),
-        axis=1
-    )
-    
-    events["CAR_0_5"] = events.apply(
-        lambda r: compute_car(prices, r["ticker"], r["trading_date"], 0, 5),
-        axis=1
-    )
-    
+# Windows are in trading days relative to the event's trading day
+CAR_WINDOWS = {
+    "CAR_0_1": (0, 1),
+    "CAR_0_3": (0, 3),
+    "CAR_0_5": (0, 5),
+}
+
+
+def shard_car_windows(prices, events):
+    """add_car_windows on one ticker shard (run in a pool worker)"""
+    return add_car_windows(events.copy(), prices)
+
+
+def add_car_windows(events, prices, model=None, jobs=1):
+    """
+    Add multiple CAR window columns using each event's alpha/beta.
+    With jobs > 1 (and no model) ticker shards run on a process pool.
+    """
+    if model is None and jobs > 1:
+        ordered = prices.sort_values(["ticker", "date"], kind="stable")
+        return map_event_shards(shard_car_windows, events, ordered, ["return", "market_return"], jobs)
+
+    if model is None:
+        model = MarketModel.from_prices(prices)
+
+    positions = model.calendar.locate(events["ticker"], events["trading_date"])
+    for col, (start, end) in CAR_WINDOWS.items():
+        events[col] = model.car_at(positions, start, end, events["alpha"], events["beta"])
+
     return events
 
 
 # === CREATE IMPACT LABELS ================================================= #
 
-def label_impact(car):
-    """Define ML labels based on CAR magnitude"""
-    if abs(car) > 0.03:
-        return "High"
-    elif abs(car) > 0.01:
-        return "Medium"
-    else:
-        return "Low"
+# |CAR| above the first threshold is Medium, above the second High
+IMPACT_THRESHOLDS = (0.01, 0.03)
+LABEL_WINDOW = "CAR_m1_p1"
+LABEL_SCHEME = "abs"
+
+# Schemes map a window's CARs to a score, which is binned by sorted cuts:
+# - abs       |CAR|, cuts are the thresholds
+# - signed    CAR, |CAR| binned by the thresholds on each side of zero
+# - scaled    |CAR| / (sigma * sqrt(window length)), thresholds in sigmas
+# - quantile  |CAR|, thresholds are quantiles (equal-frequency bins)
+SCHEME_LABELS = {
+    "abs": ("Low", "Medium", "High"),
+    "signed": ("Strong Negative", "Negative", "Neutral", "Positive", "Strong Positive"),
+    "scaled": ("Low", "Medium", "High"),
+    "quantile": ("Low", "Medium", "High"),
+}
+# Class given to events whose CAR is missing
+MISSING_CLASS = {"signed": 2}
+
+
+def threshold_pairs(values):
+    """Every (medium, high) pair of the values with medium < high"""
+    values = np.asarray(values, dtype=float)
+    i, j = np.triu_indices(len(values), k=1)
+    return np.column_stack([values[i], values[j]])
+
+
+SWEEP_GRIDS = {
+    "abs": threshold_pairs(np.round(np.arange(0.0025, 0.0801, 0.0025), 4)),
+    "signed": threshold_pairs(np.round(np.arange(0.0025, 0.0801, 0.0025), 4)),
+    "scaled": threshold_pairs(np.arange(0.25, 4.01, 0.25)),
+    "quantile": threshold_pairs(np.round(np.arange(0.05, 0.951, 0.05), 2)),
+}
+
+
+def window_spans():
+    """(start, end) of every CAR column the pipeline produces"""
+    from .compute_ar_car import CAR_WINDOWS as EVENT_WINDOWS
+
+    return {**EVENT_WINDOWS, **CAR_WINDOWS}
+
+
+def scheme_score(events, window, scheme):
+    """Score the scheme bins for every event (NaN where the CAR is missing)"""
+    if scheme not in SCHEME_LABELS:
+        raise ValueError(f"Unknown label scheme {scheme!r}. Available: {list(SCHEME_LABELS)}")
+
+    car = events[window].to_numpy(dtype=float, na_value=np.nan)
+    if scheme == "signed":
+        return car
+    if scheme == "scaled":
+        start, end = window_spans()[window]
+        sigma2 = events["sigma2"].to_numpy(dtype=float, na_value=np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.abs(car) / np.sqrt(sigma2 * (end - start + 1))
+    return np.abs(car)
+
+
+def scheme_cuts(score, scheme, thresholds):
+    """Sorted bin edges (configs x cuts) for a (configs x 2) threshold array"""
+    thresholds = np.atleast_2d(np.asarray(thresholds, dtype=float))
+    if scheme == "quantile":
+        valid = score[~np.isnan(score)]
+        if len(valid) == 0:
+            return np.full(thresholds.shape, np.nan)
+        return np.quantile(valid, thresholds.ravel()).reshape(thresholds.shape)
+    return thresholds
+
+
+def label_codes(score, cuts, missing=0):
+    """
+    Class index of every score for every row of cuts (np.digitize with
+    right=True: a score above the k-th cut is at least class k).
+    Returns (configs x events) ints; missing scores get the missing class.
+    """
+    codes = (score[None, :, None] > cuts[:, None, :]).sum(axis=2)
+    codes[:, np.isnan(score)] = missing
+    return codes
+
+
+def scheme_codes(score, scheme, thresholds, missing):
+    """Class index of every event for every threshold row (configs x events)"""
+    if scheme != "signed":
+        return label_codes(score, scheme_cuts(score, scheme, thresholds), missing)
+
+    # Magnitude class on either side of Neutral, so -x and +x mirror exactly
+    magnitude = label_codes(np.abs(score), scheme_cuts(score, scheme, thresholds))
+    codes = MISSING_CLASS["signed"] + np.sign(np.nan_to_num(score)).astype(int) * magnitude
+    codes[:, np.isnan(score)] = missing
+    return codes
+
+
+def assign_labels(events, window=LABEL_WINDOW, thresholds=IMPACT_THRESHOLDS, scheme=LABEL_SCHEME):
+    """Labels of every event for one (window, thresholds, scheme) configuration"""
+    score = scheme_score(events, window, scheme)
+    codes = scheme_codes(score, scheme, thresholds, MISSING_CLASS.get(scheme, 0))[0]
+    return np.asarray(SCHEME_LABELS[scheme], dtype=object)[codes]
+
+
+def add_impact_labels(events, window=LABEL_WINDOW, thresholds=IMPACT_THRESHOLDS, scheme=LABEL_SCHEME):
+    """Add impact_label column based on LABEL_WINDOW (CAR_m1_p1 by default)"""
+    events["impact_label"] = assign_labels(events, window, thresholds, scheme)
+    return events
 
 
-def add_impact_labels(events):
-    """Add impact_label column based on CAR_m1_p1"""
-    events["impact_label"] = events["CAR_m1_p1"].apply(label_impact)
-    return events
+# === THRESHOLD SWEEP ======================================================= #
+
+def label_balance(codes, n_classes):
+    """Class counts and balance metrics of every config row of codes"""
+    counts = (codes[:, :, None] == np.arange(n_classes)).sum(axis=1)
+    total = counts.sum(axis=1, keepdims=True)
+    share = counts / np.maximum(total, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plogp = np.where(share > 0, share * np.log(share), 0.0)
+        imbalance = counts.max(axis=1) / counts.min(axis=1)
+
+    return counts, share, {
+        "min_share": share.min(axis=1),
+        "max_share": share.max(axis=1),
+        "entropy": -plogp.sum(axis=1) / np.log(n_classes),
+        "imbalance_ratio": imbalance,
+    }
+
+
+def sweep_labels(events, windows=None, grids=None):
+    """
+    Label distribution and balance metrics for every window x scheme x
+    threshold pair. windows defaults to every CAR column present, grids to
+    SWEEP_GRIDS ({scheme: (configs x 2) thresholds}).
+    """
+    if windows is None:
+        windows = [w for w in window_spans() if w in events.columns]
+    if grids is None:
+        grids = SWEEP_GRIDS
+
+    frames = []
+    for scheme, thresholds in grids.items():
+        thresholds = np.atleast_2d(np.asarray(thresholds, dtype=float))
+        labels = SCHEME_LABELS[scheme]
+
+        for window in windows:
+            score = scheme_score(events, window, scheme)
+            codes = scheme_codes(score, scheme, thresholds, missing=-1)
+            counts, share, metrics = label_balance(codes, len(labels))
+
+            frame = pd.DataFrame({
+                "window": window,
+                "scheme": scheme,
+                "threshold_low": thresholds[:, 0],
+                "threshold_high": thresholds[:, 1],
+                "n_labeled": counts.sum(axis=1),
+                **metrics,
+            })
+            for k, label in enumerate(labels):
+                frame[f"share_{label}"] = share[:, k]
+            frames.append(frame)
+
+    return pd.concat(frames, ignore_index=True)
 
 
 # === MAIN ================================================================== #
 
 def main():
-    print("📥 Loading data...")
+    print("BASE_DIR:", BASE_DIR)
+    print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
+
+    jobs = parse_jobs()
+    print("\n📥 Loading data...")
     events, prices = load_data()
     print(f"✅ Loaded {len(events)} events")
     print(f"✅ Loaded {len(prices)} price rows")
     
     print("\n📊 Computing CAR windows...")
-    events = add_car_windows(events, prices)
+    events = add_car_windows(events, prices, jobs=jobs)
     print("✅ Added CAR_0_1, CAR_0_3, CAR_0_5")
     
     print("\n🏷️  Adding impact labels...")
     events = add_impact_labels(events)
-    print("Impact label distribution:")
+    print(f"Impact label distribution ({LABEL_SCHEME} on {LABEL_WINDOW}):")
     print(events["impact_label"].value_counts())
     
     print("\n📁 Saving results...")
@@ -94,11 +242,10 @@ def main():
     cols_to_drop = ["source_url", "notes"]
     cols_to_save = [col for col in events.columns if col not in cols_to_drop]
     
-    out_path = DATA_PROCESSED / "events_labeled.csv"
-    events[cols_to_save].to_csv(out_path, sep=";", index=False)
+    out_path = write_table(events[cols_to_save], "events_labeled")
     print(f"✅ Saved: {out_path}")
     print(f"   Columns: {cols_to_save}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
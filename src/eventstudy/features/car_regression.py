@@ -0,0 +1,255 @@
+"""
+Cross-sectional regression of CARs on event characteristics.
+
+    CAR = a + b1 Sales + b2 EventType + b3 Franchise + b4 Publisher + b5 VIX + e
+
+Every CAR window is a dependent variable and the specifications are
+nested: each one adds a block of terms to the previous one. Every spec is
+fitted on its own complete cases, so a sparse term (e.g. sales) only
+shrinks the specs that use it. With the design columns ordered by block,
+X[:, :k] = Q[:, :k] R[:k, :k] for every prefix k, so one QR factorization
+serves all windows x the specs that share a sample. Standard errors are
+heteroskedasticity-robust (HC1) and clustered by event date.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, table_exists, write_table
+from ..sharded import warn_serial
+from .significance import CAR_WINDOWS
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+RESULTS_DIR = BASE_DIR / "results"
+
+# Term blocks in nesting order; spec k uses the first k blocks.
+# Terms not listed as categorical are numeric; missing columns are skipped.
+CATEGORICAL_TERMS = ("event_type", "publisher", "franchise")
+SPEC_TERMS = ("event_type", "publisher", "franchise", "vix", "log_sales")
+CLUSTER_COL = "trading_date"
+
+# A column whose part orthogonal to the kept columns has a norm below this
+# (relative to its own norm) is aliased
+RANK_TOL = 1e-10
+
+
+# === DESIGN MATRIX ========================================================= #
+
+def add_derived_terms(events):
+    events = events.copy()
+    if "global_sales" in events.columns and "log_sales" not in events.columns:
+        events["log_sales"] = np.log1p(events["global_sales"].astype(float))
+    return events
+
+
+def design_matrix(events, terms=SPEC_TERMS):
+    """
+    Intercept plus one block of columns per available term, in order.
+    Categorical terms are one-hot encoded with the first level dropped.
+    Returns (X, column names, block end index per term).
+    """
+    blocks, names, ends = [np.ones((len(events), 1))], ["const"], {}
+    for term in terms:
+        if term not in events.columns:
+            continue
+        if term in CATEGORICAL_TERMS:
+            values = events[term].astype("string").str.strip()
+            dummies = pd.get_dummies(values, prefix=term, drop_first=True, dtype=float)
+            dummies[values.isna().to_numpy()] = np.nan
+            blocks.append(dummies.to_numpy())
+            names.extend(dummies.columns)
+        else:
+            blocks.append(events[[term]].to_numpy(dtype=float, na_value=np.nan))
+            names.append(term)
+        ends[term] = len(names)
+    return np.hstack(blocks), names, ends
+
+
+def specifications(ends):
+    """Nested specs: name -> number of leading design columns"""
+    specs, used = {}, []
+    for term, end in ends.items():
+        used.append(term)
+        specs["+".join(used)] = end
+    return specs
+
+
+# === BATCHED LEAST SQUARES ================================================= #
+
+def independent_columns(X, tol=RANK_TOL):
+    """
+    Mask of the columns to keep: columns are added one at a time and
+    dropped when all-zero or linear in the columns kept before them, so a
+    column is judged by its content, never by its position alone.
+    """
+    basis = np.empty((X.shape[0], 0))
+    keep = np.zeros(X.shape[1], dtype=bool)
+    for j in range(X.shape[1]):
+        col = X[:, j]
+        norm = np.linalg.norm(col)
+        if norm == 0:
+            continue
+        # Project out the kept columns twice (classical Gram-Schmidt loses
+        # orthogonality in one pass on nearly collinear dummies)
+        resid = col - basis @ (basis.T @ col)
+        resid -= basis @ (basis.T @ resid)
+        resid_norm = np.linalg.norm(resid)
+        if resid_norm > tol * norm:
+            basis = np.column_stack([basis, resid / resid_norm])
+            keep[j] = True
+    return keep
+
+
+def qr_drop_aliased(X, tol=RANK_TOL):
+    """QR of X after dropping all-zero columns and columns linear in the ones before them"""
+    keep = independent_columns(X, tol)
+    Q, R = np.linalg.qr(X[:, keep])
+    return Q, R, keep
+
+
+def fit_nested(Q, R, Y, clusters, spec_sizes):
+    """
+    Fit every Y column on every leading block X[:, :k] = Q[:, :k] R[:k, :k].
+    spec_sizes: {spec: k} (k already accounts for dropped columns).
+    Returns {spec: dict of (columns x windows) arrays}.
+    """
+    from scipy import stats
+
+    n = Q.shape[0]
+    qty = Q.T @ Y
+    cluster_codes, cluster_ids = pd.factorize(clusters)
+    C = np.zeros((len(cluster_ids), n))
+    C[cluster_codes, np.arange(n)] = 1.0
+    n_clusters = len(cluster_ids)
+
+    out = {}
+    for spec, k in spec_sizes.items():
+        Qk, Rk = Q[:, :k], R[:k, :k]
+        beta = np.linalg.solve(Rk, qty[:k])
+        resid = Y - Qk @ qty[:k]
+        Rinv = np.linalg.inv(Rk)
+
+        # HC1: R^-1 (Qk' diag(e^2) Qk) R^-T, per window
+        meat = np.einsum("ni,ny,nj->yij", Qk, resid ** 2, Qk)
+        cov_hc = np.einsum("ij,yjk,lk->yil", Rinv, meat, Rinv) * n / (n - k)
+
+        # Cluster-robust: sum within clusters of Qk' e before the outer product
+        scores = np.einsum("gn,ni,ny->ygi", C, Qk, resid)
+        meat_cl = np.einsum("ygi,ygj->yij", scores, scores)
+        scale = n_clusters / max(n_clusters - 1, 1) * (n - 1) / (n - k)
+        cov_cl = np.einsum("ij,yjk,lk->yil", Rinv, meat_cl, Rinv) * scale
+
+        se_hc = np.sqrt(np.maximum(np.diagonal(cov_hc, axis1=1, axis2=2), 0.0)).T
+        se_cl = np.sqrt(np.maximum(np.diagonal(cov_cl, axis1=1, axis2=2), 0.0)).T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_hc, t_cl = beta / se_hc, beta / se_cl
+            tss = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+            r2 = 1 - (resid ** 2).sum(axis=0) / tss
+
+        out[spec] = {
+            "coef": beta,
+            "se_hc1": se_hc, "t_hc1": t_hc,
+            "p_hc1": 2 * stats.t.sf(np.abs(t_hc), max(n - k, 1)),
+            "se_cluster": se_cl, "t_cluster": t_cl,
+            "p_cluster": 2 * stats.t.sf(np.abs(t_cl), max(n_clusters - 1, 1)),
+            "r2": r2, "k": k,
+        }
+    return out
+
+
+def spec_samples(X, Y, ends):
+    """
+    Complete cases of every spec (its regressors and every CAR present),
+    grouped: consecutive specs with the same sample share one QR.
+    Returns [(sample mask, {spec: leading design columns}), ...].
+    """
+    has_y = ~np.isnan(Y).any(axis=1)
+    missing = np.isnan(X)
+    groups = []
+    for spec, end in specifications(ends).items():
+        sample = has_y & ~missing[:, :end].any(axis=1)
+        if groups and np.array_equal(groups[-1][0], sample):
+            groups[-1][1][spec] = end
+        else:
+            groups.append((sample, {spec: end}))
+    return groups
+
+
+def regression_table(events, windows=CAR_WINDOWS, terms=SPEC_TERMS, cluster_col=CLUSTER_COL):
+    """
+    Fit every window x nested spec on the spec's own complete cases (rows
+    with its regressors and every CAR present; n per spec). Specs with no
+    residual degrees of freedom left are skipped with a warning.
+    Long format, one row per coefficient.
+    """
+    events = add_derived_terms(events)
+    names_y = [w for w in windows if w in events.columns]
+    X, names, ends = design_matrix(events, terms)
+    Y = events[names_y].to_numpy(dtype=float, na_value=np.nan)
+
+    frames = []
+    for sample, ends_in_sample in spec_samples(X, Y, ends):
+        n = int(sample.sum())
+        last = max(ends_in_sample.values())
+        Q, R, keep = qr_drop_aliased(X[sample, :last])
+        kept_names = [nm for nm, k in zip(names, keep) if k]
+        n_kept = np.cumsum(keep)
+
+        spec_sizes = {}
+        for spec, end in ends_in_sample.items():
+            k = int(n_kept[end - 1])
+            if k >= n:
+                print(f"[WARN] Skipping spec {spec}: {k} independent regressors for {n} events")
+            else:
+                spec_sizes[spec] = k
+        if not spec_sizes:
+            continue
+
+        clusters = events.loc[sample, cluster_col].to_numpy()
+        fits = fit_nested(Q, R, Y[sample], clusters, spec_sizes)
+
+        for spec, fit in fits.items():
+            k = fit["k"]
+            for w, window in enumerate(names_y):
+                frames.append(pd.DataFrame({
+                    "spec": spec, "window": window, "term": kept_names[:k],
+                    **{key: fit[key][:, w] for key in
+                       ("coef", "se_hc1", "t_hc1", "p_hc1", "se_cluster", "t_cluster", "p_cluster")},
+                    "n": n, "r2": fit["r2"][w],
+                }))
+
+    if not frames:
+        raise ValueError("No specification has more complete events than regressors")
+    return pd.concat(frames, ignore_index=True)
+
+
+# === MAIN ================================================================== #
+
+def main():
+    warn_serial("car_regression")
+    print("📥 Loading events with context...")
+    events = read_table("events_with_context")
+    print(f"✅ Loaded {len(events)} events")
+
+    if table_exists("event_sales"):
+        sales = read_table("event_sales", columns=["event_id", "global_sales"])
+        events = events.merge(sales, on="event_id", how="left")
+        print(f"✅ Sales matched for {events['global_sales'].notna().sum()} events")
+
+    print("\n📊 Fitting all windows x specifications...")
+    table = regression_table(events)
+    print(f"✅ {table[['spec', 'window']].drop_duplicates().shape[0]} fits")
+    for spec, n in table.groupby("spec", sort=False)["n"].first().items():
+        print(f"   {spec}: {n} events")
+
+    out_path = write_table(table, "car_regression")
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    table.to_csv(RESULTS_DIR / "car_regression.csv", index=False)
+    print(f"✅ Saved: {out_path}")
+    print(f"✅ Saved: {RESULTS_DIR / 'car_regression.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+CAR surface: the CAR of every window (a, b) for every event.
+
+The events x relative-day AR tensor (default -20..+20) is extracted once
+and turned into per-event cumulative sums, so CAR(a, b) for any pair is
+one difference of two columns. Only the cumulative sums are saved, in a
+compressed .npz next to the processed tables; any window can then be
+explored (e.g. to pick the LABEL_WINDOW) without rerunning the
+pipeline.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, write_table
+from ..sharded import warn_serial
+from .market_model import MarketModel
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_PROCESSED = BASE_DIR / "data" / "processed"
+SURFACE_PATH = DATA_PROCESSED / "car_surface.npz"
+
+SURFACE_RANGE = (-20, 20)
+
+
+class CarSurface:
+    """Per-event cumulative ARs over relative days [first, last]"""
+
+    def __init__(self, event_ids, first, cumsum):
+        self.event_ids = np.asarray(event_ids)
+        self.first = int(first)
+        self.last = self.first + cumsum.shape[1] - 2
+        self.cumsum = cumsum
+
+    @classmethod
+    def from_model(cls, model, events, day_range=SURFACE_RANGE):
+        """Extract the AR tensor of every event with its own alpha/beta"""
+        first, last = day_range
+        positions = model.calendar.locate(events["ticker"], events["trading_date"])
+        alpha = events["alpha"].to_numpy(dtype=float, na_value=np.nan)
+        beta = events["beta"].to_numpy(dtype=float, na_value=np.nan)
+        ar = model.ar_matrix(positions, np.arange(first, last + 1), alpha, beta)
+
+        # NaN days add nothing (same as car_at); unknown events and events
+        # without market-model parameters stay NaN
+        cumsum = np.zeros((len(events), ar.shape[1] + 1))
+        cumsum[:, 1:] = np.nancumsum(ar, axis=1)
+        cumsum[(positions < 0) | np.isnan(alpha) | np.isnan(beta)] = np.nan
+        return cls(events["event_id"].to_numpy(), first, cumsum)
+
+    @property
+    def days(self):
+        return np.arange(self.first, self.last + 1)
+
+    def car(self, a, b):
+        """CAR over relative days [a, b] of every event"""
+        if not self.first <= a <= b <= self.last:
+            raise ValueError(f"Window ({a}, {b}) outside the surface [{self.first}, {self.last}]")
+        return self.cumsum[:, b - self.first + 1] - self.cumsum[:, a - self.first]
+
+    def surface(self):
+        """Tensor (events, a, b) of every CAR; NaN where a > b"""
+        ends = self.cumsum[:, None, 1:]
+        starts = self.cumsum[:, :-1, None]
+        out = ends - starts
+        a, b = np.meshgrid(self.days, self.days, indexing="ij")
+        out[:, a > b] = np.nan
+        return out
+
+    def windows(self, windows):
+        """Frame of named windows, e.g. {"CAR_0_5": (0, 5)}, indexed by event_id"""
+        return pd.DataFrame(
+            {name: self.car(a, b) for name, (a, b) in windows.items()},
+            index=pd.Index(self.event_ids, name="event_id"),
+        )
+
+    def summary(self):
+        """Mean, std, cross-sectional t and count of CAR for every (a, b)"""
+        cars = self.surface()
+        a, b = np.meshgrid(self.days, self.days, indexing="ij")
+        keep = a <= b
+
+        valid = ~np.isnan(cars)
+        n = valid.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(valid, cars, 0.0).sum(axis=0) / n
+            var = (np.where(valid, cars - mean, 0.0) ** 2).sum(axis=0) / (n - 1)
+            t = mean / np.sqrt(var / n)
+
+        return pd.DataFrame({
+            "start": a[keep], "end": b[keep], "n": n[keep],
+            "mean_car": mean[keep], "std_car": np.sqrt(var[keep]), "t_cs": t[keep],
+        })
+
+    # === PERSISTENCE ======================================================= #
+
+    def save(self, path=SURFACE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path, event_ids=self.event_ids.astype(str), first=self.first, cumsum=self.cumsum,
+        )
+        return path
+
+    @classmethod
+    def load(cls, path=SURFACE_PATH):
+        with np.load(path) as data:
+            return cls(data["event_ids"], int(data["first"]), data["cumsum"])
+
+
+# === MAIN ================================================================== #
+
+def main():
+    warn_serial("car_surface")
+    print("📥 Loading data...")
+    events = read_table("events_labeled")
+    prices = read_table("prices_with_ar")
+    print(f"✅ Loaded {len(events)} events")
+
+    print(f"\n📊 Building CAR surface over days {SURFACE_RANGE}...")
+    surface = CarSurface.from_model(MarketModel.from_prices(prices), events)
+    path = surface.save()
+    print(f"✅ Saved: {path} ({surface.cumsum.shape[0]} events x {len(surface.days)} days)")
+
+    summary = surface.summary()
+    out_path = write_table(summary, "car_surface_summary")
+    print(f"✅ Saved: {out_path}")
+    print("\nStrongest windows by |t|:")
+    print(summary.reindex(summary["t_cs"].abs().sort_values(ascending=False).index).head(10))
+
+
+if __name__ == "__main__":
+    main()
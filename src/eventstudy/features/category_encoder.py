@@ -0,0 +1,115 @@
+"""
+One-hot encoder with a fixed, persisted category vocabulary.
+
+pd.get_dummies derives its columns from whatever values the frame holds,
+so a training set and a scoring set can end up with different feature
+spaces. CategoryEncoder learns the vocabulary once (fit), saves it as
+JSON, and from then on maps any frame onto the same columns:
+
+- every known category has one column (the first one is dropped as the
+  reference level, like get_dummies(drop_first=True))
+- unseen and missing values go to a per-column "__other__" column
+- the output is a SciPy CSR matrix of uint8 with one entry per row and
+  column at most, so memory grows with rows x encoded columns, not with
+  the number of categories
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+OTHER = "__other__"
+
+
+def clean_values(values, lower=False):
+    """Stripped strings (lower-cased if asked); missing values stay missing"""
+    values = values.astype("string").str.strip()
+    return values.str.lower() if lower else values
+
+
+class CategoryEncoder:
+    """Fixed vocabulary per column -> sparse one-hot matrix"""
+
+    def __init__(self, vocabulary, drop_first=True, lower=()):
+        self.vocabulary = {col: list(cats) for col, cats in vocabulary.items()}
+        self.drop_first = drop_first
+        self.lower = tuple(lower)
+
+        # Column block of each encoded column: [known categories..., OTHER]
+        self.offsets, names, start = {}, [], 0
+        for col, cats in self.vocabulary.items():
+            kept = cats[1:] if drop_first else cats
+            self.offsets[col] = start
+            names.extend(f"{col}_{cat}" for cat in kept)
+            names.append(f"{col}_{OTHER}")
+            start += len(kept) + 1
+        self.feature_names = names
+
+    @classmethod
+    def fit(cls, df, columns, min_count=1, drop_first=True, lower=()):
+        """
+        Learn the sorted vocabulary of every column present in df.
+        Categories seen fewer than min_count times are left to OTHER.
+        """
+        vocabulary = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            counts = clean_values(df[col], col in lower).value_counts()
+            vocabulary[col] = sorted(counts.index[counts >= min_count])
+        return cls(vocabulary, drop_first, lower)
+
+    @property
+    def columns(self):
+        return list(self.vocabulary)
+
+    def codes(self, df):
+        """
+        Compact per-column category codes (int32, -1 for unseen/missing):
+        array (rows, columns) in vocabulary order.
+        """
+        out = np.full((len(df), len(self.vocabulary)), -1, dtype=np.int32)
+        for j, (col, cats) in enumerate(self.vocabulary.items()):
+            if col in df.columns:
+                values = clean_values(df[col], col in self.lower)
+                out[:, j] = pd.Categorical(values, categories=cats).codes
+        return out
+
+    def transform(self, df):
+        """Sparse uint8 one-hot matrix (rows, len(feature_names))"""
+        from scipy import sparse
+
+        codes = self.codes(df)
+        rows, cols = [], []
+        for j, (col, cats) in enumerate(self.vocabulary.items()):
+            code = codes[:, j]
+            n_kept = len(cats) - 1 if self.drop_first else len(cats)
+            column = np.where(code < 0, n_kept, code - 1 if self.drop_first else code)
+            hit = column >= 0    # the dropped reference level has no column
+            rows.append(np.flatnonzero(hit))
+            cols.append(self.offsets[col] + column[hit])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.uint8), (rows, cols)),
+            shape=(len(df), len(self.feature_names)),
+        )
+
+    # === PERSISTENCE ======================================================= #
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "vocabulary": self.vocabulary,
+            "drop_first": self.drop_first,
+            "lower": list(self.lower),
+        }, indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        state = json.loads(Path(path).read_text())
+        return cls(state["vocabulary"], state["drop_first"], state["lower"])
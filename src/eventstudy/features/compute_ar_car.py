@@ -2,11 +2,15 @@
 Compute Abnormal Returns (AR) and Cumulative Abnormal Returns (CAR)
 """
 
-import pandas as pd
-import statsmodels.api as sm
 import numpy as np
 from pathlib import Path
 
+from ..data.store import read_table, write_table
+from ..sharded import map_event_shards, map_panel_shards, parse_jobs
+from .compute_returns import RETURN_PANEL
+from .market_model import ESTIMATION_WINDOW, MarketModel
+from .price_panel import PricePanel
+
 # === SETUP ================================================================= #
 
 BASE_DIR = Path(__file__).resolve().parents[3]
@@ -14,31 +18,23 @@ BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_RAW = BASE_DIR / "data" / "raw"
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
-print(f"BASE_DIR: {BASE_DIR}")
-print(f"DATA_PROCESSED exists: {DATA_PROCESSED.exists()}")
-
 
 # === LOAD DATA ============================================================= #
 
 def load_prices():
-    prices = pd.read_csv(DATA_PROCESSED / "prices_with_returns.csv")
-    prices["date"] = pd.to_datetime(prices["date"])
-    prices["ticker"] = prices["ticker"].astype(str).str.upper()
-    return prices
+    return read_table("prices_with_returns")
 
 
 def load_events():
-    events = pd.read_csv(DATA_PROCESSED / "events_with_returns.csv", sep=";")  # ✅ ADD sep=";"
-    print("Columns in events_with_returns.csv:", events.columns.tolist())
+    events = read_table("events_with_returns")
+    print("Columns in events_with_returns:", events.columns.tolist())
     print(events.head())
     
-    events["event_date"] = pd.to_datetime(events["event_date"])
-    events["trading_date"] = pd.to_datetime(events["trading_date"])
-    
     # ✅ Fix: use the correct column name
     if "ticker" in events.columns:
-        events["ticker"] = events["ticker"].astype(str).str.upper()
-    elif "ticker_x" in events.columns:
+        return events
+
+    if "ticker_x" in events.columns:
         events["ticker"] = events["ticker_x"].astype(str).str.upper()
     elif "ticker_y" in events.columns:
         events["ticker"] = events["ticker_y"].astype(str).str.upper()
@@ -51,118 +47,154 @@ def load_events():
 
 # === ESTIMATE ALPHA & BETA ================================================= #
 
-def estimate_alpha_beta(prices, ticker, market_ticker="SP500"):
-    """Estimate alpha and beta using numpy"""
-    df = prices[prices["ticker"] == ticker].dropna(subset=["return", "market_return"])
-    
-    if df.empty:
-        print(f"[WARN] No data for ticker {ticker}")
-        return None, None
-    
-    X = df["market_return"].values
-    y = df["return"].values
-    
-    # Add constant for alpha
-    X_with_const = np.column_stack([np.ones(len(X)), X])
-    
-    # Solve using least squares
-    params = np.linalg.lstsq(X_with_const, y, rcond=None)[0]
-    alpha = params[0]
-    beta = params[1]
-    
-    return alpha, beta
-
+def load_return_panel(prices, path=RETURN_PANEL):
+    """
+    The return panel saved by compute_returns, memory-mapped. Rebuilt from
+    the rows when it is missing or does not cover them (daily updates
+    append rows to prices_with_returns, not to the panel).
+    """
+    if PricePanel.paths(path)[0].exists():
+        panel = PricePanel.load(path)
+        if panel.covers(prices):
+            return panel
+        print(f"[WARN] {path} does not cover prices_with_returns, rebuilding it in memory")
+    return PricePanel.from_long(prices, value_col="return")
+
+
+def shard_alpha_beta(panel, first, last, market):
+    """Full-sample alpha/beta of panel columns [first, last) (run in a pool worker)"""
+    alpha, beta = PricePanel.fit_market_model(panel.values[:, first:last], market[:, None])
+    return panel.tickers[first:last], alpha, beta
+
+
+def fit_alpha_beta(prices, panel=None):
+    """
+    Full-sample alpha/beta of every ticker as column-wise OLS on the
+    return panel. Returns (tickers, alpha, beta).
+    """
+    if panel is None:
+        panel = PricePanel.from_long(prices, value_col="return")
+
+    # Market return per date, taken from the rows themselves
+    market = panel.by_date(prices, "market_return")
+    return shard_alpha_beta(panel, 0, len(panel.tickers), market)
+
+
+def build_alpha_beta_table(prices, panel=None, jobs=1):
+    """
+    Build table of full-sample alpha/beta for all tickers (used for prices AR).
+    With jobs > 1 column ranges of the return panel are fitted on a process
+    pool whose workers memory-map the panel file.
+    """
+    if jobs > 1:
+        if panel is None:
+            panel = PricePanel.from_long(prices, value_col="return")
+        market = panel.by_date(prices, "market_return")
+        parts = map_panel_shards(shard_alpha_beta, panel, jobs, (market,))
+        tickers = [t for part in parts for t in part[0]]
+        alpha = np.concatenate([part[1] for part in parts])
+        beta = np.concatenate([part[2] for part in parts])
+    else:
+        tickers, alpha, beta = fit_alpha_beta(prices, panel)
 
-def build_alpha_beta_table(prices):
-    """Build table of alpha/beta for all tickers"""
-    tickers = prices["ticker"].unique()
     ab_table = {}
+    for t, a, b in zip(tickers, alpha, beta):
+        if np.isnan(a):
+            print(f"[WARN] No data for ticker {t}")
+            ab_table[t] = {"alpha": None, "beta": None}
+        else:
+            ab_table[t] = {"alpha": a, "beta": b}
+            print(f"  {t}: alpha={a:.4f}, beta={b:.4f}")
 
-    for t in tickers:
-        alpha, beta = estimate_alpha_beta(prices, t)
-        ab_table[t] = {"alpha": alpha, "beta": beta}
-        if alpha is not None:
-            print(f"  {t}: alpha={alpha:.4f}, beta={beta:.4f}")
-    
     return ab_table
 
 
 # === COMPUTE ABNORMAL RETURNS ============================================== #
 
-def compute_ar(row, ab_table):
-    """Compute abnormal return for a single event"""
-    ticker = row["ticker"]
-    
-    # Handle missing ticker in ab_table
-    if ticker not in ab_table or ab_table[ticker]["alpha"] is None:
-        return None
-    
-    alpha = ab_table[ticker]["alpha"]
-    beta = ab_table[ticker]["beta"]
-    
-    # Expected return = alpha + beta * market_return
-    expected_return = alpha + beta * row["market_return"]
-    
-    # Abnormal return = actual return - expected return
-    abnormal_return = row["return"] - expected_return
-    
-    return abnormal_return
+def ab_arrays(ab_table, tickers):
+    """Map tickers to alpha/beta arrays (NaN where no estimate exists)"""
+    alpha = np.full(len(tickers), np.nan)
+    beta = np.full(len(tickers), np.nan)
+    for i, t in enumerate(tickers):
+        params = ab_table.get(t)
+        if params is not None and params["alpha"] is not None:
+            alpha[i] = params["alpha"]
+            beta[i] = params["beta"]
+    return alpha, beta
 
 
-def compute_prices_ar(prices, ab_table):
-    """Add expected return and AR columns to prices"""
-    prices["expected_return"] = prices.apply(
-        lambda r: ab_table[r["ticker"]]["alpha"] + ab_table[r["ticker"]]["beta"] * r["market_return"]
-        if pd.notnull(r["market_return"]) and ab_table[r["ticker"]]["alpha"] is not None else None,
-        axis=1
-    )
-    prices["AR"] = prices["return"] - prices["expected_return"]
+def compute_prices_ar(prices, ab_table, panel=None):
+    """
+    Add expected return, AR and cum_AR columns to prices: whole-matrix
+    operations on the return panel, gathered back to the rows.
+    """
+    if panel is None:
+        panel = PricePanel.from_long(prices, value_col="return")
+    alpha, beta = ab_arrays(ab_table, panel.tickers)
+    market = panel.scatter(prices, "market_return")
+
+    expected = PricePanel.expected_returns(market, alpha, beta)
+    ar = PricePanel.abnormal_returns(panel.values, expected)
+    prices["expected_return"] = panel.gather(expected, prices)
+    prices["AR"] = panel.gather(ar, prices)
+
+    # Running AR per ticker (NaN days add nothing): the CAR between two rows
+    # is a difference, and daily updates continue it from the last value
+    prices["cum_AR"] = panel.gather(PricePanel.car(ar), prices)
     return prices
 
 
 # === COMPUTE CUMULATIVE ABNORMAL RETURNS ================================== #
 
-def compute_car(prices, ticker, trading_date, window=(-1, 1)):
-    """Compute cumulative abnormal return for a window around event date"""
-    start = trading_date + pd.Timedelta(days=window[0])
-    end = trading_date + pd.Timedelta(days=window[1])
-    
-    df = prices[(prices["ticker"] == ticker) &
-                (prices["date"] >= start) &
-                (prices["date"] <= end)]
-    
-    car = df["AR"].sum()
-    return car
+# Windows are in trading days relative to the event's trading day
+CAR_WINDOWS = {
+    "CAR_m1_p1": (-1, 1),   # 3 trading days
+    "CAR_m5_p5": (-5, 5),   # 11 trading days
+}
+
+
+def shard_events_car(prices, events, estimation_window):
+    """compute_events_car on one ticker shard (run in a pool worker)"""
+    return compute_events_car(events.copy(), prices, estimation_window=estimation_window)
+
+
+def compute_events_car(events, prices, model=None, estimation_window=ESTIMATION_WINDOW, jobs=1):
+    """
+    Add per-event market-model parameters, AR_event and CAR columns to events.
+    Alpha/beta are fitted on each event's own estimation window.
+    With jobs > 1 (and no model) events are computed per ticker shard on a
+    process pool and a new frame is returned.
+    """
+    if model is None and jobs > 1:
+        ordered = prices.sort_values(["ticker", "date"], kind="stable")
+        return map_event_shards(
+            shard_events_car, events, ordered, ["return", "market_return"], jobs, (estimation_window,)
+        )
+
+    if model is None:
+        model = MarketModel.from_prices(prices)
 
+    positions = model.calendar.locate(events["ticker"], events["trading_date"])
+    params = model.estimate(positions, window=estimation_window)
+    for col in params.columns:
+        events[col] = params[col].to_numpy()
 
-def compute_events_car(events, prices):
-    """Add CAR columns to events"""
     # AR at event date
-    events["AR_event"] = events.apply(
-        lambda r: compute_ar(r, ab_table) if pd.notnull(r["trading_date"]) else None,
-        axis=1
-    )
-    
-    # CAR(-1, +1) - 3-day window
-    events["CAR_m1_p1"] = events.apply(
-        lambda r: compute_car(prices, r["ticker"], r["trading_date"], window=(-1, 1))
-        if pd.notnull(r["trading_date"]) else None,
-        axis=1
-    )
-    
-    # CAR(-5, +5) - 11-day window
-    events["CAR_m5_p5"] = events.apply(
-        lambda r: compute_car(prices, r["ticker"], r["trading_date"], window=(-5, 5))
-        if pd.notnull(r["trading_date"]) else None,
-        axis=1
-    )
-    
+    events["AR_event"] = model.car_at(positions, 0, 0, params["alpha"], params["beta"])
+
+    for col, (start, end) in CAR_WINDOWS.items():
+        events[col] = model.car_at(positions, start, end, params["alpha"], params["beta"])
+
     return events
 
 
 # === MAIN ================================================================== #
 
 def main():
+    print(f"BASE_DIR: {BASE_DIR}")
+    print(f"DATA_PROCESSED exists: {DATA_PROCESSED.exists()}")
+
+    jobs = parse_jobs()
     print("\n📥 Loading data...")
     prices = load_prices()
     print(f"✅ Loaded {len(prices)} price rows")
@@ -171,35 +203,34 @@ def main():
     events = load_events()
     print(f"✅ Loaded {len(events)} events")
     
-    print("\n📊 Estimating alpha & beta...")
-    global ab_table
-    ab_table = build_alpha_beta_table(prices)
+    panel = load_return_panel(prices)
+    print(f"✅ Return panel {panel.values.shape} from {panel.path or 'prices_with_returns'}")
+
+    print(f"\n📊 Estimating alpha & beta ({jobs} job(s))...")
+    ab_table = build_alpha_beta_table(prices, panel, jobs=jobs)
     
     print("\n📈 Computing prices AR...")
-    prices = compute_prices_ar(prices, ab_table)
+    prices = compute_prices_ar(prices, ab_table, panel)
     
-    print("\n📊 Computing events AR & CAR...")
-    events = compute_events_car(events, prices)
+    print(f"\n📊 Computing events AR & CAR (estimation window {ESTIMATION_WINDOW})...")
+    events = compute_events_car(events, prices, jobs=jobs)
     
     print("\n✅ Sample results:")
-    print(events[["event_id", "ticker", "event_date", "trading_date", "AR_event", "CAR_m1_p1", "CAR_m5_p5"]].head(10))
+    print(events[["event_id", "ticker", "trading_date", "alpha", "beta", "AR_event", "CAR_m1_p1", "CAR_m5_p5"]].head(10))
     
     print("\n📁 Saving results...")
-    out_path = DATA_PROCESSED / "events_with_car.csv"
-    
     # ✅ Keep all columns EXCEPT source_url and notes
     cols_to_drop = ["source_url", "notes"]
     cols_to_save = [col for col in events.columns if col not in cols_to_drop]
-    events[cols_to_save].to_csv(out_path, sep=";", index=False)
+    out_path = write_table(events[cols_to_save], "events_with_car")
     
     print(f"✅ Saved: {out_path}")
     print(f"   Columns saved: {cols_to_save}")
     
     # Also save prices with AR
-    prices_out = DATA_PROCESSED / "prices_with_ar.csv"
-    prices.to_csv(prices_out, index=False)
+    prices_out = write_table(prices, "prices_with_ar")
     print(f"✅ Saved: {prices_out}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
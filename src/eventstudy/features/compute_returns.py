@@ -2,61 +2,111 @@
 Compute daily returns and market returns.
 """
 
-import pandas as pd
+import numpy as np
 from pathlib import Path
 
+from ..data.store import read_table, write_table
+from ..sharded import map_shards, parse_jobs
+from .price_panel import PricePanel
+
 # Use __file__ for scripts (not Path.cwd())
 BASE_DIR = Path(__file__).resolve().parents[3]
 
 DATA_RAW = BASE_DIR / "data" / "raw"
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
-print(f"Project root: {BASE_DIR}")
-print(f"Data processed: {DATA_PROCESSED}")
+MARKET_TICKER = "SP500"
+# Date x ticker return matrix (.npy + .json), memory-mapped by compute_ar_car
+RETURN_PANEL = DATA_PROCESSED / "return_panel"
+
+
+# === LOAD PRICES =========================================================== #
+
+def load_prices():
+    prices = read_table("prices_long")
+
+    print(f"\n✅ Loaded {len(prices)} records")
+    print(prices.head())
+    return prices
+
+
+def clean_tickers(prices, verbose=True):
+    """Map raw tickers onto the names used across the pipeline"""
+    prices["ticker"] = (
+        prices["ticker"]
+        .str.replace("^GSPC", "SP500", regex=False)
+        .str.replace("UBI.PA", "UBSFY", regex=False)
+        .str.upper()
+    )
+
+    if verbose:
+        print(f"\nUnique tickers: {prices['ticker'].unique()}")
+    return prices
+
+
+# === COMPUTE RETURNS ======================================================= #
+
+def shard_returns(prices):
+    """Returns of one ticker shard's rows (run in a pool worker)"""
+    panel = PricePanel.from_long(prices)
+    return panel.gather(panel.returns(), prices)
+
+
+def add_returns(prices, panel=None, jobs=1):
+    """
+    Daily returns from the dense date x ticker panel, gathered back to rows.
+    With jobs > 1 ticker shards are computed on a process pool instead.
+    """
+    prices = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
+    if jobs > 1:
+        prices["return"] = np.concatenate(map_shards(shard_returns, prices, ["adj_close"], jobs))
+    else:
+        if panel is None:
+            panel = PricePanel.from_long(prices)
+        prices["return"] = panel.gather(panel.returns(), prices)
+
+    print(f"\n✅ Computed daily returns")
+    print(prices.head(10))
+    return prices
+
 
-# Load prices
-prices = pd.read_csv(DATA_PROCESSED / "prices_long.csv")
-prices["date"] = pd.to_datetime(prices["date"])
-prices["ticker"] = prices["ticker"].astype(str).str.upper()
+def add_market_returns(prices, market_ticker=MARKET_TICKER, panel=None):
+    """Market return of each row's date (NaN on days without a market bar)"""
+    if panel is None:
+        panel = PricePanel.from_long(prices)
 
-print(f"\n✅ Loaded {len(prices)} records")
-print(prices.head())
+    market = panel.market_returns(panel.returns(), market_ticker)[:, 0]
+    rows, _ = panel.cells(prices)
+    prices["market_return"] = market[rows]
 
-# Clean tickers
-prices["ticker"] = (
-    prices["ticker"]
-    .str.replace("^GSPC", "SP500", regex=False)
-    .str.replace("UBI.PA", "UBSFY", regex=False)
-    .str.upper()
-)
+    print(f"\n✅ Added market returns")
+    print(prices.head(10))
+    return prices
 
-print(f"\nUnique tickers: {prices['ticker'].unique()}")
 
-# Compute returns
-prices = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
-prices["return"] = prices.groupby("ticker")["adj_close"].pct_change()
+# === MAIN ================================================================== #
 
-print(f"\n✅ Computed daily returns")
-print(prices.head(10))
+def main():
+    print(f"Project root: {BASE_DIR}")
+    print(f"Data processed: {DATA_PROCESSED}")
 
-# Add market returns
-market_ticker = "SP500"
-market = prices[prices["ticker"] == market_ticker][["date", "return"]].rename(
-    columns={"return": "market_return"}
-)
+    jobs = parse_jobs()
+    prices = load_prices()
+    prices = clean_tickers(prices)
 
-prices = prices.merge(market, on="date", how="left")
+    panel = PricePanel.from_long(prices)
+    prices = add_returns(prices, panel, jobs)
+    prices = add_market_returns(prices, panel=panel)
 
-print(f"\n✅ Added market returns")
-print(prices.head(10))
+    return_panel = PricePanel(panel.dates, panel.tickers, panel.returns())
+    panel_file = return_panel.save(RETURN_PANEL)
+    print(f"\n✅ Saved return panel: {panel_file} {return_panel.values.shape}")
 
-# Save results
-output_file = DATA_PROCESSED / "prices_with_returns.csv"
-prices.to_csv(output_file, index=False)
-print(f"\n✅ Saved to: {output_file}")
-print(f"   Shape: {prices.shape}")
-print(f"   Columns: {prices.columns.tolist()}")
+    output_file = write_table(prices, "prices_with_returns")
+    print(f"\n✅ Saved to: {output_file}")
+    print(f"   Shape: {prices.shape}")
+    print(f"   Columns: {prices.columns.tolist()}")
 
 
 if __name__ == "__main__":
-    pass  # All code runs above
\ No newline at end of file
+    main()
@@ -0,0 +1,293 @@
+"""
+Incremental daily update of returns, ARs and event CARs.
+
+A full run (compute_returns, compute_ar_car) recomputes every return,
+alpha/beta, AR and CAR from the whole history. The update only touches
+bars newer than the last processed date of each ticker:
+
+- returns of the new bars chain on each ticker's last close
+- ARs use the full-sample alpha/beta of the last full run and continue
+  each ticker's cumulative AR (cum_AR)
+- events dated after their ticker's previous last date were aligned
+  against a history that ended too early; they are aligned again
+- only events whose AR/CAR window reaches a new bar are recomputed, from
+  a per-ticker tail of the last TAIL_DAYS rows (enough for their
+  estimation window)
+
+New rows are appended to prices_with_returns and prices_with_ar as new
+partitions, so the cost follows the new data, not the history. The state
+is update_state.json (last date/close, alpha/beta and cum_AR per ticker)
+plus the small update_tail table.
+
+    python -m eventstudy.features.daily_update init    # once, after a full run
+    python -m eventstudy.features.daily_update         # nightly, after the fetcher
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.fetcher import BARS_DIR
+from ..data.store import DATA_PROCESSED, append_table, read_table, write_table
+from ..sharded import default_jobs, warn_serial
+from .compute_ar_car import (
+    CAR_WINDOWS,
+    ab_arrays,
+    build_alpha_beta_table,
+    compute_events_car,
+)
+from .compute_returns import MARKET_TICKER, clean_tickers
+from .market_model import ESTIMATION_WINDOW, MarketModel
+from .merge_event_returns import ALIGN_DIRECTION, align_events
+from .trading_calendar import TradingCalendar
+
+STATE_PATH = DATA_PROCESSED / "update_state.json"
+TAIL_TABLE = "update_tail"
+TAIL_COLUMNS = ["date", "ticker", "adj_close", "return", "market_return"]
+AR_COLUMNS = ["expected_return", "AR", "cum_AR"]
+
+# Last relative day any event column looks at (AR_event is day 0)
+MAX_EVENT_OFFSET = max(0, max(end for _, end in CAR_WINDOWS.values()))
+# Rows per ticker kept for events whose window may reach a new bar
+TAIL_DAYS = -ESTIMATION_WINDOW[0] + MAX_EVENT_OFFSET + 1
+
+
+# === STATE ================================================================= #
+
+def build_state(prices, market_ticker=MARKET_TICKER, tail_days=TAIL_DAYS):
+    """State and tail of a full run's prices_with_ar (read once)"""
+    prices = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
+    prices["ticker"] = prices["ticker"].astype(str)
+    if "cum_AR" not in prices.columns:
+        prices["cum_AR"] = prices["AR"].fillna(0.0).groupby(prices["ticker"]).cumsum()
+
+    last = prices.groupby("ticker").tail(1).set_index("ticker")
+    closes = prices.dropna(subset=["adj_close"]).groupby("ticker")["adj_close"].last()
+    alpha, beta = ab_arrays(build_alpha_beta_table(prices), last.index)
+
+    tickers = {}
+    for i, (ticker, row) in enumerate(last.iterrows()):
+        tickers[ticker] = {
+            "last_date": str(row["date"].date()),
+            "last_close": float(closes.get(ticker, np.nan)),
+            "alpha": float(alpha[i]),
+            "beta": float(beta[i]),
+            "cum_ar": float(row["cum_AR"]),
+        }
+
+    state = {"market_ticker": market_ticker, "columns": list(prices.columns), "tickers": tickers}
+    tail = prices.groupby("ticker").tail(tail_days)[TAIL_COLUMNS]
+    return state, tail.reset_index(drop=True)
+
+
+def load_state(path=STATE_PATH):
+    if not Path(path).exists():
+        raise FileNotFoundError(f"No update state at {path}; run `daily_update init` first")
+    return json.loads(Path(path).read_text())
+
+
+def save_state(state, path=STATE_PATH):
+    Path(path).write_text(json.dumps(state, indent=2))
+    return path
+
+
+# === NEW BARS ============================================================== #
+
+def read_new_bars(state, root=BARS_DIR):
+    """Fetcher bars after the oldest last date of the state (clean tickers)"""
+    since = min(pd.Timestamp(t["last_date"]) for t in state["tickers"].values())
+    frames = [
+        read_table(path.stem, root, filters=[("date", ">", since)])
+        for path in sorted(Path(root).glob("bars_*.parquet"))
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["date", "ticker", "adj_close"])
+    bars = pd.concat(frames, ignore_index=True)
+    bars["ticker"] = bars["ticker"].astype(str)
+    return clean_tickers(bars)
+
+
+def price_rows(bars, state, tail):
+    """
+    Rows of the bars newer than each ticker's last date, with return,
+    market_return, expected_return, AR and cum_AR. Bars of tickers the
+    state does not know are dropped (they need a full run).
+    """
+    params = pd.DataFrame.from_dict(state["tickers"], orient="index")
+    params["last_date"] = pd.to_datetime(params["last_date"])
+
+    bars = bars[bars["ticker"].isin(params.index)]
+    known = params.reindex(bars["ticker"])
+    new = bars[bars["date"].to_numpy() > known["last_date"].to_numpy()]
+    new = new.sort_values(["ticker", "date"]).reset_index(drop=True)
+    p = params.reindex(new["ticker"]).reset_index(drop=True)
+
+    # Returns against the previous close, the stored one for the first new bar
+    prev = new.groupby("ticker")["adj_close"].shift(1).fillna(p["last_close"])
+    new["return"] = new["adj_close"] / prev - 1.0
+
+    # Market return of each date, from this batch or from earlier updates
+    market_ticker = state["market_ticker"]
+    market = pd.concat([
+        tail.loc[tail["ticker"] == market_ticker, ["date", "return"]],
+        new.loc[new["ticker"] == market_ticker, ["date", "return"]],
+    ]).drop_duplicates("date", keep="last").set_index("date")["return"]
+    new["market_return"] = new["date"].map(market).astype(float)
+
+    new["expected_return"] = p["alpha"] + p["beta"] * new["market_return"]
+    new["AR"] = new["return"] - new["expected_return"]
+    new["cum_AR"] = p["cum_ar"] + new["AR"].fillna(0.0).groupby(new["ticker"]).cumsum()
+    return new
+
+
+# === AFFECTED EVENTS ======================================================= #
+
+def realign_events(events, frame, calendar, state, direction=ALIGN_DIRECTION):
+    """
+    Align again the events dated after their ticker's last date before
+    this update: the full run put them on its last bar (or left them
+    unmatched), the new bars may hold their real trading day.
+    Returns (events, mask of the realigned events).
+    """
+    if "event_date" not in events.columns:
+        return events, np.zeros(len(events), dtype=bool)
+
+    last_dates = pd.Series({t: pd.Timestamp(p["last_date"]) for t, p in state["tickers"].items()})
+    last_date = last_dates.reindex(events["ticker"].astype(str)).to_numpy(dtype="datetime64[ns]")
+    event_date = pd.to_datetime(events["event_date"]).to_numpy(dtype="datetime64[ns]")
+    stale = event_date > last_date    # NaT (unknown ticker, no date) compares False
+    if not stale.any():
+        return events, stale
+
+    events = events.copy()
+    late = events.loc[stale].assign(event_date=pd.to_datetime(events.loc[stale, "event_date"]))
+    positions, _ = align_events(late, calendar, direction)
+    matched = positions >= 0
+
+    rows = frame.iloc[calendar.frame_rows(frame, positions[matched])]
+    aligned = pd.DataFrame(np.nan, index=late.index, columns=["adj_close", "return", "market_return"])
+    aligned["trading_date"] = pd.NaT
+    aligned.loc[late.index[matched], "trading_date"] = rows["date"].to_numpy()
+    for col in ("adj_close", "return", "market_return"):
+        aligned.loc[late.index[matched], col] = rows[col].to_numpy(dtype=float, na_value=np.nan)
+
+    for col in aligned.columns.intersection(events.columns):
+        events.loc[stale, col] = aligned[col].to_numpy()
+    return events, stale
+
+
+def affected_events(events, frame, new, max_offset=MAX_EVENT_OFFSET, calendar=None):
+    """
+    Mask of the events whose [0, max_offset] window reaches one of the new
+    rows. frame is the tail plus the new rows.
+    """
+    if calendar is None:
+        calendar = TradingCalendar.from_prices(frame)
+    positions = calendar.locate(events["ticker"].astype(str), events["trading_date"])
+
+    n_new = np.zeros(len(calendar.tickers), dtype=np.int64)
+    codes = calendar.codes_of(new["ticker"])
+    np.add.at(n_new, codes[codes >= 0], 1)
+    first_new = calendar.ends - n_new
+
+    code = calendar.codes[np.maximum(positions, 0)]
+    return (positions >= 0) & (n_new[code] > 0) & (positions + max_offset >= first_new[code])
+
+
+def update_events(events, frame, mask, calendar=None):
+    """Refit and recompute alpha/beta, AR_event and CARs of the masked events"""
+    if not mask.any():
+        return events
+    events = events.copy()
+    model = MarketModel.from_prices(frame, calendar)
+    redone = compute_events_car(events.loc[mask].copy(), frame, model)
+    for col in redone.columns.intersection(["alpha", "beta", "sigma2", "n_est", "AR_event", *CAR_WINDOWS]):
+        events.loc[mask, col] = redone[col].to_numpy()
+    return events
+
+
+# === UPDATE ================================================================ #
+
+def run_update(bars, state, tail, events, tail_days=TAIL_DAYS):
+    """
+    Apply new bars to the state. Returns (state, tail, new price rows,
+    events, number of recomputed events); nothing is written.
+    """
+    new = price_rows(bars, state, tail)
+    if new.empty:
+        return state, tail, new, events, 0
+
+    frame = pd.concat([tail.reindex(columns=TAIL_COLUMNS), new[TAIL_COLUMNS]], ignore_index=True)
+    frame["ticker"] = frame["ticker"].astype(str)
+    calendar = TradingCalendar.from_prices(frame)
+
+    # Before the state moves on: last dates are those the events were aligned with
+    events, realigned = realign_events(events, frame, calendar, state)
+    mask = affected_events(events, frame, new, calendar=calendar) | realigned
+    events = update_events(events, frame, mask, calendar)
+
+    for ticker, rows in new.groupby("ticker"):
+        last = rows.iloc[-1]
+        state["tickers"][ticker].update(
+            last_date=str(last["date"].date()),
+            last_close=float(last["adj_close"]),
+            cum_ar=float(last["cum_AR"]),
+        )
+
+    tail = frame.sort_values(["ticker", "date"]).groupby("ticker").tail(tail_days)
+    return state, tail.reset_index(drop=True), new, events, int(mask.sum())
+
+
+# === MAIN ================================================================== #
+
+def init():
+    print("📥 Loading prices_with_ar (full history, once)...")
+    prices = read_table("prices_with_ar")
+    state, tail = build_state(prices)
+    save_state(state)
+    write_table(tail, TAIL_TABLE)
+    print(f"✅ State for {len(state['tickers'])} tickers, tail of {len(tail)} rows -> {STATE_PATH}")
+
+
+def update():
+    state = load_state()
+    tail = read_table(TAIL_TABLE)
+    tail["ticker"] = tail["ticker"].astype(str)
+    events = read_table("events_with_car")
+
+    bars = read_new_bars(state)
+    state, tail, new, events, n_events = run_update(bars, state, tail, events)
+    if new.empty:
+        print("✅ No new bars")
+        return
+
+    columns = state["columns"]
+    append_table(new.reindex(columns=[c for c in columns if c not in AR_COLUMNS]), "prices_with_returns")
+    append_table(new.reindex(columns=columns), "prices_with_ar")
+    write_table(tail, TAIL_TABLE)
+    if n_events:
+        write_table(events, "events_with_car")
+    save_state(state)
+
+    print(f"✅ {len(new)} new bar(s) for {new['ticker'].nunique()} ticker(s) "
+          f"({new['date'].min().date()} .. {new['date'].max().date()})")
+    print(f"✅ Recomputed {n_events} event(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental daily update of returns, AR and CAR.")
+    parser.add_argument("command", nargs="?", choices=["update", "init"], default="update")
+    parser.add_argument("--jobs", type=int, default=default_jobs(), help="ignored: runs serially")
+    args = parser.parse_args()
+    warn_serial("daily_update", args.jobs)
+    if args.command == "init":
+        init()
+    else:
+        update()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Intraday event windows on minute / 5-minute bars.
+
+Trailer drops and delay announcements move prices within minutes, so
+these events are measured on intraday bars with windows in minutes, e.g.
+[-30 min, +120 min]. The daily machinery is reused as is: bar timestamps
+take the place of dates in PricePanel, TradingCalendar and MarketModel,
+so a window in minutes becomes an integer bar offset and every CAR is
+still a prefix-sum difference.
+
+Sessions: only bars inside the regular session are kept, so offsets count
+trading time, across session boundaries if needed. The first bar of a
+session returns against the previous session's close (OVERNIGHT_RETURNS):
+news after the close or before the open lands in the opening bar, which is
+where an after-close event's window starts. Without it (or when the
+previous business day's session is not loaded, e.g. after a holiday) the
+opening bar has no return.
+
+Bars are read lazily from the per-(ticker, session) partitions of
+data.intraday: only the sessions covering each event's estimation and
+event windows are loaded.
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.intraday import INTRADAY_DIR, load_sessions, sessions, sessions_around
+from ..data.store import write_table
+from .market_model import MarketModel
+from .price_panel import PricePanel
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_RAW = BASE_DIR / "data" / "raw"
+INTRADAY_EVENTS = DATA_RAW / "intraday_events.csv"    # event_id;ticker;timestamp
+
+SESSION_OPEN = "09:30"
+SESSION_CLOSE = "16:00"
+BAR_MINUTES = 5
+MARKET_TICKER = "SPY"
+EVENT_WINDOWS_MINUTES = {
+    "CAR_m30_p30min": (-30, 30),
+    "CAR_m30_p120min": (-30, 120),
+}
+# Opening bars return against the previous session's close (else NaN)
+OVERNIGHT_RETURNS = True
+# Sessions of bars before the event window used for alpha/beta
+ESTIMATION_SESSIONS = 5
+MIN_ESTIMATION_BARS = 100
+
+
+# === SESSIONS ============================================================== #
+
+def bars_per_session(bar_minutes=BAR_MINUTES, session=(SESSION_OPEN, SESSION_CLOSE)):
+    open_, close = (pd.Timedelta(f"{t}:00") for t in session)
+    return int((close - open_) / pd.Timedelta(minutes=bar_minutes))
+
+
+def in_session(timestamps, session=(SESSION_OPEN, SESSION_CLOSE)):
+    """Bars labelled by their start time: open <= time < close"""
+    timestamps = pd.to_datetime(pd.Series(timestamps))
+    times = timestamps - timestamps.dt.normalize()
+    open_, close = (pd.Timedelta(f"{t}:00") for t in session)
+    return ((times >= open_) & (times < close)).to_numpy()
+
+
+def minutes_to_offsets(window, bar_minutes=BAR_MINUTES):
+    """Window in minutes -> bar offsets [start, end] around the event bar"""
+    start, end = window
+    return math.floor(start / bar_minutes), math.ceil(end / bar_minutes)
+
+
+def estimation_window(windows, bar_minutes=BAR_MINUTES, n_sessions=ESTIMATION_SESSIONS):
+    """Bar offsets of the estimation window, ending before every event window"""
+    first = min(minutes_to_offsets(w, bar_minutes)[0] for w in windows.values())
+    return first - n_sessions * bars_per_session(bar_minutes), first - 1
+
+
+# === LAZY LOADING ========================================================== #
+
+def event_sessions(events, windows=EVENT_WINDOWS_MINUTES, bar_minutes=BAR_MINUTES,
+                   market_ticker=MARKET_TICKER, root=INTRADAY_DIR):
+    """
+    {ticker: session days} needed by the events: the estimation sessions
+    before each event and the sessions its longest window reaches.
+    """
+    per_session = bars_per_session(bar_minutes)
+    est_start, _ = estimation_window(windows, bar_minutes)
+    last = max(minutes_to_offsets(w, bar_minutes)[1] for w in windows.values())
+    before = math.ceil(-est_start / per_session) + 1
+    after = math.ceil(last / per_session) + 1    # +1: after-close events open the next session
+
+    days = pd.to_datetime(events["timestamp"]).dt.normalize().to_numpy(dtype="datetime64[D]")
+    needed = {}
+    for ticker in events["ticker"].astype(str).unique():
+        mask = (events["ticker"].astype(str) == ticker).to_numpy()
+        needed[ticker] = sessions_around(sessions(ticker, root), days[mask], before, after)
+
+    # The market proxy is needed on every session any event ticker needs
+    needed[market_ticker] = sorted(set().union(*needed.values())) if needed else []
+    return needed
+
+
+def load_event_bars(events, root=INTRADAY_DIR, **kwargs):
+    needed = event_sessions(events, root=root, **kwargs)
+    frames = [load_sessions(ticker, days, root) for ticker, days in needed.items()]
+    return pd.concat(frames, ignore_index=True)
+
+
+# === RETURNS & CAR ========================================================= #
+
+def intraday_returns(bars, market_ticker=MARKET_TICKER, overnight=OVERNIGHT_RETURNS):
+    """
+    In-session bars with return and the market proxy's return on the same
+    timestamp. The first bar of a session returns against the close of the
+    previous business day's session with overnight, else it is NaN.
+    """
+    bars = bars[in_session(bars["date"])].copy()
+    bars["date"] = pd.to_datetime(bars["date"])
+    bars["ticker"] = bars["ticker"].astype(str)
+    bars = bars.sort_values(["ticker", "date"]).reset_index(drop=True)
+
+    panel = PricePanel.from_long(bars, value_col="close")
+    # Sessions numbered by business day: the previous trading session is 1 back
+    days = pd.DatetimeIndex(panel.dates).normalize().to_numpy(dtype="datetime64[D]")
+    session_ids = np.busday_count(days[0], days) if len(days) else days
+    returns = panel.returns(session_ids, max_gap=1 if overnight else 0)
+
+    bars["return"] = panel.gather(returns, bars)
+    rows, _ = panel.cells(bars)
+    bars["market_return"] = panel.market_returns(returns, market_ticker)[rows, 0]
+    return bars
+
+
+def intraday_car(bars, events, windows=EVENT_WINDOWS_MINUTES, bar_minutes=BAR_MINUTES,
+                 min_obs=MIN_ESTIMATION_BARS):
+    """
+    Event bar (first bar at or after the timestamp), market-model
+    parameters over the pre-event sessions and the CAR of every window.
+    """
+    model = MarketModel.from_prices(bars)
+    positions = model.calendar.locate(events["ticker"], events["timestamp"], direction="forward")
+
+    params = model.estimate(positions, window=estimation_window(windows, bar_minutes), min_obs=min_obs)
+    events = events.copy()
+    events["event_bar"] = np.where(
+        positions >= 0, model.calendar.dates[np.maximum(positions, 0)], np.datetime64("NaT")
+    )
+    for col in params.columns:
+        events[col] = params[col].to_numpy()
+
+    for name, window in windows.items():
+        start, end = minutes_to_offsets(window, bar_minutes)
+        events[name] = model.car_at(positions, start, end, params["alpha"], params["beta"])
+    return events
+
+
+# === MAIN ================================================================== #
+
+def load_intraday_events(path=INTRADAY_EVENTS):
+    events = pd.read_csv(path, sep=";", encoding="utf-8-sig")
+    events["timestamp"] = pd.to_datetime(events["timestamp"])
+    events["ticker"] = events["ticker"].astype(str).str.upper()
+    return events
+
+
+def main():
+    print("📥 Loading intraday events...")
+    events = load_intraday_events()
+    print(f"✅ Loaded {len(events)} events")
+
+    needed = event_sessions(events)
+    n_sessions = sum(len(days) for days in needed.values())
+    print(f"📥 Loading {n_sessions} (ticker, session) partitions from {INTRADAY_DIR}...")
+    bars = intraday_returns(load_event_bars(events))
+    print(f"✅ {len(bars)} in-session bars")
+
+    print(f"\n📊 Intraday CARs {list(EVENT_WINDOWS_MINUTES)} on {BAR_MINUTES}-minute bars...")
+    events = intraday_car(bars, events)
+    print(events[["event_id", "ticker", "timestamp", "event_bar", *EVENT_WINDOWS_MINUTES]])
+
+    out_path = write_table(events, "intraday_car")
+    print(f"✅ Saved: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
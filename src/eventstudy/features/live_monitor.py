@@ -0,0 +1,332 @@
+"""
+Live event monitoring: streaming AR/CAR while event windows are open.
+
+Events that lie after the stored price history (e.g. an upcoming trailer
+or release date) are watched on a feed of daily bars. Every event gets
+its market-model alpha/beta from the history (same prefix-sum estimator
+and ESTIMATION_WINDOW as compute_ar_car, so the estimation sample ends
+before the event window as in the batch run), then each incoming bar
+updates the AR and running CAR of the ticker's open events:
+
+- before day 0 the last |start| ARs are kept in a ring buffer, so the
+  pre-event part of the window is ready when day 0 arrives
+- day 0 is the first bar on or after the event date
+- an event closes (and leaves the monitor) after relative day `end`
+
+A bar costs O(1) per open event of its ticker. Stock bars wait for the
+market bar of their date; a later market bar releases them with a NaN
+market return, and NaN ARs add nothing to the CAR (as in car_at).
+Feeds and sinks are pluggable; a replay feed serves recorded bars.
+
+    python -m eventstudy.features.live_monitor replay bars.csv --jsonl updates.jsonl
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table
+from .compute_returns import MARKET_TICKER
+from .market_model import ESTIMATION_WINDOW, MarketModel
+
+LIVE_WINDOW = (-1, 5)
+# Market returns kept for bars that arrive after their market bar
+MARKET_MEMORY = 5
+
+
+# === FEEDS ================================================================= #
+
+class BarFeed:
+    """
+    Interface of a bar feed: an async iterator of (date, ticker, close)
+    tuples in date order.
+    """
+
+    def __aiter__(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(BarFeed):
+    """
+    Replays recorded bars (a frame or CSV with date, ticker, adj_close) in
+    date order. interval sleeps between bars; 0 only yields to the loop.
+    """
+
+    def __init__(self, bars, interval=0.0):
+        if not isinstance(bars, pd.DataFrame):
+            bars = pd.read_csv(bars, parse_dates=["date"])
+        self.bars = bars.sort_values("date", kind="stable")
+        self.interval = interval
+
+    async def __aiter__(self):
+        dates = self.bars["date"].to_numpy(dtype="datetime64[ns]")
+        tickers = self.bars["ticker"].astype(str).to_numpy()
+        closes = self.bars["adj_close"].to_numpy(dtype=float)
+        for bar in zip(dates, tickers, closes):
+            yield bar
+            await asyncio.sleep(self.interval)
+
+
+class QueueFeed(BarFeed):
+    """Bars pushed by another task (e.g. a websocket client); None ends the feed"""
+
+    def __init__(self, queue=None):
+        self.queue = asyncio.Queue() if queue is None else queue
+
+    async def __aiter__(self):
+        while (bar := await self.queue.get()) is not None:
+            yield bar
+
+
+# === SINKS ================================================================= #
+
+def stdout_sink(update):
+    car = "nan" if math.isnan(update["car"]) else f"{update['car']:+.4f}"
+    day = "pre" if update["day"] is None else f"{update['day']:+d}"
+    print(f"{update['date']} {update['event_id']:<30} {update['ticker']:<6} "
+          f"day {day:>4}  AR {update['ar']:+.4f}  CAR {car}  [{update['status']}]")
+
+
+class JsonlSink:
+    """
+    Appends one JSON line per update (NaN ARs/CARs become null). Use it as
+    a context manager so the file is closed however the run ends.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+    def __call__(self, update):
+        update = {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in update.items()}
+        self.file.write(json.dumps(update) + "\n")
+
+
+# === EVENT STATE =========================================================== #
+
+class OpenEvent:
+    """Running AR/CAR of one event over the window [start, end]"""
+
+    def __init__(self, event_id, ticker, event_date, alpha, beta, window=LIVE_WINDOW, pre_ar=()):
+        self.event_id = event_id
+        self.ticker = ticker
+        self.event_date = np.datetime64(event_date, "ns")
+        self.alpha, self.beta = alpha, beta
+        self.start, self.end = window
+
+        # Last |start| ARs before day 0 and their running sum
+        self.pre = deque(maxlen=max(0, -self.start))
+        self.pre_sum = 0.0
+        for ar in pre_ar:
+            self.push_pre(ar)
+
+        self.day = None
+        self.car = 0.0
+
+    def push_pre(self, ar):
+        if self.pre.maxlen == 0:
+            return
+        if len(self.pre) == self.pre.maxlen:
+            self.pre_sum -= self.pre[0]
+        ar = 0.0 if math.isnan(ar) else ar
+        self.pre.append(ar)
+        self.pre_sum += ar
+
+    def step(self, date, ret, market):
+        """Add one bar; returns the update dict"""
+        ar = ret - self.alpha - self.beta * market
+        if date < self.event_date:
+            self.push_pre(ar)
+            car, status = self.pre_sum, "pre"
+        else:
+            if self.day is None:
+                self.day, self.car = 0, self.pre_sum
+            else:
+                self.day += 1
+            if self.day >= self.start and not math.isnan(ar):
+                self.car += ar
+            car, status = self.car, "closed" if self.day >= self.end else "open"
+
+        return {
+            "event_id": self.event_id, "ticker": self.ticker,
+            "date": str(np.datetime64(date, "D")), "day": self.day,
+            "ar": float(ar), "car": float(car), "status": status,
+        }
+
+
+# === MONITOR =============================================================== #
+
+def live_parameters(model, last_pos, ahead, window, estimation_window=ESTIMATION_WINDOW):
+    """
+    Alpha/beta of events whose day 0 lies `ahead` trading days after their
+    ticker's last stored bar, fitted on the batch estimation window around
+    that day 0. The window ends before the event window's first bar, so
+    the pre-event ARs stay out of the sample.
+    """
+    start, end = estimation_window[0], min(estimation_window[1], window[0] - 1)
+    alpha, beta = np.full(len(last_pos), np.nan), np.full(len(last_pos), np.nan)
+    for k in np.unique(ahead):
+        sel = ahead == k
+        params = model.estimate(last_pos[sel], window=(k + start, k + end))
+        alpha[sel], beta[sel] = params["alpha"].to_numpy(), params["beta"].to_numpy()
+    return alpha, beta
+
+
+class LiveMonitor:
+    """Open events per ticker, updated bar by bar"""
+
+    def __init__(self, events, last_close, market_ticker=MARKET_TICKER, sink=stdout_sink):
+        self.open = {}
+        for event in events:
+            self.open.setdefault(event.ticker, []).append(event)
+        self.last_close = dict(last_close)
+        self.market_ticker = market_ticker
+        self.sink = sink
+
+        self.market = {}      # date -> market return (last MARKET_MEMORY dates)
+        self.pending = {}     # date -> [(ticker, return)] waiting for the market bar
+        self.n_bars = 0
+        self.n_updates = 0
+
+    @classmethod
+    def from_history(cls, prices, events, window=LIVE_WINDOW, date_col="event_date",
+                     market_ticker=MARKET_TICKER, sink=stdout_sink,
+                     estimation_window=ESTIMATION_WINDOW):
+        """
+        Monitor for the events dated after their ticker's last stored bar.
+        prices: long frame with adj_close, return and market_return.
+        Day 0 is projected on business days from the last bar; exchange
+        holidays in between shift the estimation sample by a bar each.
+        """
+        model = MarketModel.from_prices(prices)
+        cal = model.calendar
+        codes = cal.codes_of(events["ticker"])
+        last_pos = np.where(codes >= 0, cal.ends[np.maximum(codes, 0)] - 1, -1)
+        last_date = np.where(last_pos >= 0, cal.dates[np.maximum(last_pos, 0)], np.datetime64("NaT"))
+        dates = pd.to_datetime(events[date_col]).to_numpy(dtype="datetime64[ns]")
+        keep = (last_pos >= 0) & (dates > last_date)
+
+        day0 = np.busday_offset(dates[keep].astype("datetime64[D]"), 0, roll="forward")
+        ahead = np.busday_count(last_date[keep].astype("datetime64[D]"), day0)
+        alpha, beta = live_parameters(model, last_pos[keep], ahead, window, estimation_window)
+        pre_ar = model.ar_matrix(last_pos[keep], np.arange(min(window[0], 0) + 1, 1), alpha, beta)
+
+        open_events = [
+            OpenEvent(eid, str(t), d, a, b, window, pre)
+            for eid, t, d, a, b, pre in zip(
+                events["event_id"].to_numpy()[keep], events["ticker"].to_numpy()[keep],
+                dates[keep], alpha, beta, pre_ar,
+            )
+        ]
+        closes = prices.dropna(subset=["adj_close"]).groupby("ticker", observed=True)["adj_close"].last()
+        return cls(open_events, {str(t): c for t, c in closes.items()}, market_ticker, sink)
+
+    def on_bar(self, date, ticker, close):
+        """Process one bar; returns the number of event updates emitted"""
+        self.n_bars += 1
+        date = np.datetime64(date, "ns")
+        prev = self.last_close.get(ticker)
+        self.last_close[ticker] = close
+        ret = close / prev - 1.0 if prev else math.nan
+
+        if ticker != self.market_ticker:
+            if date in self.market:
+                return self.step_ticker(date, ticker, ret, self.market[date])
+            self.pending.setdefault(date, []).append((ticker, ret))
+            return 0
+
+        self.market[date] = ret
+        if len(self.market) > MARKET_MEMORY:
+            del self.market[next(iter(self.market))]
+
+        # Release stock bars of this date (and of older dates without a market bar)
+        emitted = 0
+        for day in sorted(d for d in self.pending if d <= date):
+            market = self.market.get(day, math.nan)
+            for t, r in self.pending.pop(day):
+                emitted += self.step_ticker(day, t, r, market)
+        return emitted
+
+    def step_ticker(self, date, ticker, ret, market):
+        events = self.open.get(ticker)
+        if not events:
+            return 0
+        still_open = []
+        for event in events:
+            update = event.step(date, ret, market)
+            self.sink(update)
+            if update["status"] != "closed":
+                still_open.append(event)
+        self.open[ticker] = still_open
+        self.n_updates += len(events)
+        return len(events)
+
+    @property
+    def n_open(self):
+        return sum(len(events) for events in self.open.values())
+
+    async def run(self, feed):
+        """Consume a feed until it ends or every event has closed"""
+        async for date, ticker, close in feed:
+            self.on_bar(date, ticker, close)
+            if self.n_open == 0 and not self.pending:
+                break
+        return self.n_updates
+
+
+def replay_benchmark(monitor, bars):
+    """Replay bars through a monitor as fast as possible: bars/sec and updates"""
+    start = time.perf_counter()
+    asyncio.run(monitor.run(ReplayFeed(bars)))
+    seconds = time.perf_counter() - start
+    return {
+        "bars": monitor.n_bars, "updates": monitor.n_updates,
+        "seconds": seconds, "bars_per_sec": monitor.n_bars / seconds if seconds else math.inf,
+    }
+
+
+# === MAIN ================================================================== #
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream AR/CAR of open events from a bar feed.")
+    parser.add_argument("command", choices=["replay"])
+    parser.add_argument("bars", help="CSV of date, ticker, adj_close (pipeline tickers) to replay")
+    parser.add_argument("--window", type=int, nargs=2, default=LIVE_WINDOW, metavar=("START", "END"))
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between replayed bars")
+    parser.add_argument("--jsonl", default=None, help="append updates to this JSONL file")
+    args = parser.parse_args()
+
+    from .merge_event_returns import load_events
+
+    events = load_events().rename(columns={"date": "event_date"})
+    prices = read_table("prices_with_returns")
+
+    with JsonlSink(args.jsonl) if args.jsonl else contextlib.nullcontext(stdout_sink) as sink:
+        monitor = LiveMonitor.from_history(prices, events, tuple(args.window), sink=sink)
+        print(f"📡 Watching {monitor.n_open} open event(s), window {tuple(args.window)}", file=sys.stderr)
+
+        start = time.perf_counter()
+        asyncio.run(monitor.run(ReplayFeed(Path(args.bars), args.interval)))
+        seconds = time.perf_counter() - start
+    print(f"✅ {monitor.n_bars} bars, {monitor.n_updates} updates in {seconds:.2f}s "
+          f"({monitor.n_bars / max(seconds, 1e-9):,.0f} bars/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
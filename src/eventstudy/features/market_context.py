@@ -0,0 +1,197 @@
+"""
+Market-context feature store.
+
+Context features are computed once per trading date and stored apart from
+the price tables, then attached to events with as-of lookups:
+
+- market_context (per date): VIX level and changes, realized market
+  volatility over several lookbacks
+- ticker_context (per ticker and date): momentum and volatility of the
+  ticker's own returns over several lookbacks
+
+A feature dated t only uses information up to the close of t - 1, so it
+never looks into the event day. Ticker features come from prefix sums on
+the trading calendar (O(1) per row and lookback). New features only need
+this stage to rerun; the price panel is read, not rebuilt.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, write_table
+from ..sharded import map_shards, parse_jobs, warn_serial
+from .car_index import CarIndex
+from .trading_calendar import TradingCalendar
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+DATA_RAW = BASE_DIR / "data" / "raw"
+VIX_FILE = DATA_RAW / "VIX_2010_2025.csv"
+
+MARKET_TICKER = "SP500"
+LOOKBACKS = (5, 20, 60)     # trading days
+VIX_CHANGES = (1, 5)        # trading days
+MIN_OBS_SHARE = 0.5         # of a lookback needed for a feature value
+TRADING_DAYS = 252
+
+
+# === LOAD ================================================================== #
+
+def load_vix(path=VIX_FILE):
+    vix = pd.read_csv(path)
+    vix = vix.rename(columns={vix.columns[0]: "date", vix.columns[1]: "vix"})
+    vix["date"] = pd.to_datetime(vix["date"])
+    return vix[["date", "vix"]].dropna().sort_values("date").reset_index(drop=True)
+
+
+# === MARKET CONTEXT ======================================================== #
+
+def build_market_context(prices, vix, market_ticker=MARKET_TICKER,
+                         lookbacks=LOOKBACKS, vix_changes=VIX_CHANGES):
+    """Per-date market features on the market's trading days"""
+    market = (
+        prices.loc[prices["ticker"] == market_ticker, ["date", "return"]]
+        .sort_values("date")
+        .reset_index(drop=True)
+    )
+
+    # VIX close as of each market date
+    ctx = pd.merge_asof(market, vix, on="date", direction="backward")
+    features = pd.DataFrame({"date": ctx["date"]})
+
+    # Everything is lagged one day: the value on t is known at the t - 1 close
+    vix_level = ctx["vix"].shift(1)
+    features["vix"] = vix_level
+    for k in vix_changes:
+        features[f"vix_chg_{k}d"] = vix_level - vix_level.shift(k)
+
+    past = ctx["return"].shift(1)
+    for L in lookbacks:
+        min_obs = max(2, int(L * MIN_OBS_SHARE))
+        features[f"mkt_vol_{L}d"] = (
+            past.rolling(L, min_periods=min_obs).std() * np.sqrt(TRADING_DAYS)
+        )
+    return features
+
+
+# === TICKER CONTEXT ======================================================== #
+
+def shard_ticker_context(prices, lookbacks):
+    """build_ticker_context on one ticker shard (run in a pool worker)"""
+    return build_ticker_context(prices, lookbacks)
+
+
+def build_ticker_context(prices, lookbacks=LOOKBACKS, calendar=None, jobs=1):
+    """
+    Per-(ticker, date) momentum and volatility over the previous L trading
+    days. With jobs > 1 (and no calendar) ticker shards are computed on a
+    process pool; shards are contiguous in calendar order, so their rows
+    concatenate to the one-job frame.
+    """
+    if calendar is None and jobs > 1:
+        ordered = prices.sort_values(["ticker", "date"], kind="stable")
+        parts = map_shards(shard_ticker_context, ordered, ["return"], jobs, lambda i, tickers: (lookbacks,))
+        return pd.concat(parts, ignore_index=True)
+
+    if calendar is None:
+        calendar = TradingCalendar.from_prices(prices)
+
+    r = calendar.column(prices, "return")
+    valid = ~np.isnan(r)
+    r0 = np.where(valid, r, 0.0)
+
+    n = CarIndex(calendar, valid.astype(float))
+    s1 = CarIndex(calendar, r0)
+    s2 = CarIndex(calendar, r0 * r0)
+    slog = CarIndex(calendar, np.log1p(r0))
+
+    positions = np.arange(len(calendar))
+    features = pd.DataFrame({
+        "date": calendar.dates,
+        "ticker": np.asarray(calendar.tickers, dtype=object)[calendar.codes],
+    })
+
+    for L in lookbacks:
+        lo, hi = calendar.window(positions, -L, -1)
+        cnt = n.window_sum(lo, hi)
+        ok = cnt >= max(2, int(L * MIN_OBS_SHARE))
+        cnt_safe = np.where(ok, cnt, 2.0)
+
+        total = s1.window_sum(lo, hi)
+        var = (s2.window_sum(lo, hi) - total * total / cnt_safe) / (cnt_safe - 1)
+
+        features[f"mom_{L}d"] = np.where(ok, np.expm1(slog.window_sum(lo, hi)), np.nan)
+        features[f"vol_{L}d"] = np.where(
+            ok, np.sqrt(np.maximum(var, 0.0) * TRADING_DAYS), np.nan
+        )
+    return features
+
+
+# === AS-OF JOIN ============================================================ #
+
+def join_context(events, market_ctx, ticker_ctx, date_col="trading_date"):
+    """
+    Attach the latest market and ticker context on or before each event's
+    date. Both lookups are binary searches: O(events log dates).
+    """
+    events = events.copy()
+    event_dates = events[date_col].to_numpy(dtype="datetime64[ns]")
+
+    # Market context: one sorted date column
+    market_ctx = market_ctx.sort_values("date").reset_index(drop=True)
+    dates = market_ctx["date"].to_numpy(dtype="datetime64[ns]")
+    rows = np.searchsorted(dates, event_dates, side="right") - 1
+    rows[np.isnat(event_dates)] = -1
+    ok = rows >= 0
+    for col in market_ctx.columns.drop("date"):
+        values = market_ctx[col].to_numpy(dtype=float, na_value=np.nan)
+        events[col] = np.where(ok, values[np.maximum(rows, 0)], np.nan)
+
+    # Ticker context: per-ticker as-of lookup on its own calendar
+    calendar = TradingCalendar.from_prices(ticker_ctx)
+    positions = calendar.locate(events["ticker"], events[date_col])
+    ok = positions >= 0
+    rows = calendar.frame_rows(ticker_ctx, np.maximum(positions, 0))
+    for col in ticker_ctx.columns.drop(["date", "ticker"]):
+        values = ticker_ctx[col].to_numpy(dtype=float, na_value=np.nan)
+        events[col] = np.where(ok, values[rows], np.nan)
+
+    return events
+
+
+# === STAGES ================================================================ #
+
+def build_context_store():
+    """Compute and store market_context and ticker_context"""
+    print("📥 Loading prices and VIX...")
+    prices = read_table("prices_with_returns")
+    vix = load_vix()
+    print(f"✅ {len(prices)} price rows, {len(vix)} VIX days")
+
+    market_ctx = build_market_context(prices, vix)
+    ticker_ctx = build_ticker_context(prices, jobs=parse_jobs())
+
+    print(f"✅ Saved: {write_table(market_ctx, 'market_context')} {market_ctx.shape}")
+    print(f"✅ Saved: {write_table(ticker_ctx, 'ticker_context')} {ticker_ctx.shape}")
+
+
+def attach_context():
+    """Join the stored context onto the labeled events"""
+    warn_serial("event_context")
+    events = read_table("events_labeled")
+    market_ctx = read_table("market_context")
+    ticker_ctx = read_table("ticker_context")
+
+    events = join_context(events, market_ctx, ticker_ctx)
+    out_path = write_table(events, "events_with_context")
+    print(f"✅ Saved: {out_path} ({len(events)} events)")
+
+
+def main():
+    build_context_store()
+    attach_context()
+
+
+if __name__ == "__main__":
+    main()
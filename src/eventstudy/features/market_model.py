@@ -0,0 +1,122 @@
+"""
+Per-event market model estimated over rolling estimation windows.
+
+Every event gets its own alpha/beta from the trading days in its estimation
+window (by default [-250, -30] relative to the event), so the event window
+never contaminates the fit. All regressions come out of prefix sums of
+x, y, x^2, xy and y^2, i.e. one vectorized pass for any number of events.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .car_index import CarIndex
+from .trading_calendar import TradingCalendar
+
+ESTIMATION_WINDOW = (-250, -30)
+MIN_ESTIMATION_OBS = 100
+
+
+class MarketModel:
+    """Prefix sums of return/market moments on a TradingCalendar"""
+
+    def __init__(self, calendar, returns, market):
+        self.calendar = calendar
+
+        # Only days with both a stock and a market return enter any sum
+        valid = ~(np.isnan(returns) | np.isnan(market))
+        y = np.where(valid, returns, 0.0)
+        x = np.where(valid, market, 0.0)
+        self.valid, self.returns, self.market = valid, y, x
+
+        self.n = CarIndex(calendar, valid.astype(float))
+        self.sx = CarIndex(calendar, x)
+        self.sy = CarIndex(calendar, y)
+        self.sxx = CarIndex(calendar, x * x)
+        self.sxy = CarIndex(calendar, x * y)
+        self.syy = CarIndex(calendar, y * y)
+
+    @classmethod
+    def from_prices(cls, prices, calendar=None):
+        """Build the model from a long-format frame with return/market_return"""
+        if calendar is None:
+            calendar = TradingCalendar.from_prices(prices)
+        return cls(
+            calendar,
+            calendar.column(prices, "return"),
+            calendar.column(prices, "market_return"),
+        )
+
+    def estimate(self, positions, window=ESTIMATION_WINDOW, min_obs=MIN_ESTIMATION_OBS):
+        """
+        Fit alpha, beta and residual variance for every event position.
+        Events with fewer than min_obs estimation days get NaN parameters.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        lo, hi = self.calendar.window(positions, window[0], window[1])
+
+        n = self.n.window_sum(lo, hi)
+        sx = self.sx.window_sum(lo, hi)
+        sy = self.sy.window_sum(lo, hi)
+        sxx = self.sxx.window_sum(lo, hi)
+        sxy = self.sxy.window_sum(lo, hi)
+        syy = self.syy.window_sum(lo, hi)
+
+        ok = (positions >= 0) & (n >= max(min_obs, 3))
+        n_safe = np.where(ok, n, 1.0)
+
+        # Centered moments of the estimation window
+        sxx_c = sxx - sx * sx / n_safe
+        sxy_c = sxy - sx * sy / n_safe
+        syy_c = syy - sy * sy / n_safe
+        ok &= sxx_c > 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = sxy_c / sxx_c
+            alpha = (sy - beta * sx) / n_safe
+            sigma2 = (syy_c - beta * sxy_c) / (n_safe - 2)
+
+        return pd.DataFrame({
+            "alpha": np.where(ok, alpha, np.nan),
+            "beta": np.where(ok, beta, np.nan),
+            "sigma2": np.where(ok, np.maximum(sigma2, 0.0), np.nan),
+            "n_est": n.astype(np.int64),
+        })
+
+    def car_at(self, positions, start, end, alpha, beta):
+        """CAR over [start, end] trading days using each event's own alpha/beta"""
+        positions = np.asarray(positions, dtype=np.int64)
+        lo, hi = self.calendar.window(positions, start, end)
+
+        n = self.n.window_sum(lo, hi)
+        sx = self.sx.window_sum(lo, hi)
+        sy = self.sy.window_sum(lo, hi)
+
+        # sum(r - alpha - beta * m) over the valid days in the window
+        out = sy - n * np.asarray(alpha) - np.asarray(beta) * sx
+        out[positions < 0] = np.nan
+        return out
+
+    def ar_matrix(self, positions, offsets, alpha, beta):
+        """
+        Daily ARs of every event (rows) at the given trading-day offsets
+        (columns). NaN outside the ticker's history or on invalid days.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+
+        safe = np.where(positions >= 0, positions, 0)
+        code = self.calendar.codes[safe]
+        idx = safe[:, None] + offsets[None, :]
+        inside = (
+            (positions >= 0)[:, None]
+            & (idx >= self.calendar.starts[code][:, None])
+            & (idx < self.calendar.ends[code][:, None])
+        )
+        idx = np.where(inside, idx, 0)
+
+        alpha = np.asarray(alpha, dtype=float)[:, None]
+        beta = np.asarray(beta, dtype=float)[:, None]
+        ar = self.returns[idx] - alpha - beta * self.market[idx]
+        ar[~(inside & self.valid[idx])] = np.nan
+        return ar
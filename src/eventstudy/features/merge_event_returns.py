@@ -1,16 +1,18 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from ..data.store import read_table, write_table
+from ..sharded import events_by_shard, map_shards, parse_jobs
+from .price_panel import PricePanel
+from .trading_calendar import TradingCalendar
+
 # === PATH SETUP ============================================================= #
 
 BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_RAW = BASE_DIR / "data" / "raw"
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
-print("BASE_DIR:", BASE_DIR)
-print("DATA_RAW exists:", DATA_RAW.exists())
-print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
-
 
 # === LOAD EVENTS =========================================================== #
 
@@ -38,81 +40,132 @@ def load_events():
 # === LOAD PRICES =========================================================== #
 
 def load_prices():
-    prices = pd.read_csv(DATA_PROCESSED / "prices_with_returns.csv")
-    
-    # Convert date to datetime
-    prices["date"] = pd.to_datetime(prices["date"])
-    prices["ticker"] = prices["ticker"].astype(str).str.upper()
-    
-    print("\nUnique tickers in prices:")
-    print(prices["ticker"].unique())
-    print(f"UBSFY rows: {len(prices[prices['ticker'] == 'UBSFY'])}")
-    
-    # Check date range for UBSFY
-    ubsfy_prices = prices[prices['ticker'] == 'UBSFY']
-    print(f"UBSFY date range: {ubsfy_prices['date'].min()} to {ubsfy_prices['date'].max()}")
-    
+    prices = read_table("prices_with_returns")
+
+    # Date range and bar count of every ticker in one pass over the panel
+    print("\nPrice coverage per ticker:")
+    print(PricePanel.from_long(prices).coverage())
+
     return prices
 
 
+# === ALIGN EVENTS TO TRADING DAYS ========================================== #
+
+# "backward": last trading day on or before the event, "forward": first on
+# or after, "nearest": closest (ties go backward)
+ALIGN_DIRECTION = "backward"
+
+# Events timestamped at or after the close count from the next trading day.
+# An explicit boolean "after_close" column in events.csv takes precedence.
+MARKET_CLOSE = pd.Timedelta(hours=16)
+
+
+def after_close_mask(events):
+    if "after_close" in events.columns:
+        return events["after_close"].fillna(False).astype(bool).to_numpy()
+    event_date = events["event_date"]
+    return (event_date - event_date.dt.normalize() >= MARKET_CLOSE).fillna(False).to_numpy()
+
+
+def align_events(events, calendar, direction=ALIGN_DIRECTION):
+    """
+    Calendar position of every event's trading day in one vectorized pass,
+    plus a frame describing the events that could not be aligned.
+    """
+    positions = calendar.locate(
+        events["ticker"], events["event_date"],
+        direction=direction, after_close=after_close_mask(events),
+    )
+
+    missing = positions < 0
+    known = calendar.codes_of(events["ticker"]) >= 0
+    reason = np.select(
+        [~known, events["event_date"].isna().to_numpy()],
+        ["unknown_ticker", "missing_date"],
+        default="outside_price_history",
+    )
+
+    id_cols = [c for c in ("event_id", "ticker", "event_date") if c in events.columns]
+    unmatched = events.loc[missing, id_cols].reset_index(drop=True)
+    unmatched["reason"] = reason[missing]
+    return positions, unmatched
+
+
 # === MERGE EVENTS WITH NEAREST TRADING DAY ================================== #
 
-def merge_events_with_prices(events: pd.DataFrame, prices: pd.DataFrame) -> pd.DataFrame:
-    # ✅ Rename date columns FIRST
-    events = events.rename(columns={"date": "event_date"})
-    prices = prices.rename(columns={"date": "trading_date"})
-    
-    events_sorted = events.sort_values(["ticker", "event_date"]).reset_index(drop=True)
-    prices_sorted = prices.sort_values(["ticker", "trading_date"]).reset_index(drop=True)
-
-    merged_list = []
-
-    for ticker in events_sorted["ticker"].unique():
-        e = events_sorted[events_sorted["ticker"] == ticker].copy()
-        p = prices_sorted[prices_sorted["ticker"] == ticker].copy()
-
-        if p.empty:
-            print(f"[WARN] No price data for ticker {ticker}")
-            e["trading_date"] = pd.NaT
-            e["adj_close"] = pd.NA
-            e["return"] = pd.NA
-            e["market_return"] = pd.NA
-            merged_list.append(e)
-            continue
-
-        # ✅ Ensure dates are datetime before merge
-        e["event_date"] = pd.to_datetime(e["event_date"])
-        p["trading_date"] = pd.to_datetime(p["trading_date"])
-
-        tmp = pd.merge_asof(
-            e.sort_values("event_date"),
-            p[["trading_date", "adj_close", "return", "market_return"]].sort_values("trading_date"),
-            left_on="event_date",
-            right_on="trading_date",
-            direction="backward"
+# Keep only needed columns (exclude source_url and notes)
+EVENT_COLUMNS = [
+    "event_id", "event_date", "trading_date", "ticker", "publisher", "studio",
+    "is_rockstar", "game", "franchise", "event_type", "sentiment",
+    "impact_expectation_manual", "adj_close", "return", "market_return"
+]
+
+
+def concat_events(frames, keys=("ticker", "event_date")):
+    """Event frames of ticker subsets -> one frame in the full-run row order"""
+    frames = [f for f in frames if len(f)] or frames[:1]
+    events = pd.concat(frames, ignore_index=True)
+    return events.sort_values(list(keys), kind="stable").reset_index(drop=True)
+
+
+def shard_trading_days(prices, events, direction):
+    """attach_trading_days on one ticker shard (run in a pool worker)"""
+    return attach_trading_days(events, prices, direction=direction)
+
+
+def attach_trading_days(events, prices, calendar=None, direction=ALIGN_DIRECTION, jobs=1):
+    """
+    Events (sorted by ticker, event date) with the trading day and price
+    row they align to; unaligned events keep NaN price columns.
+    Returns (merged, unmatched). With jobs > 1 (and no calendar) ticker
+    shards are aligned on a process pool.
+    """
+    if calendar is None and jobs > 1:
+        ordered = prices.sort_values(["ticker", "date"], kind="stable")
+        parts = map_shards(
+            shard_trading_days, ordered, ["adj_close", "return", "market_return"], jobs,
+            events_by_shard(events, ordered, (direction,)),
         )
+        return concat_events([p[0] for p in parts]), concat_events([p[1] for p in parts])
 
-        merged_list.append(tmp)
+    events = events.rename(columns={"date": "event_date"})
+    events["event_date"] = pd.to_datetime(events["event_date"])
+    events = events.sort_values(["ticker", "event_date"], kind="stable").reset_index(drop=True)
+
+    if calendar is None:
+        calendar = TradingCalendar.from_prices(prices)
+
+    positions, unmatched = align_events(events, calendar, direction)
+    matched = positions >= 0
+
+    price_cols = ["date", "adj_close", "return", "market_return"]
+    rows = prices.iloc[calendar.frame_rows(prices, positions[matched])][price_cols]
+    rows = rows.rename(columns={"date": "trading_date"}).reset_index(drop=True)
+
+    merged = events.copy()
+    for col in rows.columns:
+        merged[col] = pd.Series(rows[col].to_numpy(), index=merged.index[matched])
+
+    return merged[[col for col in EVENT_COLUMNS if col in merged.columns]], unmatched
+
+
+def merge_events_with_prices(events: pd.DataFrame, prices: pd.DataFrame, calendar=None,
+                             direction=ALIGN_DIRECTION, jobs=1) -> pd.DataFrame:
+    merged, unmatched = attach_trading_days(events, prices, calendar, direction, jobs)
+
+    if len(unmatched):
+        print(f"\n[WARN] {len(unmatched)} event(s) not aligned to a trading day:")
+        print(unmatched["reason"].value_counts().to_string())
+    unmatched_path = write_table(unmatched, "events_unmatched")
+    print(f"   Details: {unmatched_path}")
 
-    merged = pd.concat(merged_list, ignore_index=True)
-    
     print(f"\n✅ Merged {len(merged)} rows")
-    print("Columns:", merged.columns.tolist())
-    
-    # ✅ Keep only needed columns (exclude source_url and notes)
-    cols_to_keep = [
-        "event_id", "event_date", "trading_date", "ticker", "publisher", "studio",
-        "is_rockstar", "game", "franchise", "event_type", "sentiment", 
-        "impact_expectation_manual", "adj_close", "return", "market_return"
-    ]
-    merged = merged[[col for col in cols_to_keep if col in merged.columns]]
 
     print(f"\nFinal columns: {merged.columns.tolist()}")
     print(merged.head(10))
 
     # ✅ Save with semicolon separator
-    out_path = DATA_PROCESSED / "events_with_returns.csv"
-    merged.to_csv(out_path, sep=";", index=False)
+    out_path = write_table(merged, "events_with_returns")
     print(f"\n✅ Saved: {out_path}")
     
     return merged
@@ -121,15 +174,19 @@ def merge_events_with_prices(events: pd.DataFrame, prices: pd.DataFrame) -> pd.D
 # === MAIN FUNCTION =========================================================== #
 
 def main():
-    print("Loading events...")
+    print("BASE_DIR:", BASE_DIR)
+    print("DATA_RAW exists:", DATA_RAW.exists())
+    print("DATA_PROCESSED exists:", DATA_PROCESSED.exists())
+
+    print("\nLoading events...")
     events = load_events()
 
     print("\nLoading prices...")
     prices = load_prices()
 
     print("\nMerging...")
-    merged = merge_events_with_prices(events, prices)
+    merged = merge_events_with_prices(events, prices, jobs=parse_jobs())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
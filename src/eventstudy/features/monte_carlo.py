@@ -0,0 +1,231 @@
+"""
+Resampling inference for CARs: bootstrap and placebo events.
+
+- Bootstrap: resample each subgroup's events with replacement to get the
+  standard error and percentile interval of its mean CAR.
+- Placebo: replace every real event by a pseudo-event on a random
+  non-event trading day of the same ticker, re-fit its market model and
+  take the subgroup mean CARs. Repeating this builds the empirical null
+  distribution of every subgroup's mean CAR.
+
+Placebo CARs come from the MarketModel prefix sums, so every pseudo-event
+costs O(1) and a batch of replications is one set of array operations.
+Replications are split into fixed-size chunks, each with its own child
+seed, so results are identical for any number of worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, write_table
+from ..sharded import parse_jobs
+from .market_model import ESTIMATION_WINDOW, MarketModel
+from .significance import CAR_WINDOWS, GROUP_COLUMNS, group_matrix, grouped_moments
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+RESULTS_DIR = BASE_DIR / "results"
+
+N_BOOTSTRAP = 10_000
+N_PLACEBO = 100_000
+CHUNK_SIZE = 5_000
+SEED = 20240101
+JOBS = 1
+CI_LEVEL = 0.95
+
+
+def chunk_seeds(seed, stream, n_reps, chunk_size=CHUNK_SIZE):
+    """(size, SeedSequence) per chunk; depends only on seed, stream and n_reps"""
+    sizes = [min(chunk_size, n_reps - i) for i in range(0, n_reps, chunk_size)]
+    return list(zip(sizes, np.random.SeedSequence([seed, stream]).spawn(len(sizes))))
+
+
+def group_means(values, G):
+    """NaN-aware mean over the events of every group. values: (..., events)"""
+    valid = ~np.isnan(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (np.where(valid, values, 0.0) @ G.T) / (valid @ G.T)
+
+
+# === BOOTSTRAP ============================================================= #
+
+def bootstrap_mean_car(car, G, n_boot=N_BOOTSTRAP, seed=SEED, chunk_size=CHUNK_SIZE):
+    """
+    Bootstrap distribution of every group's mean CAR.
+    Returns an array (n_boot, groups, windows).
+    """
+    out = np.full((n_boot, G.shape[0], car.shape[1]), np.nan)
+    start = 0
+    for size, seed_seq in chunk_seeds(seed, 0, n_boot, chunk_size):
+        rng = np.random.default_rng(seed_seq)
+        for g in range(G.shape[0]):
+            members = np.flatnonzero(G[g])
+            if len(members) == 0:
+                continue
+            draws = members[rng.integers(0, len(members), (size, len(members)))]
+            with np.errstate(invalid="ignore"):
+                sample = car[draws]
+                valid = ~np.isnan(sample)
+                out[start:start + size, g] = (
+                    np.where(valid, sample, 0.0).sum(axis=1) / valid.sum(axis=1)
+                )
+        start += size
+    return out
+
+
+# === PLACEBO EVENTS ======================================================== #
+
+def placebo_bounds(model, positions, windows, estimation_window):
+    """
+    Half-open range of calendar positions each event's pseudo-events are
+    drawn from: far enough from the ticker's start for a full estimation
+    window and from its end for the longest CAR window.
+    """
+    cal = model.calendar
+    code = cal.codes[positions]
+    seg_start, seg_end = cal.starts[code], cal.ends[code]
+
+    max_end = max(0, max(end for _, end in windows.values()))
+    lo = seg_start - min(estimation_window[0], 0)
+    hi = seg_end - max_end
+
+    short = hi <= lo
+    return np.where(short, seg_start, lo), np.where(short, seg_end, hi)
+
+
+def draw_placebo_positions(rng, lo, hi, event_positions, size):
+    """Random positions in [lo, hi) per event, never on a real event day"""
+    pos = rng.integers(lo, hi, size=(size, len(lo)))
+    taken = np.isin(pos, event_positions)
+
+    # Redraw the (rare) hits; stop if an event's range has no free day
+    for _ in range(100):
+        if not taken.any():
+            break
+        rows, cols = np.nonzero(taken)
+        pos[rows, cols] = rng.integers(lo[cols], hi[cols])
+        taken = np.isin(pos, event_positions)
+    return pos
+
+
+def placebo_chunk(model, positions, G, windows, estimation_window, size, seed_seq):
+    """Placebo group mean CARs of one chunk: array (size, groups, windows)"""
+    rng = np.random.default_rng(seed_seq)
+    lo, hi = placebo_bounds(model, positions, windows, estimation_window)
+    pseudo = draw_placebo_positions(rng, lo, hi, np.unique(positions), size).ravel()
+
+    params = model.estimate(pseudo, window=estimation_window)
+    alpha, beta = params["alpha"].to_numpy(), params["beta"].to_numpy()
+
+    out = np.empty((size, G.shape[0], len(windows)))
+    for w, (start, end) in enumerate(windows.values()):
+        car = model.car_at(pseudo, start, end, alpha, beta).reshape(size, -1)
+        out[:, :, w] = group_means(car, G)
+    return out
+
+
+# Worker state, set once per process by the pool initializer
+_WORKER = {}
+
+
+def _init_worker(model, positions, G, windows, estimation_window):
+    _WORKER.update(
+        model=model, positions=positions, G=G,
+        windows=windows, estimation_window=estimation_window,
+    )
+
+
+def _run_chunk(task):
+    size, seed_seq = task
+    return placebo_chunk(
+        _WORKER["model"], _WORKER["positions"], _WORKER["G"],
+        _WORKER["windows"], _WORKER["estimation_window"], size, seed_seq,
+    )
+
+
+def placebo_null(model, positions, G, windows=CAR_WINDOWS, n_reps=N_PLACEBO, seed=SEED,
+                 jobs=JOBS, estimation_window=ESTIMATION_WINDOW, chunk_size=CHUNK_SIZE):
+    """
+    Null distribution of every group's mean CAR from n_reps placebo
+    replications: array (n_reps, groups, windows). Events with an invalid
+    position (-1) must be filtered out beforehand.
+    """
+    tasks = chunk_seeds(seed, 1, n_reps, chunk_size)
+    args = (model, np.asarray(positions, dtype=np.int64), G, windows, estimation_window)
+
+    if jobs <= 1:
+        _init_worker(*args)
+        chunks = [_run_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=args) as pool:
+            chunks = list(pool.map(_run_chunk, tasks))
+    return np.concatenate(chunks)
+
+
+# === SUMMARY =============================================================== #
+
+def monte_carlo_table(events, model, windows=CAR_WINDOWS, group_cols=GROUP_COLUMNS,
+                      n_boot=N_BOOTSTRAP, n_placebo=N_PLACEBO, seed=SEED, jobs=JOBS):
+    """
+    Bootstrap interval and placebo p-value of every group's mean CAR.
+    One row per (group_col, group, window).
+    """
+    positions = model.calendar.locate(events["ticker"], events["trading_date"])
+    events = events[positions >= 0].reset_index(drop=True)
+    positions = positions[positions >= 0]
+
+    names = list(windows)
+    car = events[names].to_numpy(dtype=float, na_value=np.nan)
+    G, labels = group_matrix(events, group_cols)
+    n, mean, _ = grouped_moments(G, car)
+
+    boot = bootstrap_mean_car(car, G, n_boot, seed)
+    null = placebo_null(model, positions, G, windows, n_placebo, seed, jobs)
+
+    tail = (1 - CI_LEVEL) / 2
+    with np.errstate(invalid="ignore"):
+        extreme = (np.abs(null) >= np.abs(mean)[None]).sum(axis=0)
+        n_null = (~np.isnan(null)).sum(axis=0)
+        p_value = (1 + extreme) / (1 + n_null)
+
+    rows = []
+    for g, (col, value) in enumerate(labels):
+        for w, name in enumerate(names):
+            rows.append({
+                "group_col": col, "group": value, "window": name,
+                "n": int(n[g, w]), "mean_car": mean[g, w],
+                "boot_se": np.nanstd(boot[:, g, w]),
+                "boot_lo": np.nanquantile(boot[:, g, w], tail),
+                "boot_hi": np.nanquantile(boot[:, g, w], 1 - tail),
+                "placebo_mean": np.nanmean(null[:, g, w]),
+                "placebo_p": p_value[g, w],
+            })
+    return pd.DataFrame(rows)
+
+
+# === MAIN ================================================================== #
+
+def main():
+    print("📥 Loading data...")
+    events = read_table("events_labeled")
+    prices = read_table("prices_with_ar")
+    print(f"✅ Loaded {len(events)} events")
+
+    jobs = parse_jobs(default=JOBS)
+    print(f"\n🎲 Bootstrap ({N_BOOTSTRAP}) and placebo ({N_PLACEBO}) replications, {jobs} job(s)...")
+    model = MarketModel.from_prices(prices)
+    table = monte_carlo_table(events, model, jobs=jobs)
+
+    print(table[table["group_col"] == "all"].to_string(index=False))
+
+    out_path = write_table(table, "car_monte_carlo")
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    table.to_csv(RESULTS_DIR / "car_monte_carlo.csv", index=False)
+    print(f"\n✅ Saved: {out_path}")
+    print(f"✅ Saved: {RESULTS_DIR / 'car_monte_carlo.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Out-of-core execution of the returns -> AR -> CAR stages, one ticker at a time.
+
+compute_returns, compute_ar_car and car_into_label each load the whole
+long-format price table. Every quantity they compute is per ticker,
+except the market return, which is one series shared by all tickers, so
+the same results come out of a loop over ticker partitions:
+
+1. partition_prices streams the source table in record batches into a
+   Hive-partitioned dataset, prices_by_ticker/ticker=<T>/[year=<Y>/]...
+   (tickers cleaned on the way, so partitions use pipeline names)
+2. the market ticker's partition gives the date -> market return series
+3. each ticker partition gets its returns, market returns, full-sample
+   alpha/beta and ARs; that ticker's events are aligned and get their
+   market-model parameters, AR_event and CARs from the same frame
+4. the price rows are written as one part per ticker of
+   prices_with_returns / prices_with_ar; the event tables (small) are
+   written once at the end, labels included
+
+Every sum runs in the same order on both paths (column-wise OLS sums add
+row by row, CarIndex prefix sums restart at each ticker), so the outputs
+are bit-identical to the in-memory run, not just close.
+
+Only one partition plus the market series is in memory at a time, so
+peak memory follows the largest ticker, not the universe. Partitioning by
+year too only changes the storage layout (smaller files for long
+intraday histories); a ticker's years are still processed together,
+since returns and estimation windows cross year boundaries. A run stops
+with MemoryError, naming the partition, as soon as the peak RSS passes
+MEMORY_LIMIT_MB (the price tables are then incomplete). The outputs
+are the tables of the in-memory stages (except the dense return_panel,
+which is universe-sized by definition; each partition builds its own
+panel in memory).
+
+    python -m eventstudy.features.out_of_core [--by-year] [--skip-partition]
+"""
+
+import argparse
+import itertools
+import os
+import resource
+import sys
+import time
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import (
+    DATA_PROCESSED,
+    clear_table,
+    table_file,
+    table_path,
+    write_partition,
+    write_table,
+)
+from ..sharded import default_jobs, warn_serial
+from .car_into_label import add_car_windows, add_impact_labels
+from .compute_ar_car import (
+    build_alpha_beta_table,
+    compute_events_car,
+    compute_prices_ar,
+)
+from .compute_returns import MARKET_TICKER, clean_tickers
+from .market_model import MarketModel
+from .merge_event_returns import attach_trading_days, concat_events
+from .price_panel import PricePanel
+
+PARTITIONED_TABLE = "prices_by_ticker"
+BATCH_ROWS = 1_000_000
+AR_COLUMNS = ["expected_return", "AR", "cum_AR"]
+# Peak resident set a run may reach before it stops (None: no limit)
+MEMORY_LIMIT_MB = 4096
+
+
+# === MEMORY ================================================================ #
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def check_memory(limit_mb, where):
+    """Raise MemoryError if the peak RSS has passed limit_mb (None: no limit)"""
+    if limit_mb is None:
+        return
+    peak = peak_rss_mb()
+    if peak > limit_mb:
+        raise MemoryError(f"Peak RSS {peak:.0f} MB is above the {limit_mb:.0f} MB limit {where}")
+
+
+# === PARTITION ============================================================= #
+
+def source_dataset(source="prices_long", root=DATA_PROCESSED):
+    import pyarrow.dataset as ds
+
+    path = table_file(source, root)
+    if path is None:
+        raise FileNotFoundError(f"Table '{source}' not found in {root}")
+    fmt = {".csv": "csv", ".arrow": "feather"}.get(path.suffix, "parquet")
+    return ds.dataset(path, format=fmt)
+
+
+def partition_prices(source="prices_long", root=DATA_PROCESSED, by_year=False, batch_rows=BATCH_ROWS):
+    """
+    Stream a long-format price table into the ticker (and year) partitioned
+    dataset. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    def frames():
+        for batch in source_dataset(source, root).to_batches(batch_size=batch_rows):
+            df = batch.to_pandas()
+            df["date"] = pd.to_datetime(df["date"])
+            df["ticker"] = df["ticker"].astype(str)
+            df = clean_tickers(df, verbose=False)
+            if by_year:
+                df["year"] = df["date"].dt.year.astype("int32")
+            yield df
+
+    batches = frames()
+    first = next(batches, None)
+    if first is None:
+        raise ValueError(f"Table '{source}' is empty")
+    # Types of the first batch for every batch (e.g. an all-null column)
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+
+    n_rows = 0
+
+    def record_batches():
+        nonlocal n_rows
+        for df in itertools.chain([first], batches):
+            n_rows += len(df)
+            yield pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+
+    clear_table(PARTITIONED_TABLE, root)
+    ds.write_dataset(
+        record_batches(), table_path(PARTITIONED_TABLE, root, "parts"), schema=schema,
+        format="parquet", partitioning=["ticker", "year"] if by_year else ["ticker"],
+        partitioning_flavor="hive", basename_template="part-{i}.parquet",
+    )
+    return n_rows
+
+
+def partition_paths(root=DATA_PROCESSED):
+    """{ticker: partition directory}, sorted by ticker"""
+    base = table_path(PARTITIONED_TABLE, root, "parts")
+    if not base.is_dir():
+        raise FileNotFoundError(f"No partitioned prices at {base}; run partition_prices first")
+    paths = {unquote(p.name.split("=", 1)[1]): p for p in base.glob("ticker=*") if p.is_dir()}
+    return dict(sorted(paths.items()))
+
+
+def read_partition(ticker, path, columns=None):
+    """One ticker's rows (every year), sorted by date, in the source column order"""
+    prices = pd.read_parquet(path)
+    prices = prices.drop(columns=["year"], errors="ignore")
+    prices["ticker"] = ticker
+    if columns is not None:
+        prices = prices[[c for c in columns if c in prices.columns]]
+    return prices.sort_values("date").reset_index(drop=True)
+
+
+# === PER-PARTITION STAGES ================================================== #
+
+def partition_returns(prices, market=None):
+    """
+    Returns of one ticker's rows and the market return of their dates
+    (market: date -> return series; None for the market ticker itself).
+    Same values as add_returns / add_market_returns on the full panel,
+    whose returns bridge a ticker's gaps to its previous price.
+    """
+    panel = PricePanel.from_long(prices)
+    prices["return"] = panel.gather(panel.returns(), prices)
+    if market is None:
+        prices["market_return"] = prices["return"]
+    else:
+        prices["market_return"] = prices["date"].map(market).to_numpy(dtype=float, na_value=np.nan)
+    return prices
+
+
+def process_partition(prices, events, market=None):
+    """
+    AR of one ticker's price rows and the CAR stages of its events.
+    Returns (prices, events_with_returns, unmatched, events_with_car, events_labeled).
+    """
+    prices = partition_returns(prices, market)
+    prices = compute_prices_ar(prices, build_alpha_beta_table(prices))
+    model = MarketModel.from_prices(prices)
+
+    merged, unmatched = attach_trading_days(events, prices, model.calendar)
+    with_car = compute_events_car(merged.copy(), prices, model)
+    labeled = add_car_windows(with_car.copy(), prices, model)
+    return prices, merged, unmatched, with_car, labeled
+
+
+def as_ticker_category(prices, tickers):
+    """Same ticker dictionary in every part, as in a one-file table"""
+    prices["ticker"] = pd.Categorical(prices["ticker"], categories=tickers)
+    return prices
+
+
+# === RUN =================================================================== #
+
+def run_out_of_core(events, root=DATA_PROCESSED, market_ticker=MARKET_TICKER, columns=None,
+                    memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Stream every ticker partition through returns -> AR -> CAR, writing
+    the price tables part by part and the event tables at the end.
+    events: raw events (merge_event_returns.load_events). Returns stats.
+    Raises MemoryError after the partition that pushed the peak RSS past
+    memory_limit_mb.
+    """
+    paths = partition_paths(root)
+    tickers = list(paths)
+    if market_ticker not in paths:
+        raise ValueError(f"Market ticker {market_ticker!r} has no partition in {root}")
+
+    check_memory(memory_limit_mb, "before the first partition")
+    market_prices = partition_returns(read_partition(market_ticker, paths[market_ticker], columns))
+    market = market_prices.set_index("date")["return"]
+    market = market[~market.index.duplicated(keep="last")]    # last bar wins, as in the panel
+    check_memory(memory_limit_mb, f"after the market partition {market_ticker!r}")
+
+    events = events.copy()
+    event_tickers = events["ticker"].astype(str).to_numpy()
+    stages = {"events_with_returns": [], "events_unmatched": [], "events_with_car": [], "events_labeled": []}
+
+    for name in ("prices_with_returns", "prices_with_ar"):
+        clear_table(name, root)
+
+    stats = {"tickers": len(tickers), "rows": 0, "max_partition_rows": 0, "rss_mb": {}}
+    for part, ticker in enumerate(tickers):
+        prices = read_partition(ticker, paths[ticker], columns)
+        own = events[event_tickers == ticker]
+        prices, *frames = process_partition(prices, own, None if ticker == market_ticker else market)
+
+        prices = as_ticker_category(prices, tickers)
+        write_partition(prices.drop(columns=AR_COLUMNS), "prices_with_returns", part, root)
+        write_partition(prices, "prices_with_ar", part, root)
+        for stage, frame in zip(stages.values(), frames):
+            stage.append(frame)
+
+        stats["rows"] += len(prices)
+        stats["max_partition_rows"] = max(stats["max_partition_rows"], len(prices))
+        stats["rss_mb"][ticker] = rss_mb()
+        check_memory(memory_limit_mb, f"after partition {ticker!r} ({len(prices)} rows)")
+        del prices
+
+    # Events of tickers without prices: aligned against the market partition,
+    # where their ticker is unknown (unmatched, NaN CARs) as in the full run
+    rest = ~np.isin(event_tickers, tickers)
+    if rest.any():
+        _, *frames = process_partition(market_prices.copy(), events[rest], None)
+        for stage, frame in zip(stages.values(), frames):
+            stage.append(frame)
+
+    outputs = {name: concat_events(frames) for name, frames in stages.items()}
+    outputs["events_labeled"] = add_impact_labels(outputs["events_labeled"])
+    for name, frame in outputs.items():
+        write_table(frame, name, root)
+
+    stats["events"] = len(outputs["events_labeled"])
+    stats["unmatched"] = len(outputs["events_unmatched"])
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return stats
+
+
+# === MAIN ================================================================== #
+
+def main():
+    parser = argparse.ArgumentParser(description="Run returns -> AR -> CAR one ticker partition at a time.")
+    parser.add_argument("--source", default="prices_long", help="long-format price table to partition")
+    parser.add_argument("--by-year", action="store_true", help="also partition the stored prices by year")
+    parser.add_argument("--skip-partition", action="store_true", help="reuse the existing partitions")
+    parser.add_argument("--memory-limit-mb", type=float, default=MEMORY_LIMIT_MB,
+                        help="stop once the peak RSS passes this (0: no limit)")
+    parser.add_argument("--jobs", type=int, default=default_jobs(), help="ignored: runs serially")
+    args = parser.parse_args()
+    warn_serial("out_of_core", args.jobs)
+
+    from .merge_event_returns import load_events
+
+    start = time.perf_counter()
+    if not args.skip_partition:
+        print(f"🗂️  Partitioning {args.source} by ticker{' and year' if args.by_year else ''}...")
+        n_rows = partition_prices(args.source, by_year=args.by_year)
+        print(f"✅ {n_rows} rows -> {table_path(PARTITIONED_TABLE, DATA_PROCESSED, 'parts')}")
+    columns = source_dataset(args.source).schema.names
+
+    events = load_events()
+    print(f"\n📊 Streaming partitions through returns -> AR -> CAR (RSS {rss_mb():.0f} MB)...")
+    stats = run_out_of_core(events, columns=columns, memory_limit_mb=args.memory_limit_mb or None)
+
+    largest = max(stats["rss_mb"], key=stats["rss_mb"].get)
+    print(f"\n✅ {stats['tickers']} tickers, {stats['rows']} price rows, {stats['events']} events "
+          f"({stats['unmatched']} unmatched) in {time.perf_counter() - start:.1f}s")
+    print(f"   Largest partition: {stats['max_partition_rows']} rows")
+    print(f"   RSS after partitions: max {stats['rss_mb'][largest]:.0f} MB ({largest})")
+    print(f"   Peak RSS: {stats['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
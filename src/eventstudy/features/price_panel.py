@@ -0,0 +1,210 @@
+"""
+Dense date x ticker price panel.
+
+A PricePanel holds one float matrix (rows = dates, columns = tickers) with
+a shared date index and ticker index. Returns, market returns, the
+full-sample market model, AR and running CAR are whole-matrix operations,
+and the matrix can be saved as a .npy file and memory-mapped so several
+processes share it zero-copy (compute_returns saves the return panel,
+compute_ar_car and its pool workers map it).
+
+Rows may also be intraday bar timestamps; returns() then takes the
+session of every row so no return spans the overnight gap.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def column_sums(matrix):
+    """
+    Column sums added strictly row by row. ndarray.sum switches to pairwise
+    summation on contiguous columns, so a one-column panel would otherwise
+    round differently from the same column inside a wider panel.
+    """
+    if len(matrix) == 0:
+        return np.zeros(matrix.shape[1:])
+    return np.cumsum(matrix, axis=0)[-1]
+
+
+class PricePanel:
+    """Values laid out as a (dates, tickers) matrix; NaN marks a missing bar"""
+
+    def __init__(self, dates, tickers, values):
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.tickers = list(tickers)
+        self.ticker_index = {t: j for j, t in enumerate(self.tickers)}
+        self.values = values
+        self.path = None  # set by load: the file pool workers can map
+
+        if values.shape != (len(self.dates), len(self.tickers)):
+            raise ValueError(
+                f"Panel shape {values.shape} does not match "
+                f"{len(self.dates)} dates x {len(self.tickers)} tickers"
+            )
+
+    @classmethod
+    def from_long(cls, prices, value_col="adj_close", dtype=np.float64):
+        """Build the panel from a long-format frame (date, ticker, value_col)"""
+        date_codes, dates = pd.factorize(prices["date"], sort=True)
+        ticker_codes, tickers = pd.factorize(prices["ticker"].astype(str), sort=True)
+
+        values = np.full((len(dates), len(tickers)), np.nan, dtype=dtype)
+        values[date_codes, ticker_codes] = prices[value_col].to_numpy(dtype=dtype, na_value=np.nan)
+        return cls(dates.to_numpy(dtype="datetime64[ns]"), tickers, values)
+
+    # === PERSISTENCE ======================================================= #
+
+    @staticmethod
+    def paths(path):
+        path = Path(path)
+        return path.with_suffix(".npy"), path.with_suffix(".json")
+
+    def save(self, path):
+        """Write the matrix as <path>.npy and its indexes as <path>.json"""
+        values_path, index_path = self.paths(path)
+        values_path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(values_path, self.values)
+
+        # Daily panels keep plain dates; intraday panels need the time
+        days = self.dates.astype("datetime64[D]")
+        unit = "D" if (self.dates == days).all() else "s"
+        index_path.write_text(json.dumps({
+            "dates": np.datetime_as_string(self.dates, unit=unit).tolist(),
+            "tickers": self.tickers,
+        }))
+        return values_path
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load a saved panel, memory-mapping the matrix by default"""
+        values_path, index_path = cls.paths(path)
+        index = json.loads(index_path.read_text())
+        values = np.load(values_path, mmap_mode=mmap_mode)
+        panel = cls(np.array(index["dates"], dtype="datetime64[ns]"), index["tickers"], values)
+        panel.path = Path(path)
+        return panel
+
+    # === LOOKUPS =========================================================== #
+
+    def column(self, ticker):
+        return self.values[:, self.ticker_index[ticker]]
+
+    def cells(self, frame):
+        """(row, col) panel coordinates of every (date, ticker) row of a frame"""
+        dates = frame["date"].to_numpy(dtype="datetime64[ns]")
+        rows = np.searchsorted(self.dates, dates)
+        cols = frame["ticker"].astype(str).map(self.ticker_index).to_numpy()
+        return rows, cols
+
+    def gather(self, matrix, frame):
+        """Values of a panel-shaped matrix at the rows of a long-format frame"""
+        rows, cols = self.cells(frame)
+        return matrix[rows, cols]
+
+    def scatter(self, frame, col):
+        """Panel-shaped matrix of a long frame's column (NaN in cells without a row)"""
+        rows, cols = self.cells(frame)
+        out = np.full(self.values.shape, np.nan)
+        out[rows, cols] = frame[col].to_numpy(dtype=float, na_value=np.nan)
+        return out
+
+    def by_date(self, frame, col):
+        """
+        Per-date vector of a column that only depends on the date (e.g. the
+        market return of each row); NaN on dates the frame does not have.
+        """
+        rows, _ = self.cells(frame)
+        out = np.full(len(self.dates), np.nan)
+        out[rows] = frame[col].to_numpy(dtype=float, na_value=np.nan)
+        return out
+
+    def covers(self, frame):
+        """Whether every (date, ticker) of a frame has a cell in the panel"""
+        dates = frame["date"].to_numpy(dtype="datetime64[ns]")
+        tickers = frame["ticker"].astype(str).unique()
+        return bool(np.isin(dates, self.dates).all()) and all(t in self.ticker_index for t in tickers)
+
+    def coverage(self):
+        """First/last date and bar count of every ticker"""
+        valid = ~np.isnan(self.values)
+        has_data = valid.any(axis=0)
+        first = np.where(has_data, valid.argmax(axis=0), 0)
+        last = np.where(has_data, len(self.dates) - 1 - valid[::-1].argmax(axis=0), 0)
+        return pd.DataFrame({
+            "first_date": np.where(has_data, self.dates[first], np.datetime64("NaT")),
+            "last_date": np.where(has_data, self.dates[last], np.datetime64("NaT")),
+            "n_bars": valid.sum(axis=0),
+        }, index=pd.Index(self.tickers, name="ticker"))
+
+    # === MATRIX OPERATIONS ================================================= #
+
+    def returns(self, sessions=None, max_gap=0):
+        """
+        Simple returns of every column against its previous valid price.
+        Cells without a price stay NaN; gaps are bridged, not zero-filled.
+        With sessions (one increasing id per row), a return whose previous
+        price lies more than max_gap sessions back is NaN: with max_gap=0
+        intraday returns never span the night, with max_gap=1 the first bar
+        of a session returns against the previous session's close.
+        """
+        prev = pd.DataFrame(self.values).ffill().shift(1).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = self.values / prev - 1.0
+
+        if sessions is not None:
+            sessions = np.asarray(sessions, dtype=float)[:, None]
+            ids = np.where(np.isnan(self.values), np.nan, sessions)
+            prev_ids = pd.DataFrame(ids).ffill().shift(1).to_numpy()
+            out[~(sessions - prev_ids <= max_gap)] = np.nan
+        return out
+
+    def market_returns(self, returns, market_ticker):
+        """Market return of each date, as a column vector broadcastable to the panel"""
+        return returns[:, [self.ticker_index[market_ticker]]]
+
+    @staticmethod
+    def fit_market_model(returns, market):
+        """
+        Full-sample OLS of every column on the market return.
+        Returns (alpha, beta) arrays, NaN for columns with < 3 usable days.
+        """
+        valid = ~(np.isnan(returns) | np.isnan(market))
+        y = np.where(valid, returns, 0.0)
+        x = np.where(valid, market, 0.0)
+
+        n = valid.sum(axis=0).astype(float)
+        n_safe = np.where(n > 0, n, 1.0)
+        sx, sy = column_sums(x), column_sums(y)
+        sxx_c = column_sums(x * x) - sx * sx / n_safe
+        sxy_c = column_sums(x * y) - sx * sy / n_safe
+
+        ok = (n >= 3) & (sxx_c > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = sxy_c / sxx_c
+            alpha = (sy - beta * sx) / n_safe
+        return np.where(ok, alpha, np.nan), np.where(ok, beta, np.nan)
+
+    @staticmethod
+    def expected_returns(market, alpha, beta):
+        """
+        Market-model return alpha + beta * m of every cell; market is a
+        column vector or a panel-shaped matrix.
+        """
+        return alpha[None, :] + beta[None, :] * market
+
+    @staticmethod
+    def abnormal_returns(returns, expected):
+        """AR = r - E[r] for the whole matrix"""
+        return returns - expected
+
+    @staticmethod
+    def car(ar):
+        """
+        Running CAR of every column from the first row (NaN days add
+        nothing): the CAR over rows (a, b] is car[b] - car[a].
+        """
+        return np.nancumsum(ar, axis=0)
@@ -0,0 +1,227 @@
+"""
+Significance tests for CARs.
+
+Every test runs on the event x window CAR matrix for every subgroup at
+once. Subgroup membership is a (groups x events) 0/1 matrix, so a grouped
+sum is a single matrix product and no loop runs over events or groups.
+
+Tests:
+- t_cs      cross-sectional t test on raw CARs
+- patell    Patell (1976) Z on CARs standardized by estimation-window sigma
+- bmp       Boehmer-Musumeci-Poulsen (1991) cross-sectional t on standardized CARs
+- corrado   Corrado (1989) rank test, ranks over estimation + event days
+- gen_sign  Cowan (1992) generalized sign test
+"""
+
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, write_table
+from ..sharded import warn_serial
+from .car_into_label import CAR_WINDOWS as LABEL_WINDOWS
+from .compute_ar_car import CAR_WINDOWS as EVENT_WINDOWS
+from .market_model import ESTIMATION_WINDOW, MarketModel
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+RESULTS_DIR = BASE_DIR / "results"
+
+CAR_WINDOWS = {**EVENT_WINDOWS, **LABEL_WINDOWS}
+GROUP_COLUMNS = ("publisher", "event_type", "franchise", "sentiment")
+TESTS = ("t_cs", "patell", "bmp", "corrado", "gen_sign")
+
+
+# === GROUPS ================================================================ #
+
+def group_matrix(events, group_cols=GROUP_COLUMNS):
+    """
+    Membership matrix (groups x events) of the full sample plus every
+    value of every group column, and the matching (column, value) labels.
+    """
+    labels = [("all", "all")]
+    blocks = [np.ones((1, len(events)))]
+
+    for col in group_cols:
+        if col not in events.columns:
+            continue
+        codes, values = pd.factorize(events[col].astype("string").str.strip(), sort=True)
+        blocks.append((codes[None, :] == np.arange(len(values))[:, None]).astype(float))
+        labels.extend((col, v) for v in values)
+
+    return np.vstack(blocks), labels
+
+
+def grouped_moments(G, X):
+    """Count, mean and sample std of every column of X within every group"""
+    valid = ~np.isnan(X)
+    Xz = np.where(valid, X, 0.0)
+
+    n = G @ valid
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (G @ Xz) / n
+        var = ((G @ (Xz * Xz)) - n * mean * mean) / (n - 1)
+    return n, mean, np.sqrt(np.maximum(var, 0.0))
+
+
+# === P-VALUES ============================================================== #
+
+def normal_p(z):
+    from scipy import stats
+
+    return 2 * stats.norm.sf(np.abs(z))
+
+
+def t_p(t, df):
+    from scipy import stats
+
+    with np.errstate(invalid="ignore"):
+        return 2 * stats.t.sf(np.abs(t), np.where(df > 0, df, np.nan))
+
+
+# === TESTS ================================================================= #
+
+def car_tests(car, sigma2, n_est, lengths, G):
+    """
+    Cross-sectional t, Patell Z and BMP t for every group x window.
+    car: events x windows, sigma2 / n_est: per event, lengths: per window.
+    """
+    n, mean, std = grouped_moments(G, car)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_cs = mean / (std / np.sqrt(n))
+
+        # CARs standardized by their estimation-window standard deviation
+        scar = car / np.sqrt(sigma2[:, None] * lengths[None, :])
+        scar[~np.isfinite(scar)] = np.nan
+        n_s, mean_s, std_s = grouped_moments(G, scar)
+
+        # Var(SCAR_i) = (T_i - 2) / (T_i - 4) under the null
+        var_term = np.where(n_est > 4, (n_est - 2) / (n_est - 4), np.nan)
+        var_term = np.where(np.isnan(scar), 0.0, var_term[:, None])
+        patell = (G @ np.nan_to_num(scar)) / np.sqrt(G @ var_term)
+
+        bmp = mean_s / (std_s / np.sqrt(n_s))
+
+    return {
+        "n": n, "mean_car": mean,
+        "t_cs": (t_cs, t_p(t_cs, n - 1)),
+        "patell": (patell, normal_p(patell)),
+        "bmp": (bmp, t_p(bmp, n_s - 1)),
+    }
+
+
+def corrado_test(ar, window_cols, G):
+    """
+    Corrado rank test. ar: events x days (estimation + event days);
+    window_cols: for every CAR window, the column indices of its days.
+    """
+    # Standardized ranks U = K / (1 + M) - 0.5 per event, NaN days excluded
+    ranks = pd.DataFrame(ar).rank(axis=1).to_numpy()
+    m = (~np.isnan(ar)).sum(axis=1, keepdims=True)
+    u = ranks / (1 + m) - 0.5
+
+    valid = ~np.isnan(u)
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # Groups without any ranked day give all-NaN rows
+        warnings.simplefilter("ignore", RuntimeWarning)
+        u_bar = (G @ np.where(valid, u, 0.0)) / (G @ valid)
+        s_u = np.sqrt(np.nanmean(u_bar * u_bar, axis=1))
+
+        stats = np.column_stack([
+            np.nansum(u_bar[:, cols], axis=1) / (np.sqrt(len(cols)) * s_u)
+            for cols in window_cols
+        ])
+    return stats, normal_p(stats)
+
+
+def sign_test(car, est_ar, G):
+    """Generalized sign test against the estimation-window share of positive ARs"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        est_valid = ~np.isnan(est_ar)
+        frac_pos = (np.where(est_valid, est_ar > 0, False).sum(axis=1)
+                    / est_valid.sum(axis=1))
+
+        has_frac = ~np.isnan(frac_pos)
+        p_hat = (G @ np.where(has_frac, frac_pos, 0.0)) / (G @ has_frac)
+
+        valid = ~np.isnan(car)
+        n = G @ valid
+        wins = G @ (valid & (np.nan_to_num(car) > 0))
+        p = p_hat[:, None]
+        z = (wins - n * p) / np.sqrt(n * p * (1 - p))
+    return z, normal_p(z)
+
+
+# === ALL TESTS ============================================================= #
+
+def significance_table(events, model, windows=CAR_WINDOWS, group_cols=GROUP_COLUMNS,
+                       estimation_window=ESTIMATION_WINDOW):
+    """
+    Run every test for every window and subgroup.
+    Long format: group_col, group, window, n, mean_car, test, statistic, p_value.
+    """
+    names = list(windows)
+    car = events[names].to_numpy(dtype=float, na_value=np.nan)
+    sigma2 = events["sigma2"].to_numpy(dtype=float, na_value=np.nan)
+    n_est = events["n_est"].to_numpy(dtype=float, na_value=np.nan)
+    lengths = np.array([end - start + 1 for start, end in windows.values()], dtype=float)
+
+    G, labels = group_matrix(events, group_cols)
+    results = car_tests(car, sigma2, n_est, lengths, G)
+
+    # Daily ARs over the estimation window plus the span of all CAR windows
+    est = np.arange(estimation_window[0], estimation_window[1] + 1)
+    lo = min(start for start, _ in windows.values())
+    hi = max(end for _, end in windows.values())
+    offsets = np.union1d(est, np.arange(lo, hi + 1))
+
+    positions = model.calendar.locate(events["ticker"], events["trading_date"])
+    ar = model.ar_matrix(positions, offsets, events["alpha"], events["beta"])
+
+    window_cols = [np.searchsorted(offsets, np.arange(s, e + 1)) for s, e in windows.values()]
+    results["corrado"] = corrado_test(ar, window_cols, G)
+    results["gen_sign"] = sign_test(car, ar[:, np.isin(offsets, est)], G)
+
+    index = pd.MultiIndex.from_tuples(labels, names=["group_col", "group"])
+    frames = []
+    for test in TESTS:
+        stat, p_value = results[test]
+        for w, name in enumerate(names):
+            frames.append(pd.DataFrame({
+                "window": name,
+                "n": results["n"][:, w].astype(int),
+                "mean_car": results["mean_car"][:, w],
+                "test": test,
+                "statistic": stat[:, w],
+                "p_value": p_value[:, w],
+            }, index=index))
+
+    return pd.concat(frames).reset_index()
+
+
+# === MAIN ================================================================== #
+
+def main():
+    warn_serial("significance")
+    print("📥 Loading data...")
+    events = read_table("events_labeled")
+    prices = read_table("prices_with_ar")
+    print(f"✅ Loaded {len(events)} events")
+
+    print("\n📊 Running significance tests...")
+    model = MarketModel.from_prices(prices)
+    table = significance_table(events, model)
+
+    overall = table[table["group_col"] == "all"]
+    print(overall.pivot(index="window", columns="test", values="p_value").round(4))
+
+    out_path = write_table(table, "car_significance")
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    table.to_csv(RESULTS_DIR / "car_significance.csv", index=False)
+    print(f"\n✅ Saved: {out_path}")
+    print(f"✅ Saved: {RESULTS_DIR / 'car_significance.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Link events to vgsales games and attach their global sales.
+
+Titles differ between the two sources ("GTA V" vs "Grand Theft Auto V",
+roman vs arabic numerals, platform notes, one vgsales row per platform).
+Both sides are normalized through alias tables, sales are aggregated per
+game across platforms, and candidates come from a character-trigram
+inverted index: a query only touches the games sharing a trigram with
+it, never the whole catalogue.
+
+Trigram similarity alone links games of one franchise ("Call of Duty:
+Warzone" vs "Call of Duty: Ghosts"), so a candidate must also agree on
+the tokens the two titles do not share (the subtitle), and cannot have
+been released after the last event about the game.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from ..data.store import read_table, write_table
+from ..sharded import warn_serial
+
+# Whole-token expansions applied after lower-casing
+TOKEN_ALIASES = {
+    "gta": "grand theft auto",
+    "rdr": "red dead redemption",
+    "rdr2": "red dead redemption 2",
+    "cod": "call of duty",
+    "ac": "assassins creed",
+    "&": "and",
+}
+ROMAN_NUMERALS = {
+    "ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6",
+    "vii": "7", "viii": "8", "ix": "9", "x": "10",
+}
+# Whole-title aliases, applied to the normalized title
+TITLE_ALIASES = {
+    "grand theft auto online": "grand theft auto 5",
+}
+PUBLISHER_ALIASES = {
+    "take-two": "take-two interactive",
+    "ea": "electronic arts",
+    "activision blizzard": "activision",
+}
+# Event "games" that are not a single title
+NON_TITLES = {"", "multiple titles", "corporate", "nintendo switch", "nintendo switch oled", "zynga"}
+
+# Tokens ignored when comparing subtitles
+STOP_TOKENS = {"the", "of", "and", "a"}
+
+NGRAM = 3
+MIN_SCORE = 0.75
+# Trigrams in more than this share of the catalogue carry no signal
+MAX_POSTING_SHARE = 0.2
+
+
+# === NORMALIZATION ========================================================= #
+
+def normalize_title(title):
+    """Lower-case ASCII tokens with aliases expanded and numerals as digits"""
+    if pd.isna(title):
+        return ""
+    text = unicodedata.normalize("NFKD", str(title)).encode("ascii", "ignore").decode()
+    text = re.sub(r"\([^)]*\)", " ", text.lower())     # platform notes
+    text = text.replace("'", "")
+    tokens = re.findall(r"[a-z0-9&]+", text)
+
+    expanded = []
+    for tok in tokens:
+        tok = TOKEN_ALIASES.get(tok, tok)
+        expanded.extend(ROMAN_NUMERALS.get(t, t) for t in tok.split())
+    title = " ".join(expanded)
+    return TITLE_ALIASES.get(title, title)
+
+
+def normalize_publisher(publisher):
+    key = str(publisher).strip().lower()
+    return PUBLISHER_ALIASES.get(key, key)
+
+
+def numbers(title_key):
+    """Numeric tokens of a normalized title (sequel numbers, years)"""
+    return frozenset(t for t in title_key.split() if t.isdigit())
+
+
+def ngrams(title, n=NGRAM):
+    padded = f" {title} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 1.0
+
+
+def subtitle_score(key, other):
+    """
+    Similarity of the tokens two titles do not share, from their first
+    shared token on: leading tokens only one side has are an omitted
+    franchise prefix ("battlefront 2" vs "star wars battlefront 2"), any
+    later one is a subtitle. Same subtitle (or none) scores 1, a subtitle
+    on one side only 0, two different subtitles their trigram Dice.
+    """
+    a, b = key.split(), other.split()
+    shared = set(a) & set(b)
+    if not shared:
+        return 0.0
+
+    def rest(tokens):
+        first = next(i for i, t in enumerate(tokens) if t in shared)
+        return [t for t in tokens[first:] if t not in shared and t not in STOP_TOKENS]
+
+    rest_a, rest_b = rest(a), rest(b)
+    if not rest_a and not rest_b:
+        return 1.0
+    if not rest_a or not rest_b:
+        return 0.0
+    return dice(ngrams(" ".join(rest_a)), ngrams(" ".join(rest_b)))
+
+
+# === CATALOGUE ============================================================= #
+
+def aggregate_sales(vgsales):
+    """One row per (title, publisher): global sales summed across platforms"""
+    vg = vgsales.copy()
+    if "Platform" in vg.columns:
+        vg = vg.drop_duplicates(["Name", "Platform", "Year", "Publisher"])
+
+    vg["title_key"] = vg["Name"].astype(str).map(normalize_title)
+    vg["publisher_key"] = vg["Publisher"].astype(str).map(normalize_publisher)
+    return (
+        vg.groupby(["title_key", "publisher_key"], as_index=False)
+        .agg(title=("Name", "first"), release_year=("Year", "min"),
+             global_sales=("Global_Sales", "sum"))
+    )
+
+
+class TitleIndex:
+    """Character n-gram inverted index over normalized catalogue titles"""
+
+    def __init__(self, catalogue, n=NGRAM, max_posting_share=MAX_POSTING_SHARE):
+        self.catalogue = catalogue.reset_index(drop=True)
+        self.n = n
+        self.grams = [ngrams(k, n) for k in self.catalogue["title_key"]]
+
+        postings = defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {g: np.array(ids) for g, ids in postings.items()}
+        self.max_posting = max(1, int(max_posting_share * len(self.grams)))
+
+    def candidates(self, title_key):
+        """
+        (catalogue ids, Dice similarity) of the titles sharing an n-gram.
+        Grams common to much of the catalogue are skipped when collecting
+        candidates (unless the title has nothing rarer); similarity is
+        then exact on the candidates.
+        """
+        grams = ngrams(title_key, self.n)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        rare = [ids for ids in hits if len(ids) <= self.max_posting]
+        if not hits:
+            return np.array([], dtype=int), np.array([])
+
+        ids = np.unique(np.concatenate(rare or hits))
+        overlap = np.array([len(grams & self.grams[i]) for i in ids])
+        sizes = np.array([len(self.grams[i]) for i in ids])
+        return ids, 2 * overlap / (len(grams) + sizes)
+
+    def match(self, title, publisher=None, min_score=MIN_SCORE, max_year=None):
+        """
+        Best catalogue row for a title, or None below min_score. Games
+        released after max_year (the last event's year) are not candidates.
+        """
+        key = normalize_title(title)
+        if key in NON_TITLES:
+            return None
+
+        ids, score = self.candidates(key)
+        if len(ids) == 0:
+            return None
+
+        # Exact normalized titles always win; a different sequel number
+        # ("... 6" vs "... 5", "fifa 23" vs "fifa 14") never matches, and
+        # neither does another subtitle of the franchise
+        titles = self.catalogue["title_key"].to_numpy()[ids]
+        wanted = numbers(key)
+        score = np.minimum(score, [subtitle_score(key, t) for t in titles])
+        score = np.where([numbers(t) == wanted for t in titles], score, 0.0)
+        score = np.where(titles == key, 1.0, score)
+
+        if max_year is not None and not pd.isna(max_year):
+            released = self.catalogue["release_year"].to_numpy(dtype=float, na_value=np.nan)[ids]
+            score = np.where(released > max_year, 0.0, score)
+
+        # Same publisher only breaks ties; the score stays the title similarity
+        top = np.flatnonzero(score == score.max())
+        best = top[0]
+        if publisher is not None:
+            same = self.catalogue["publisher_key"].to_numpy()[ids[top]] == normalize_publisher(publisher)
+            best = top[int(np.argmax(same))]
+
+        if score[best] < min_score:
+            return None
+        return ids[best], float(score[best])
+
+
+# === MATCH EVENTS ========================================================== #
+
+def match_events(events, catalogue, min_score=MIN_SCORE, date_col="event_date"):
+    """
+    Match every distinct (game, publisher) of the events once, among the
+    games released by the year of its last event (when events have dates).
+    Returns event_id, match_score, matched_title, release_year, global_sales.
+    """
+    index = TitleIndex(catalogue)
+    keys = events[["game", "publisher"]].astype("string")
+    if date_col in events.columns:
+        years = pd.to_datetime(events[date_col]).dt.year.to_numpy()
+        pairs = keys.assign(max_year=years).groupby(["game", "publisher"], dropna=False, sort=False)
+        pairs = pairs["max_year"].max().reset_index()
+    else:
+        pairs = keys.drop_duplicates().reset_index(drop=True).assign(max_year=np.nan)
+
+    hits = [index.match(g, p, min_score, y) for g, p, y in pairs.itertuples(index=False)]
+    pairs = pairs.drop(columns="max_year")
+    pairs["match_score"] = [h[1] if h else np.nan for h in hits]
+    pairs["cat_id"] = pd.array([h[0] if h else None for h in hits], dtype="Int64")
+
+    found = catalogue.reset_index(drop=True)[["title", "release_year", "global_sales"]]
+    found = found.rename(columns={"title": "matched_title"})
+    pairs = pairs.merge(found, left_on="cat_id", right_index=True, how="left")
+
+    result = keys.assign(event_id=events["event_id"].to_numpy())
+    result = result.merge(pairs, on=["game", "publisher"], how="left")
+    return result[["event_id", "match_score", "matched_title", "release_year", "global_sales"]]
+
+
+# === MAIN ================================================================== #
+
+def main():
+    warn_serial("title_matching")
+    print("📥 Loading events and vgsales...")
+    events = read_table("events_labeled")
+    vgsales = read_table("vgsales_cleaned")
+
+    catalogue = aggregate_sales(vgsales)
+    print(f"✅ {len(vgsales)} vgsales rows -> {len(catalogue)} games")
+
+    matches = match_events(events, catalogue)
+    n_matched = matches["matched_title"].notna().sum()
+    print(f"✅ Matched {n_matched} of {len(matches)} events to a game")
+    print(matches.dropna(subset=["matched_title"]).drop_duplicates("matched_title").head(20))
+
+    out_path = write_table(matches, "event_sales")
+    print(f"✅ Saved: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
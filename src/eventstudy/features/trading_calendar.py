@@ -0,0 +1,153 @@
+"""
+Shared trading calendar: maps (ticker, date) to integer trading-day positions.
+"""
+
+import numpy as np
+import pandas as pd
+
+DIRECTIONS = ("backward", "forward", "nearest")
+
+
+class TradingCalendar:
+    """
+    Trading days of every ticker laid out in one flat, (ticker, date)-sorted
+    array. Each ticker owns a contiguous segment, so a trading-day offset is
+    just an integer step inside that segment and event windows resolve by
+    slicing instead of date comparisons.
+
+    Dates may also be intraday bar timestamps: offsets then count bars.
+    """
+
+    def __init__(self, tickers, dates):
+        codes, names = pd.factorize(pd.Series(tickers), sort=True)
+        order = np.lexsort((dates, codes))
+
+        self.order = order
+        self.tickers = list(names)
+        self.ticker_codes = {t: i for i, t in enumerate(names)}
+        self.codes = codes[order]
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")[order]
+
+        # Segment bounds of each ticker inside the flat sorted arrays
+        bounds = np.searchsorted(self.codes, np.arange(len(names) + 1))
+        self.starts = bounds[:-1]
+        self.ends = bounds[1:]
+
+        # Sorted composite (ticker code, date rank) keys: one searchsorted
+        # over them resolves as-of lookups for every ticker at once
+        self._unique_dates = np.unique(self.dates)
+        self._stride = len(self._unique_dates) + 1
+        self._keys = self.codes * self._stride + np.searchsorted(self._unique_dates, self.dates)
+
+    @classmethod
+    def from_prices(cls, prices):
+        """Build the calendar from a long-format price frame (ticker, date)"""
+        return cls(
+            prices["ticker"].to_numpy(),
+            prices["date"].to_numpy(dtype="datetime64[ns]"),
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def check_frame(self, frame):
+        """
+        Raise unless frame has the (ticker, date) rows the calendar was built
+        from, in the same row order: positions map to rows through self.order,
+        so any other frame would be read silently misaligned.
+        """
+        if len(frame) != len(self):
+            raise ValueError(
+                f"Frame has {len(frame)} rows but the calendar was built from {len(self)}"
+            )
+        dates = frame["date"].to_numpy(dtype="datetime64[ns]")[self.order]
+        codes = self.codes_of(frame["ticker"])[self.order]
+        if not (np.array_equal(dates.view(np.int64), self.dates.view(np.int64))
+                and np.array_equal(codes, self.codes)):
+            raise ValueError("Frame rows do not match the calendar it is read with")
+
+    def column(self, frame, col):
+        """Values of frame[col] in calendar order (frame must be the source frame)"""
+        self.check_frame(frame)
+        return frame[col].to_numpy(dtype=float, na_value=np.nan)[self.order]
+
+    def frame_rows(self, frame, positions):
+        """Row numbers of the source frame for calendar positions"""
+        self.check_frame(frame)
+        return self.order[positions]
+
+    def locate(self, tickers, dates, direction="backward", after_close=None):
+        """
+        Calendar position of each (ticker, date) in one vectorized pass.
+
+        direction picks the trading day for dates that are not one:
+        "backward" (last on or before), "forward" (first on or after) or
+        "nearest" (ties go backward). Rows flagged in after_close move to
+        the first trading day strictly after the date.
+
+        Returns -1 for unknown tickers, missing dates and dates outside
+        the ticker's history in the chosen direction.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}, got {direction!r}")
+
+        codes = self.codes_of(tickers)
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[ns]")
+        known = (codes >= 0) & ~np.isnat(dates)
+        safe = np.where(known, codes, 0)
+        seg_start, seg_end = self.starts[safe], self.ends[safe]
+
+        # Number of the ticker's trading days before / on-or-before each date
+        base = safe * self._stride
+        before = np.searchsorted(self._keys, base + np.searchsorted(self._unique_dates, dates, "left"))
+        upto = np.searchsorted(self._keys, base + np.searchsorted(self._unique_dates, dates, "right"))
+
+        backward = np.where(upto > seg_start, upto - 1, -1)
+        forward = np.where(before < seg_end, before, -1)
+
+        if direction == "backward":
+            positions = backward
+        elif direction == "forward":
+            positions = forward
+        else:
+            gap_back = dates - self.dates[np.maximum(backward, 0)]
+            gap_fwd = self.dates[np.maximum(forward, 0)] - dates
+            use_fwd = (backward < 0) | ((forward >= 0) & (gap_fwd < gap_back))
+            positions = np.where(use_fwd, forward, backward)
+
+        if after_close is not None:
+            after_close = np.asarray(after_close, dtype=bool)
+            next_day = np.where(upto < seg_end, upto, -1)
+            positions = np.where(after_close, next_day, positions)
+
+        return np.where(known, positions, -1).astype(np.int64)
+
+    def codes_of(self, tickers):
+        """Ticker code of each ticker, -1 if the calendar does not know it"""
+        return pd.Index(self.tickers).get_indexer(pd.Index(np.asarray(tickers).astype(str)))
+
+    def local_positions(self, positions):
+        """Trading-day number within each position's own ticker"""
+        positions = np.asarray(positions)
+        return np.where(positions >= 0, positions - self.starts[self.codes[positions]], -1)
+
+    def window(self, positions, start, end):
+        """
+        Half-open calendar-position bounds [lo, hi) of the window
+        [start, end] trading days around each position, clipped to the
+        ticker's own history. Invalid positions give an empty window.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        valid = positions >= 0
+        safe = np.where(valid, positions, 0)
+
+        code = self.codes[safe]
+        seg_start, seg_end = self.starts[code], self.ends[code]
+
+        lo = np.clip(safe + start, seg_start, seg_end)
+        hi = np.clip(safe + end + 1, seg_start, seg_end)
+        hi = np.maximum(hi, lo)
+
+        lo[~valid] = 0
+        hi[~valid] = 0
+        return lo, hi
@@ -0,0 +1,366 @@
+"""
+Incremental pipeline runner.
+
+The processing scripts are declared as a DAG of stages with their inputs
+and outputs. Each stage is fingerprinted from the content of its inputs,
+its parameters (CAR windows, thresholds, ...) and the source code of its
+module and every package module it imports (market model, calendar,
+store, ...); a stage whose fingerprint matches the last successful run and
+whose outputs all exist is skipped.
+
+    python -m eventstudy.pipeline              # run what is out of date
+    python -m eventstudy.pipeline --dry-run    # show what would run
+    python -m eventstudy.pipeline --force      # rebuild everything
+    python -m eventstudy.pipeline car_into_label   # one stage + its upstream
+    python -m eventstudy.pipeline --jobs 8     # per-ticker stages on 8 processes
+                                               # (which ones: eventstudy.sharded)
+"""
+
+import argparse
+import ast
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+from .data.store import DATA_PROCESSED, table_file
+from .sharded import JOBS_ENV
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_RAW = BASE_DIR / "data" / "raw"
+STATE_FILE = DATA_PROCESSED / ".pipeline_state.json"
+
+
+# === STAGES ================================================================ #
+
+class Stage:
+    """
+    One pipeline step. Inputs are raw files (Path) or store tables (str),
+    or the name of a module function returning them (for inputs discovered
+    at run time). Outputs are store tables (str) or other files the stage
+    writes (Path), params are module attributes that take part in the
+    fingerprint.
+    """
+
+    def __init__(self, name, module, func="main", inputs=(), outputs=(), params=(),
+                 discover=None):
+        self.name = name
+        self.module = module
+        self.func = func
+        self.inputs = list(inputs)
+        self.discover = discover
+        self.outputs = list(outputs)
+        self.params = list(params)
+
+    def load(self):
+        return importlib.import_module(f".{self.module}", __package__)
+
+    def run(self, module):
+        return getattr(module, self.func)()
+
+    def resolve_inputs(self, module):
+        """Declared inputs plus whatever the discover function returns"""
+        if self.discover is None:
+            return self.inputs
+        return self.inputs + list(getattr(module, self.discover)())
+
+
+STAGES = [
+    Stage(
+        "build_prices", "data.build_prices",
+        discover="price_files",
+        outputs=["prices_long", "prices_wide"],
+        params=["PRICE_SOURCES"],
+    ),
+    Stage(
+        "compute_returns", "features.compute_returns",
+        inputs=["prices_long"],
+        outputs=["prices_with_returns", DATA_PROCESSED / "return_panel.npy", DATA_PROCESSED / "return_panel.json"],
+        params=["MARKET_TICKER"],
+    ),
+    Stage(
+        "market_context", "features.market_context", func="build_context_store",
+        inputs=[DATA_RAW / "VIX_2010_2025.csv", "prices_with_returns"],
+        outputs=["market_context", "ticker_context"],
+        params=["MARKET_TICKER", "LOOKBACKS", "VIX_CHANGES", "MIN_OBS_SHARE"],
+    ),
+    Stage(
+        "merge_event_returns", "features.merge_event_returns",
+        inputs=[DATA_RAW / "events.csv", "prices_with_returns"],
+        outputs=["events_with_returns", "events_unmatched"],
+        params=["ALIGN_DIRECTION", "MARKET_CLOSE"],
+    ),
+    Stage(
+        "compute_ar_car", "features.compute_ar_car",
+        inputs=[
+            "prices_with_returns", "events_with_returns",
+            DATA_PROCESSED / "return_panel.npy", DATA_PROCESSED / "return_panel.json",
+        ],
+        outputs=["events_with_car", "prices_with_ar"],
+        params=["CAR_WINDOWS", "ESTIMATION_WINDOW"],
+    ),
+    Stage(
+        "car_into_label", "features.car_into_label",
+        inputs=["events_with_car", "prices_with_ar"],
+        outputs=["events_labeled"],
+        params=["CAR_WINDOWS", "IMPACT_THRESHOLDS", "LABEL_WINDOW", "LABEL_SCHEME"],
+    ),
+    Stage(
+        "event_context", "features.market_context", func="attach_context",
+        inputs=["events_labeled", "market_context", "ticker_context"],
+        outputs=["events_with_context"],
+    ),
+    Stage(
+        "clean_vgsales", "data.data_cleaner_vgs",
+        inputs=[DATA_RAW / "vgsales.csv"],
+        outputs=["vgsales_cleaned"],
+        params=["MIN_YEAR", "PUBLISHERS", "COLUMNS_TO_KEEP", "COLUMN_ALIASES"],
+    ),
+    Stage(
+        "title_matching", "features.title_matching",
+        inputs=["events_labeled", "vgsales_cleaned"],
+        outputs=["event_sales"],
+        params=["TOKEN_ALIASES", "TITLE_ALIASES", "PUBLISHER_ALIASES", "MIN_SCORE"],
+    ),
+    Stage(
+        "car_regression", "features.car_regression",
+        inputs=["events_with_context", "event_sales"],
+        outputs=["car_regression"],
+        params=["CAR_WINDOWS", "SPEC_TERMS", "CLUSTER_COL"],
+    ),
+    Stage(
+        "significance", "features.significance",
+        inputs=["events_labeled", "prices_with_ar"],
+        outputs=["car_significance"],
+        params=["CAR_WINDOWS", "GROUP_COLUMNS", "ESTIMATION_WINDOW"],
+    ),
+    Stage(
+        "monte_carlo", "features.monte_carlo",
+        inputs=["events_labeled", "prices_with_ar"],
+        outputs=["car_monte_carlo"],
+        # JOBS is left out: results do not depend on the worker count
+        params=["CAR_WINDOWS", "GROUP_COLUMNS", "N_BOOTSTRAP", "N_PLACEBO", "SEED"],
+    ),
+    Stage(
+        "car_surface", "features.car_surface",
+        inputs=["events_labeled", "prices_with_ar"],
+        outputs=["car_surface_summary"],
+        params=["SURFACE_RANGE"],
+    ),
+    Stage(
+        "build_ml_dataset", "features.build_ml_dataset",
+        inputs=["events_labeled"],
+        outputs=["ml_dataset", DATA_PROCESSED / "ml_onehot.npz", DATA_PROCESSED / "ml_encoder.json"],
+        params=["CATEGORICAL_COLUMNS", "MIN_CATEGORY_COUNT"],
+    ),
+]
+
+
+# === DAG =================================================================== #
+
+def upstream(stage, producers):
+    """Names of the stages producing this stage's table inputs"""
+    return [producers[i] for i in stage.inputs if isinstance(i, str) and i in producers]
+
+
+def topological_order(stages):
+    """Stages sorted so every producer runs before its consumers"""
+    producers = {out: s.name for s in stages for out in s.outputs}
+    by_name = {s.name: s for s in stages}
+
+    ordered, done, visiting = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a cycle through stage '{name}'")
+        visiting.add(name)
+        for dep in upstream(by_name[name], producers):
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+
+    for s in stages:
+        visit(s.name)
+    return ordered
+
+
+def select(stages, targets):
+    """Restrict the pipeline to the target stages and everything upstream of them"""
+    producers = {out: s.name for s in stages for out in s.outputs}
+    by_name = {s.name: s for s in stages}
+
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise KeyError(f"Unknown stage(s): {unknown}. Available: {list(by_name)}")
+
+    keep, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(upstream(by_name[name], producers))
+    return [s for s in stages if s.name in keep]
+
+
+# === FINGERPRINTS ========================================================== #
+
+def file_digest(path, chunk_size=1 << 20):
+    """Content hash of a file, or of every file of a partitioned table directory"""
+    path, h = Path(path), hashlib.sha256()
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        if file != path:
+            h.update(file.name.encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def input_path(inp, root=DATA_PROCESSED):
+    return inp if isinstance(inp, Path) else table_file(inp, root)
+
+
+def output_exists(out, root=DATA_PROCESSED):
+    return out.exists() if isinstance(out, Path) else table_file(out, root) is not None
+
+
+def imported_modules(path, name):
+    """Package modules imported anywhere in a source file (lazy imports included)"""
+    package = name.partition(".")[0]
+    tree = ast.parse(Path(path).read_bytes())
+    parent = name if Path(path).name == "__init__.py" else name.rpartition(".")[0]
+
+    found = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = importlib.util.resolve_name("." * node.level + (node.module or ""), parent) \
+                if node.level else node.module
+            found.add(base)
+            # from . import store: the names may be modules themselves
+            found.update(f"{base}.{a.name}" for a in node.names)
+    return {m for m in found if m == package or m.startswith(package + ".")}
+
+
+def code_files(module):
+    """Source files of a stage module and every package module it imports, transitively"""
+    files, todo, seen = {}, [module.__name__], set()
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            spec = module.__spec__ if name == module.__name__ else importlib.util.find_spec(name)
+        except ModuleNotFoundError:
+            spec = None
+        if spec is None or not spec.origin or not spec.origin.endswith(".py"):
+            continue    # an imported name that is not a module
+        files[name] = spec.origin
+        todo.extend(imported_modules(spec.origin, name))
+    return files
+
+
+def fingerprint(stage, module, root=DATA_PROCESSED):
+    """Hash of input contents, parameter values and the source code the stage runs"""
+    inputs = {}
+    for inp in stage.resolve_inputs(module):
+        path = input_path(inp, root)
+        if path is None or not path.exists():
+            raise FileNotFoundError(f"Stage '{stage.name}' is missing input: {inp}")
+        inputs[str(inp)] = file_digest(path)
+
+    payload = {
+        "inputs": inputs,
+        "params": {p: getattr(module, p) for p in stage.params},
+        "code": {name: file_digest(path) for name, path in code_files(module).items()},
+    }
+    blob = json.dumps(payload, sort_keys=True, default=repr)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
+
+
+def save_state(state, path=STATE_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, indent=2, sort_keys=True))
+
+
+# === RUN =================================================================== #
+
+def run_pipeline(stages=None, targets=None, force=False, dry_run=False, root=DATA_PROCESSED):
+    """
+    Run out-of-date stages in dependency order and return the names of the
+    stages that ran (or would run, with dry_run=True). root is the store
+    the table inputs and outputs are looked up in, and holds the run state.
+    """
+    stages = topological_order(stages or STAGES)
+    if targets:
+        stages = select(stages, targets)
+
+    producers = {out: s.name for s in stages for out in s.outputs}
+    state_file = Path(root) / STATE_FILE.name
+    state = load_state(state_file)
+    ran = []
+
+    for stage in stages:
+        module = stage.load()
+
+        # In a dry run an upstream rerun can't change any file yet,
+        # so treat its consumers as stale
+        stale_upstream = dry_run and any(dep in ran for dep in upstream(stage, producers))
+        try:
+            fp = fingerprint(stage, module, root)
+        except FileNotFoundError:
+            if not stale_upstream:
+                raise
+            fp = None
+
+        outputs_ok = all(output_exists(out, root) for out in stage.outputs)
+        if not force and not stale_upstream and outputs_ok and state.get(stage.name) == fp:
+            print(f"⏭️  {stage.name}: up to date")
+            continue
+
+        ran.append(stage.name)
+        if dry_run:
+            print(f"▶️  {stage.name}: would run")
+            continue
+
+        print(f"\n▶️  {stage.name}: running {stage.module}.{stage.func}()")
+        stage.run(module)
+        state[stage.name] = fp
+        save_state(state, state_file)
+
+    return ran
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the event-study pipeline incrementally.")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for per-ticker stages")
+    args = parser.parse_args()
+
+    # Stages read it through sharded.parse_jobs; results don't depend on it,
+    # so it takes no part in the fingerprints
+    if args.jobs is not None:
+        os.environ[JOBS_ENV] = str(args.jobs)
+
+    ran = run_pipeline(targets=args.targets, force=args.force, dry_run=args.dry_run)
+    print(f"\n✅ Pipeline done ({len(ran)} stage(s) {'to run' if args.dry_run else 'ran'})")
+
+
+if __name__ == "__main__":
+    main()
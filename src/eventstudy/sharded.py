@@ -0,0 +1,271 @@
+"""
+Sharded execution of per-ticker work on a process pool.
+
+Returns, full-sample alpha/beta, event alignment and event CARs only
+look at one ticker's rows (plus the market return of each row), so a
+long price frame sorted by (ticker, date) splits into contiguous ticker
+shards that can be processed independently:
+
+- the numeric columns (dates, ticker codes, returns, market returns, ...)
+  are copied once into shared memory; workers attach to them in the pool
+  initializer and slice their shard's rows, so no DataFrame is pickled
+  per task
+- each task gets a contiguous ticker range (balanced by row count) and,
+  for event work, only the events of those tickers
+- panel-shaped work (full-sample alpha/beta) takes contiguous column
+  ranges of a saved PricePanel instead: every worker memory-maps the same
+  .npy file compute_returns wrote, so nothing is copied at all
+- results come back in shard order and event rows are put back in their
+  original order, so the merged output does not depend on the number of
+  jobs or on which worker finished first
+
+Stages with universe-sized per-ticker work take --jobs N (default:
+$EVENTSTUDY_JOBS, else 1); with one job they run their plain in-process
+path. They are build_prices (file reads), compute_returns, market_context
+(ticker context), merge_event_returns, compute_ar_car, car_into_label and
+monte_carlo (resamples rather than ticker shards).
+
+The other stages run serially and say so (warn_serial) when they are
+asked for more than one job:
+
+- event_context, car_surface, title_matching, build_ml_dataset: event-
+  level work (one row per event or game) in a few vectorized passes
+- significance, car_regression: statistics across the events of all
+  tickers, which do not split into independent ticker shards
+- clean_vgsales: streams one file in chunks, bound by reading it
+- out_of_core: holds one partition at a time on purpose; partitions in
+  parallel would multiply the peak memory it exists to bound
+- daily_update: only touches the new bars and a short tail
+"""
+
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+JOBS_ENV = "EVENTSTUDY_JOBS"
+# Shards per job: smaller shards even out tickers with long histories
+SHARDS_PER_JOB = 4
+
+
+# === JOBS OPTION =========================================================== #
+
+def default_jobs(default=1):
+    return int(os.environ.get(JOBS_ENV, default))
+
+
+def parse_jobs(argv=None, default=None):
+    """
+    --jobs N from the command line, ignoring every other argument (stages
+    also run inside the pipeline runner, whose arguments they don't know).
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--jobs", type=int, default=default_jobs(1 if default is None else default))
+    args, _ = parser.parse_known_args(argv)
+    return max(1, args.jobs)
+
+
+def warn_serial(stage, jobs=None):
+    """
+    Called by the stages that run serially: more than one job (--jobs N,
+    else $EVENTSTUDY_JOBS) gets a warning instead of being dropped silently.
+    """
+    jobs = parse_jobs() if jobs is None else jobs
+    if jobs > 1:
+        print(f"[WARN] {stage} runs serially, ignoring --jobs {jobs}")
+
+
+# === SHARED FRAME ========================================================== #
+
+class SharedFrame:
+    """
+    Date, ticker code and numeric columns of a (ticker, date)-sorted long
+    frame in shared memory. spec() is the small picklable handle workers
+    attach to.
+    """
+
+    def __init__(self, prices, columns):
+        codes, tickers = pd.factorize(prices["ticker"].astype(str), sort=True)
+        if len(codes) and ((np.diff(codes) < 0).any() or (codes < 0).any()):
+            raise ValueError("SharedFrame needs rows sorted by ticker and no missing tickers")
+
+        self.tickers = list(tickers)
+        self.bounds = np.searchsorted(codes, np.arange(len(self.tickers) + 1))
+        self.columns = list(columns)
+
+        arrays = {
+            "date": prices["date"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+            "code": codes.astype(np.int64),
+        }
+        for col in self.columns:
+            arrays[col] = prices[col].to_numpy(dtype=float, na_value=np.nan)
+
+        self.blocks = {}
+        for name, values in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+            self.blocks[name] = (block, values.shape, values.dtype.str)
+
+    def spec(self):
+        return {
+            "tickers": self.tickers,
+            "bounds": self.bounds,
+            "arrays": {name: (block.name, shape, dtype) for name, (block, shape, dtype) in self.blocks.items()},
+        }
+
+    def close(self):
+        for block, _, _ in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_block(name):
+    """
+    Attach to an existing block. Pool workers share the parent's resource
+    tracker, so only the creating process (SharedFrame.close) unlinks it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:    # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(spec):
+    """Arrays of a SharedFrame spec (the blocks are returned to keep them open)"""
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in spec["arrays"].items():
+        block = open_block(block_name)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        blocks.append(block)
+    return arrays, blocks
+
+
+def shard_frame(spec, arrays, first, last):
+    """Long frame of the rows of tickers [first, last)"""
+    lo, hi = spec["bounds"][first], spec["bounds"][last]
+    frame = pd.DataFrame({
+        "date": arrays["date"][lo:hi].view("datetime64[ns]"),
+        "ticker": np.asarray(spec["tickers"], dtype=object)[arrays["code"][lo:hi]],
+    })
+    for col in spec["arrays"]:
+        if col not in ("date", "code"):
+            frame[col] = arrays[col][lo:hi].copy()
+    return frame
+
+
+def ticker_shards(bounds, n_shards):
+    """Contiguous ticker ranges [first, last) with about equal row counts"""
+    n_tickers = len(bounds) - 1
+    n_shards = max(1, min(n_shards, n_tickers))
+    targets = np.linspace(0, bounds[-1], n_shards + 1)[1:-1]
+    cuts = np.searchsorted(bounds, targets, side="right")
+    edges = np.unique(np.concatenate([[0], np.clip(cuts, 1, n_tickers - 1), [n_tickers]]))
+    return list(pairwise(edges))
+
+
+# === POOL ================================================================== #
+
+# Worker state, set once per process by the pool initializer
+_WORKER = {}
+
+
+def _init_worker(spec):
+    arrays, blocks = attach(spec)
+    _WORKER.update(spec=spec, arrays=arrays, blocks=blocks)
+
+
+def _run_shard(task):
+    func, (first, last), args = task
+    frame = shard_frame(_WORKER["spec"], _WORKER["arrays"], first, last)
+    return func(frame, *args)
+
+
+def map_shards(func, prices, columns, jobs, shard_args=None):
+    """
+    func(shard_frame, *shard_args(i, tickers)) for every ticker shard i of
+    a (ticker, date)-sorted frame, on `jobs` processes. func must be a
+    module-level function. Returns the results in shard order.
+    """
+    with SharedFrame(prices, columns) as shared:
+        spec = shared.spec()
+        shards = ticker_shards(shared.bounds, jobs * SHARDS_PER_JOB)
+        tasks = [
+            (func, shard, shard_args(i, shared.tickers[shard[0]:shard[1]]) if shard_args else ())
+            for i, shard in enumerate(shards)
+        ]
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(spec,)) as pool:
+            return list(pool.map(_run_shard, tasks))
+
+
+def _init_panel_worker(panel_cls, path):
+    _WORKER.update(panel=panel_cls.load(path))
+
+
+def _run_panel_shard(task):
+    func, (first, last), args = task
+    return func(_WORKER["panel"], first, last, *args)
+
+
+def map_panel_shards(func, panel, jobs, args=()):
+    """
+    func(panel, first, last, *args) for contiguous column ranges [first,
+    last) of a PricePanel (balanced by bar count), on `jobs` processes.
+    Workers memory-map the file the panel was loaded from; a panel built in
+    memory is saved to a temporary directory first. Returns the results in
+    shard order.
+    """
+    counts = (~np.isnan(panel.values)).sum(axis=0)
+    shards = ticker_shards(np.concatenate([[0], np.cumsum(counts)]), jobs * SHARDS_PER_JOB)
+    tasks = [(func, shard, args) for shard in shards]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = panel.path
+        if path is None:
+            path = Path(tmp) / "panel"
+            panel.save(path)
+        initargs = (type(panel), str(path))
+        with ProcessPoolExecutor(jobs, initializer=_init_panel_worker, initargs=initargs) as pool:
+            return list(pool.map(_run_panel_shard, tasks))
+
+
+def events_by_shard(events, prices, args=()):
+    """
+    shard_args for map_shards: the events of each shard's tickers. Events
+    of tickers without prices go to the first shard, where they are
+    unknown tickers exactly as in a full run.
+    """
+    tickers = events["ticker"].astype(str).to_numpy()
+    unknown = ~np.isin(tickers, prices["ticker"].astype(str).unique())
+
+    def shard_args(i, shard_tickers):
+        mask = np.isin(tickers, shard_tickers) | (unknown if i == 0 else False)
+        return (events[mask], *args)
+
+    return shard_args
+
+
+def map_event_shards(func, events, prices, columns, jobs, args=()):
+    """
+    func(shard_frame, shard_events, *args) -> events frame, for the events
+    of every ticker shard. Returns the results in the original event
+    order and index.
+    """
+    index = events.index
+    events = events.reset_index(drop=True)
+    parts = map_shards(func, prices, columns, jobs, events_by_shard(events, prices, args))
+    out = pd.concat([p for p in parts if len(p)] or parts[:1]).sort_index()
+    out.index = index
+    return out
@@ -0,0 +1,1435 @@
+import subprocess
+import sys
+import time
+from itertools import pairwise
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = BASE_DIR / "src"
+DATA_DIR = BASE_DIR / "data"
+sys.path.insert(0, str(SRC_DIR))
+
+# Importing every module must stay well under this (seconds, incl. pandas)
+IMPORT_BUDGET = 5.0
+
+
+def run_python(code):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    return result, time.perf_counter() - start
+
+
+def data_snapshot():
+    return {p: p.stat().st_mtime_ns for p in DATA_DIR.rglob("*") if p.is_file()}
+
+
+# === ABNORMAL RETURNS ====================================================== #
+
+def test_vectorized_ar_matches_rowwise_apply():
+    from eventstudy.features.compute_ar_car import compute_prices_ar
+
+    rng = np.random.default_rng(2)
+    prices = pd.DataFrame({
+        "date": np.tile(pd.bdate_range("2024-01-01", periods=50), 3),
+        "ticker": np.repeat(["EA", "TTWO", "NODATA"], 50),
+        "return": rng.normal(0, 0.02, 150),
+        "market_return": rng.normal(0, 0.01, 150),
+    })
+    prices.loc[[3, 60], "market_return"] = np.nan
+    prices.loc[70, "return"] = np.nan
+    ab_table = {
+        "EA": {"alpha": 0.001, "beta": 1.2},
+        "TTWO": {"alpha": -0.002, "beta": 0.8},
+        "NODATA": {"alpha": None, "beta": None},
+    }
+
+    # The row-wise version compute_prices_ar replaced
+    expected = prices.apply(
+        lambda r: ab_table[r["ticker"]]["alpha"] + ab_table[r["ticker"]]["beta"] * r["market_return"]
+        if pd.notnull(r["market_return"]) and ab_table[r["ticker"]]["alpha"] is not None else None,
+        axis=1
+    ).astype(float)
+
+    out = compute_prices_ar(prices.copy(), ab_table)
+
+    np.testing.assert_allclose(out["expected_return"], expected, rtol=1e-15, equal_nan=True)
+    np.testing.assert_allclose(out["AR"], prices["return"] - expected, rtol=1e-15, equal_nan=True)
+    assert out.loc[out["ticker"] == "NODATA", "AR"].isna().all()
+
+
+# === CAR INDEX ============================================================= #
+
+def test_car_index_windows_match_direct_sums():
+    from eventstudy.features.car_index import CarIndex
+
+    rng = np.random.default_rng(3)
+    days = pd.bdate_range("2024-01-01", periods=40)
+    prices = pd.concat([
+        pd.DataFrame({"ticker": t, "date": days[:n], "AR": rng.normal(0, 0.02, n)})
+        for t, n in (("EA", 40), ("TTWO", 25), ("UBSFY", 1))
+    ], ignore_index=True)
+    prices.loc[[5, 45], "AR"] = np.nan
+    prices = prices.sample(frac=1, random_state=0)    # index must not rely on row order
+
+    index = CarIndex.from_prices(prices)
+    for start, end in ((-1, 1), (-5, 5), (0, 10), (-30, -10), (3, 2)):
+        for ticker, group in prices.sort_values("date").groupby("ticker"):
+            ar = group["AR"].to_numpy()
+            got = index.car(np.full(len(group), ticker), group["date"], start, end)
+            expected = [np.nansum(ar[max(i + start, 0):max(i + end + 1, 0)]) for i in range(len(ar))]
+            np.testing.assert_allclose(got, expected, atol=1e-15)
+
+    # Unknown tickers and dates before the history have no CAR
+    got = index.car(["NOPE", "EA"], pd.to_datetime(["2024-01-05", "2023-01-01"]), -1, 1)
+    assert np.isnan(got).all()
+
+
+# === TRADING CALENDAR ====================================================== #
+
+def test_calendar_windows_step_in_trading_days():
+    from eventstudy.features.trading_calendar import TradingCalendar
+
+    rng = np.random.default_rng(4)
+    days = pd.bdate_range("2024-01-01", periods=80)
+    own = {t: np.sort(rng.choice(days, 50, replace=False)) for t in ("EA", "TTWO")}
+    prices = pd.concat([pd.DataFrame({"ticker": t, "date": d}) for t, d in own.items()], ignore_index=True)
+    calendar = TradingCalendar.from_prices(prices.iloc[::-1])
+
+    for ticker, dates in own.items():
+        positions = calendar.locate(np.full(len(dates), ticker), dates)
+        assert calendar.local_positions(positions).tolist() == list(range(len(dates)))
+
+        # Offsets count the ticker's own trading days, clipped to its history
+        for start, end in ((-5, 5), (-250, -30), (1, 3)):
+            lo, hi = calendar.window(positions, start, end)
+            for i, (a, b) in enumerate(zip(lo, hi)):
+                expected = dates[max(i + start, 0):max(i + end + 1, 0)]
+                assert np.array_equal(calendar.dates[a:b], expected)
+                assert (calendar.codes[a:b] == calendar.ticker_codes[ticker]).all()
+
+    lo, hi = calendar.window([-1], -5, 5)
+    assert lo.tolist() == hi.tolist() == [0]
+
+
+# === MARKET MODEL ========================================================== #
+
+def test_market_model_estimate_matches_per_event_lstsq():
+    from eventstudy.features.market_model import MarketModel
+
+    rng = np.random.default_rng(5)
+    n_days = 120
+    market = rng.normal(0, 0.01, n_days)
+    prices = pd.concat([
+        pd.DataFrame({
+            "ticker": t, "date": pd.bdate_range("2024-01-01", periods=n_days),
+            "market_return": market, "return": 0.001 + b * market + rng.normal(0, 0.01, n_days),
+        })
+        for t, b in (("EA", 0.9), ("TTWO", 1.4))
+    ], ignore_index=True)
+    prices.loc[rng.choice(len(prices), 20, replace=False), "return"] = np.nan
+    prices.loc[rng.choice(len(prices), 10, replace=False), "market_return"] = np.nan
+
+    model = MarketModel.from_prices(prices)
+    window, min_obs = (-60, -5), 20
+    positions = np.arange(len(model.calendar))
+    params = model.estimate(positions, window, min_obs)
+
+    for p in positions:
+        ticker = model.calendar.tickers[model.calendar.codes[p]]
+        group = prices[prices["ticker"] == ticker].sort_values("date")
+        i = model.calendar.local_positions([p])[0]
+        est = group.iloc[max(i + window[0], 0):max(i + window[1] + 1, 0)].dropna()
+        assert params["n_est"][p] == len(est)
+        if len(est) < min_obs:
+            assert params.loc[p, ["alpha", "beta", "sigma2"]].isna().all()
+            continue
+
+        X = np.column_stack([np.ones(len(est)), est["market_return"]])
+        coef, ssr, *_ = np.linalg.lstsq(X, est["return"], rcond=None)
+        np.testing.assert_allclose(params.loc[p, ["alpha", "beta"]], coef, rtol=1e-8, atol=1e-12)
+        np.testing.assert_allclose(params["sigma2"][p], ssr[0] / (len(est) - 2), rtol=1e-8)
+
+
+# === STORE ================================================================= #
+
+def test_store_roundtrip_keeps_types_and_reads_legacy_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.store import read_table, write_table
+
+    prices = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-02"]),
+        "ticker": ["ea", "EA", "ttwo"],
+        "adj_close": [101.25, 102.5, 50.125],
+        "volume": [1_000, 2_000, 3_000],
+    })
+
+    for fmt in ("parquet", "arrow"):
+        write_table(prices, "prices_long", tmp_path, fmt=fmt)
+        back = read_table("prices_long", tmp_path)
+        assert pd.api.types.is_datetime64_any_dtype(back["date"])
+        assert isinstance(back["ticker"].dtype, pd.CategoricalDtype)
+        assert back["ticker"].tolist() == ["EA", "EA", "TTWO"]
+        cols = ["date", "adj_close", "volume"]
+        pd.testing.assert_frame_equal(back[cols], prices[cols])
+        (tmp_path / f"prices_long.{fmt}").unlink()
+
+    # Legacy CSVs: comma-separated prices, semicolon-separated event tables
+    prices.to_csv(tmp_path / "prices_long.csv", index=False)
+    events = pd.DataFrame({"event_id": ["e1"], "ticker": ["ttwo"], "event_date": ["2024-01-02 16:30"]})
+    events.to_csv(tmp_path / "events_with_returns.csv", sep=";", index=False)
+
+    back = read_table("prices_long", tmp_path, filters=[("ticker", "==", "EA")])
+    assert pd.api.types.is_datetime64_any_dtype(back["date"]) and len(back) == 2
+    back = read_table("events_with_returns", tmp_path)
+    assert back["ticker"].tolist() == ["TTWO"]
+    assert back["event_date"].tolist() == [pd.Timestamp("2024-01-02 16:30")]
+
+    with pytest.raises(FileNotFoundError):
+        read_table("missing", tmp_path)
+
+
+# === PIPELINE ============================================================== #
+
+PIPELINE_STAGES = """
+import pandas as pd
+from eventstudy.data.store import read_table, write_table
+
+ROOT = RAW = None
+calls = []
+
+def prices():
+    calls.append("prices")
+    write_table(pd.read_csv(RAW / "prices.csv"), "prices_with_returns", ROOT)
+
+def context():
+    calls.append("context")
+    prices = read_table("prices_with_returns", ROOT)
+    write_table(prices.groupby("date", as_index=False)["ret"].mean(), "market_context", ROOT)
+    (ROOT / "context.json").write_text("{}")
+
+def merge():
+    calls.append("merge")
+    events = pd.read_csv(RAW / "events.csv", sep=";", parse_dates=["date"])
+    merged = events.merge(read_table("prices_with_returns", ROOT), on=["ticker", "date"])
+    write_table(merged, "events_with_returns", ROOT)
+
+def car():
+    calls.append("car")
+    events = read_table("events_with_returns", ROOT)
+    write_table(events.assign(CAR=events["ret"].cumsum()), "events_with_car", ROOT)
+"""
+
+
+def test_pipeline_reruns_only_stale_stages(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import importlib.util
+
+    from eventstudy import pipeline
+    from eventstudy.pipeline import Stage, run_pipeline
+
+    raw, root = tmp_path / "raw", tmp_path / "processed"
+    raw.mkdir()
+    (raw / "stages.py").write_text(PIPELINE_STAGES)
+    spec = importlib.util.spec_from_file_location("eventstudy._stages", raw / "stages.py")
+    stages_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stages_module)
+    monkeypatch.setitem(sys.modules, "eventstudy._stages", stages_module)
+    stages_module.ROOT, stages_module.RAW = root, raw
+
+    pd.DataFrame({"ticker": ["EA", "EA", "TTWO"], "date": ["2024-01-02", "2024-01-03", "2024-01-02"],
+                  "ret": [0.01, -0.02, 0.03]}).to_csv(raw / "prices.csv", index=False)
+    (raw / "events.csv").write_text("ticker;date\nEA;2024-01-03\n")
+
+    stages = [
+        Stage("prices", "_stages", "prices", inputs=[raw / "prices.csv"], outputs=["prices_with_returns"]),
+        Stage("context", "_stages", "context", inputs=["prices_with_returns"],
+              outputs=["market_context", root / "context.json"]),
+        Stage("merge", "_stages", "merge", inputs=[raw / "events.csv", "prices_with_returns"],
+              outputs=["events_with_returns"]),
+        Stage("car", "_stages", "car", inputs=["events_with_returns"], outputs=["events_with_car"]),
+    ]
+
+    def run(dry_run=False):
+        stages_module.calls.clear()
+        ran = run_pipeline(stages, root=root, dry_run=dry_run)
+        assert stages_module.calls == ([] if dry_run else ran)
+        return ran
+
+    assert run() == ["prices", "context", "merge", "car"]
+    assert (root / pipeline.STATE_FILE.name).exists()
+    assert run() == []
+
+    # A new event reruns the event stages only
+    (raw / "events.csv").write_text("ticker;date\nEA;2024-01-03\nTTWO;2024-01-02\n")
+    assert run(dry_run=True) == ["merge", "car"]
+    assert run() == ["merge", "car"]
+    assert len(pd.read_parquet(root / "events_with_car.parquet")) == 2
+
+    # A deleted output reruns its stage, even though no input changed
+    (root / "events_with_car.parquet").unlink()
+    assert run() == ["car"]
+    (root / "context.json").unlink()
+    assert run() == ["context"]
+
+    # So does a change to a package module a stage imports (here: the store)
+    digest = pipeline.file_digest
+    store_file = str(SRC_DIR / "eventstudy" / "data" / "store.py")
+    monkeypatch.setattr(pipeline, "file_digest", lambda p: "edited" if str(p) == store_file else digest(p))
+    assert run() == ["prices", "context", "merge", "car"]
+
+
+# === STARTUP =============================================================== #
+
+IMPORT_ALL = """
+import importlib, pkgutil, sys
+import eventstudy, eventstudy.data, eventstudy.features
+
+for pkg in (eventstudy, eventstudy.data, eventstudy.features):
+    for mod in pkgutil.iter_modules(pkg.__path__, pkg.__name__ + "."):
+        if not mod.ispkg:
+            importlib.import_module(mod.name)
+
+heavy = [m for m in ("statsmodels", "yfinance", "kagglehub") if m in sys.modules]
+if heavy:
+    raise SystemExit(f"heavy modules imported eagerly: {heavy}")
+"""
+
+
+def test_imports_are_side_effect_free():
+    before = data_snapshot()
+
+    result, elapsed = run_python(IMPORT_ALL)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "", "modules print on import"
+    assert data_snapshot() == before, "modules touch data/ on import"
+    assert elapsed < IMPORT_BUDGET
+
+
+# === FETCHER =============================================================== #
+
+def write_mirror(root, ticker, dates, start_price=10.0):
+    frame = pd.DataFrame({"date": pd.to_datetime(dates), "adj_close": start_price})
+    frame["adj_close"] += range(len(frame))
+    frame.to_csv(root / f"{ticker}.csv", index=False)
+
+
+def test_fetcher_appends_only_new_bars(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.fetcher import LocalSource, load_bars, update_all
+
+    mirror, bars = tmp_path / "mirror", tmp_path / "bars"
+    mirror.mkdir()
+    write_mirror(mirror, "TTWO", ["2024-01-02", "2024-01-03", "2024-01-04"])
+    write_mirror(mirror, "^GSPC", ["2024-01-02", "2024-01-03"])
+
+    requested = []
+
+    class RecordingSource(LocalSource):
+        def fetch(self, ticker, start, end=None):
+            requested.append((ticker, start))
+            return super().fetch(ticker, start, end)
+
+    source = RecordingSource(mirror)
+    first = update_all(source, ["TTWO", "^GSPC"], start="2024-01-01", root=bars)
+    assert first == {"TTWO": 3, "^GSPC": 2}
+
+    write_mirror(mirror, "TTWO", ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"])
+    requested.clear()
+    second = update_all(source, ["TTWO", "^GSPC"], start="2024-01-01", root=bars)
+
+    assert second == {"TTWO": 1, "^GSPC": 0}
+    assert sorted(requested) == [("TTWO", "2024-01-05"), ("^GSPC", "2024-01-04")]
+    assert len(load_bars("TTWO", bars)) == 4
+
+
+def test_fetcher_retries_then_reports_failure(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.fetcher import LocalSource, update_all
+
+    write_mirror(tmp_path, "EA", ["2024-01-02"])
+    calls = {"EA": 0}
+
+    class FlakySource(LocalSource):
+        def fetch(self, ticker, start, end=None):
+            calls[ticker] = calls.get(ticker, 0) + 1
+            if ticker == "EA" and calls[ticker] < 3:
+                raise ConnectionError("temporary")
+            return super().fetch(ticker, start, end)
+
+    results = update_all(
+        FlakySource(tmp_path), ["EA", "MISSING"], root=tmp_path / "bars",
+        start="2024-01-01", retries=2, backoff=0,
+    )
+
+    assert results["EA"] == 1 and calls["EA"] == 3
+    assert isinstance(results["MISSING"], FileNotFoundError)
+    assert calls["MISSING"] == 3
+
+
+# === PRICE UNIVERSE ======================================================== #
+
+def test_build_panels_from_mixed_price_files(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.build_prices import build_panels, discover, read_all
+
+    (tmp_path / "TTWO_2010_2025.csv").write_text(
+        "Price,Adj Close\nTicker,TTWO\nDate,\n2024-01-03,11.0\n2024-01-02,10.0\n"
+    )
+    (tmp_path / "basket.csv").write_text(
+        "Date,EA,ntdoy,^GSPC\n"
+        "2024-01-02,,5.0,4700.0\n"
+        "2024-01-03,,5.5,4710.0\n"
+    )
+    sources = [{"pattern": "TTWO_*.csv"}, {"pattern": "basket.csv", "exclude": ["^GSPC"]}]
+
+    prices_long, prices_wide = build_panels(read_all(discover(sources, tmp_path)))
+
+    # Empty EA column dropped, excluded ticker filtered, tickers upper-cased
+    assert prices_long["ticker"].unique().tolist() == ["NTDOY", "TTWO"]
+    assert prices_long["adj_close"].tolist() == [5.0, 5.5, 10.0, 11.0]
+    assert prices_wide.columns.tolist() == ["date", "NTDOY", "TTWO"]
+    assert prices_wide["TTWO"].tolist() == [10.0, 11.0]
+
+
+# === PRICE PANEL =========================================================== #
+
+def test_price_panel_matrix_ops_and_mmap_roundtrip(tmp_path):
+    from eventstudy.features.price_panel import PricePanel
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2024-01-01", periods=60)
+    market = 100 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+    stock = 50 * np.cumprod(1 + rng.normal(0, 0.02, len(dates)))
+    prices = pd.DataFrame({
+        "date": np.tile(dates, 2),
+        "ticker": ["SP500"] * len(dates) + ["TTWO"] * len(dates),
+        "adj_close": np.concatenate([market, stock]),
+    })
+    prices = prices.drop(index=len(dates) + 10)  # TTWO misses one day
+
+    panel = PricePanel.from_long(prices)
+    returns = panel.returns()
+
+    # The bar after the gap is measured against the last valid price
+    ttwo = panel.column("TTWO")
+    assert np.isnan(ttwo[10]) and np.isclose(returns[11, 1], ttwo[11] / ttwo[9] - 1)
+
+    m = panel.market_returns(returns, "SP500")
+    alpha, beta = PricePanel.fit_market_model(returns, m)
+    ok = ~np.isnan(returns[:, 1]) & ~np.isnan(m[:, 0])
+    X = np.column_stack([np.ones(ok.sum()), m[ok, 0]])
+    expected = np.linalg.lstsq(X, returns[ok, 1], rcond=None)[0]
+    assert np.allclose([alpha[1], beta[1]], expected)
+    assert np.isclose(beta[0], 1.0)
+
+    # Whole-matrix AR and running CAR (the gap day adds nothing)
+    ar = PricePanel.abnormal_returns(returns, PricePanel.expected_returns(m, alpha, beta))
+    car = PricePanel.car(ar)
+    assert np.isclose(ar[20, 1], returns[20, 1] - alpha[1] - beta[1] * m[20, 0])
+    assert np.isclose(car[15, 1] - car[5, 1], np.nansum(ar[6:16, 1]))
+    assert car[10, 1] == car[9, 1]
+
+    panel.save(tmp_path / "panel")
+    loaded = PricePanel.load(tmp_path / "panel")
+    assert isinstance(loaded.values, np.memmap)
+    assert loaded.path == tmp_path / "panel" and panel.path is None
+    assert loaded.tickers == panel.tickers
+    assert np.array_equal(loaded.dates, panel.dates)
+    assert np.allclose(loaded.values, panel.values, equal_nan=True)
+
+
+# === EVENT ALIGNMENT ======================================================= #
+
+def test_calendar_locate_directions_match_merge_asof():
+    from eventstudy.features.trading_calendar import TradingCalendar
+
+    rng = np.random.default_rng(1)
+    days = pd.bdate_range("2023-01-02", periods=300)
+    prices = pd.concat([
+        pd.DataFrame({"ticker": t, "date": np.sort(rng.choice(days, 200, replace=False))})
+        for t in ("EA", "TTWO", "UBSFY")
+    ], ignore_index=True)
+    calendar = TradingCalendar.from_prices(prices)
+
+    events = pd.DataFrame({
+        "ticker": rng.choice(["EA", "TTWO", "UBSFY", "NOPE"], 500),
+        "event_date": pd.to_datetime("2022-12-01") + pd.to_timedelta(rng.integers(0, 480, 500), "D"),
+    })
+
+    for direction in ("backward", "forward", "nearest"):
+        positions = calendar.locate(events["ticker"], events["event_date"], direction=direction)
+
+        expected = pd.merge_asof(
+            events.reset_index().sort_values("event_date"),
+            prices.assign(trading_date=prices["date"]).sort_values("date"),
+            left_on="event_date", right_on="date", by="ticker", direction=direction,
+        ).set_index("index").sort_index()["trading_date"]
+
+        got = pd.Series(calendar.dates[np.maximum(positions, 0)], index=events.index)
+        got[positions < 0] = pd.NaT
+        pd.testing.assert_series_equal(got, expected, check_names=False)
+
+
+def test_after_close_events_move_to_next_trading_day():
+    from eventstudy.features.merge_event_returns import align_events
+    from eventstudy.features.trading_calendar import TradingCalendar
+
+    days = pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-05"])
+    calendar = TradingCalendar.from_prices(pd.DataFrame({"ticker": "TTWO", "date": days}))
+    events = pd.DataFrame({
+        "event_id": ["intraday", "after_close", "holiday", "last_close", "unknown", "undated"],
+        "ticker": ["TTWO", "TTWO", "TTWO", "TTWO", "NOPE", "TTWO"],
+        "event_date": pd.to_datetime([
+            "2024-01-02 10:00", "2024-01-03 16:30", "2024-01-04",
+            "2024-01-05 17:00", "2024-01-03", None,
+        ], format="ISO8601"),
+    })
+
+    positions, unmatched = align_events(events, calendar)
+
+    assert positions.tolist() == [0, 2, 1, -1, -1, -1]
+    assert unmatched["reason"].tolist() == [
+        "outside_price_history", "unknown_ticker", "missing_date",
+    ]
+
+
+def test_calendar_rejects_frames_it_was_not_built_from():
+    from eventstudy.features.merge_event_returns import attach_trading_days
+    from eventstudy.features.trading_calendar import TradingCalendar
+
+    days = pd.bdate_range("2024-01-01", periods=4)
+    prices = pd.DataFrame({
+        "ticker": ["EA"] * 4 + ["TTWO"] * 4, "date": list(days) * 2,
+        "adj_close": np.arange(8.0), "return": np.arange(8.0), "market_return": 0.0,
+    })
+    calendar = TradingCalendar.from_prices(prices)
+    assert calendar.column(prices, "adj_close").tolist() == list(range(8))
+
+    shuffled = prices.iloc[::-1].reset_index(drop=True)
+    for frame in (shuffled, prices.iloc[:6]):
+        with pytest.raises(ValueError):
+            calendar.column(frame, "adj_close")
+        with pytest.raises(ValueError):
+            calendar.frame_rows(frame, np.array([0]))
+
+    events = pd.DataFrame({"event_id": ["e"], "ticker": ["TTWO"], "date": [days[2]]})
+    with pytest.raises(ValueError):
+        attach_trading_days(events, shuffled, calendar)
+    merged, _ = attach_trading_days(events, shuffled, TradingCalendar.from_prices(shuffled))
+    assert merged["adj_close"].tolist() == [6.0]
+
+
+# === SIGNIFICANCE TESTS ==================================================== #
+
+def test_significance_matches_reference_formulas():
+    stats = pytest.importorskip("scipy.stats")
+    from eventstudy.features.significance import car_tests, group_matrix, sign_test
+
+    rng = np.random.default_rng(2)
+    n_events = 40
+    events = pd.DataFrame({
+        "publisher": rng.choice(["EA", "Take-Two"], n_events),
+        "sentiment": rng.choice(["positive", "negative", None], n_events),
+    })
+    car = rng.normal(0.01, 0.03, (n_events, 2))
+    car[3, 0] = np.nan
+    sigma2 = rng.uniform(1e-4, 4e-4, n_events)
+    n_est = rng.integers(150, 221, n_events).astype(float)
+    lengths = np.array([3.0, 11.0])
+
+    G, labels = group_matrix(events, ["publisher", "sentiment"])
+    assert labels[0] == ("all", "all") and len(labels) == 1 + 2 + 2
+    results = car_tests(car, sigma2, n_est, lengths, G)
+
+    for g, (col, value) in enumerate(labels):
+        member = np.ones(n_events, bool) if col == "all" else (events[col] == value).to_numpy()
+        for w in range(2):
+            x = car[member, w]
+            x = x[~np.isnan(x)]
+            expected = stats.ttest_1samp(x, 0.0)
+            assert np.isclose(results["t_cs"][0][g, w], expected.statistic)
+            assert np.isclose(results["t_cs"][1][g, w], expected.pvalue)
+
+            keep = member & ~np.isnan(car[:, w])
+            scar = car[keep, w] / np.sqrt(sigma2[keep] * lengths[w])
+            t = n_est[keep]
+            patell = scar.sum() / np.sqrt(((t - 2) / (t - 4)).sum())
+            assert np.isclose(results["patell"][0][g, w], patell)
+            assert np.isclose(results["bmp"][0][g, w], stats.ttest_1samp(scar, 0.0).statistic)
+
+    # Sign test: 3 of 4 positive CARs against a 50% base rate
+    z, _ = sign_test(
+        np.array([[0.1], [0.2], [0.3], [-0.1]]),
+        np.array([[1.0, -1.0]] * 4),
+        np.ones((1, 4)),
+    )
+    assert np.isclose(z[0, 0], (3 - 2) / np.sqrt(4 * 0.25))
+
+
+# === MONTE CARLO =========================================================== #
+
+def synthetic_market(np, pd, n_days=600, tickers=("SP500", "EA", "TTWO"), seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-01", periods=n_days)
+    market = rng.normal(0, 0.01, n_days)
+    frames = [
+        pd.DataFrame({
+            "date": dates, "ticker": t, "market_return": market,
+            "return": market if t == "SP500" else 0.0005 + 1.2 * market + rng.normal(0, 0.02, n_days),
+        })
+        for t in tickers
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_placebo_null_is_reproducible_across_worker_counts():
+    from eventstudy.features.market_model import MarketModel
+    from eventstudy.features.monte_carlo import (
+        bootstrap_mean_car,
+        draw_placebo_positions,
+        placebo_null,
+    )
+
+    model = MarketModel.from_prices(synthetic_market(np, pd))
+    dates = pd.to_datetime(["2021-03-01", "2021-06-01", "2021-09-01", "2021-04-01"])
+    positions = model.calendar.locate(["EA", "EA", "TTWO", "TTWO"], dates)
+    G = np.array([[1, 1, 1, 1], [1, 1, 0, 0]], dtype=float)
+    windows = {"CAR_m1_p1": (-1, 1), "CAR_0_5": (0, 5)}
+
+    serial = placebo_null(model, positions, G, windows, n_reps=250, seed=7, jobs=1, chunk_size=40)
+    pooled = placebo_null(model, positions, G, windows, n_reps=250, seed=7, jobs=2, chunk_size=40)
+    assert serial.shape == (250, 2, 2)
+    assert np.array_equal(serial, pooled, equal_nan=True)
+    assert abs(np.nanmean(serial)) < 0.01
+
+    rng = np.random.default_rng(0)
+    lo, hi = np.array([positions[0] - 2]), np.array([positions[0] + 2])
+    drawn = draw_placebo_positions(rng, lo, hi, positions, 500)
+    assert not np.isin(drawn, positions).any()
+
+    car = np.array([[0.01], [0.03], [np.nan], [-0.02]])
+    boot = bootstrap_mean_car(car, G, n_boot=300, seed=1, chunk_size=64)
+    assert np.array_equal(boot, bootstrap_mean_car(car, G, n_boot=300, seed=1, chunk_size=64),
+                          equal_nan=True)
+    assert np.all((boot[:, 1, 0] >= 0.01) & (boot[:, 1, 0] <= 0.03))
+
+
+# === CAR SURFACE =========================================================== #
+
+def test_car_surface_matches_prefix_sum_windows(tmp_path):
+    from eventstudy.features.car_surface import CarSurface
+    from eventstudy.features.market_model import MarketModel
+
+    model = MarketModel.from_prices(synthetic_market(np, pd))
+    events = pd.DataFrame({
+        "event_id": ["a", "b", "edge", "unknown"],
+        "ticker": ["EA", "TTWO", "EA", "NOPE"],
+        "trading_date": pd.to_datetime(["2021-03-01", "2021-06-01", "2020-01-03", "2021-03-01"]),
+    })
+    positions = model.calendar.locate(events["ticker"], events["trading_date"])
+    params = model.estimate(positions)
+    events["alpha"] = params["alpha"].to_numpy()
+    events["beta"] = params["beta"].to_numpy()
+
+    surface = CarSurface.from_model(model, events, day_range=(-5, 5))
+    for a, b in [(-1, 1), (0, 5), (-5, 5), (3, 3)]:
+        expected = model.car_at(positions, a, b, events["alpha"], events["beta"])
+        assert np.allclose(surface.car(a, b), expected, equal_nan=True)
+
+    # "edge" has too few estimation days: no parameters, so no CAR either
+    assert np.isnan(events.loc[2, "alpha"]) and np.isnan(surface.car(-1, 1)[2])
+
+    cars = surface.surface()
+    assert cars.shape == (4, 11, 11)
+    assert np.isnan(cars[:, 6, 5]).all()
+    assert np.allclose(cars[:, 4, 6], surface.car(-1, 1), equal_nan=True)
+
+    loaded = CarSurface.load(surface.save(tmp_path / "surface.npz"))
+    assert np.allclose(loaded.cumsum, surface.cumsum, equal_nan=True)
+    assert loaded.windows({"CAR_0_1": (0, 1)}).index.tolist() == ["a", "b", "edge", "unknown"]
+
+
+# === LABELING ============================================================== #
+
+def test_vectorized_labels_and_threshold_sweep():
+    from eventstudy.features.car_into_label import (
+        SCHEME_LABELS,
+        assign_labels,
+        sweep_labels,
+    )
+
+    # The row-wise rule assign_labels replaced (a NaN CAR ends up Low)
+    def label_impact(car, medium=0.01, high=0.03):
+        if abs(car) > high:
+            return "High"
+        elif abs(car) > medium:
+            return "Medium"
+        else:
+            return "Low"
+
+    rng = np.random.default_rng(4)
+    car = rng.normal(0, 0.03, 90)
+    car[[0, 1, 2]] = [0.01, -0.03, np.nan]  # boundaries stay in the lower class
+    events = pd.DataFrame({"CAR_m1_p1": car, "CAR_0_5": car * 2, "sigma2": 4e-4})
+
+    expected = [label_impact(c) for c in car]
+    assert assign_labels(events).tolist() == expected
+
+    signed = assign_labels(events, scheme="signed")
+    assert signed[1] == "Negative" and signed[2] == "Neutral"
+
+    grids = {
+        "abs": [[0.01, 0.03], [0.02, 0.05]],
+        "quantile": [[1 / 3, 2 / 3]],
+        "scaled": [[1.0, 2.0]],
+        "signed": [[0.01, 0.03]],
+    }
+    sweep = sweep_labels(events, windows=["CAR_m1_p1", "CAR_0_5"], grids=grids)
+    assert len(sweep) == 2 * 5
+
+    first = sweep.iloc[0]
+    counts = pd.Series(expected).value_counts(normalize=True)
+    labeled = pd.Series(expected)[~np.isnan(car)].value_counts(normalize=True)
+    assert first["n_labeled"] == 89
+    assert np.isclose(first["share_High"], labeled["High"])
+    assert counts.index.isin(SCHEME_LABELS["abs"]).all()
+
+    quantile = sweep[sweep["scheme"] == "quantile"]
+    assert (quantile["max_share"] - quantile["min_share"] <= 0.03).all()
+    assert np.allclose(
+        sweep.filter(like="share_").sum(axis=1, skipna=True), 1.0,
+    )
+
+
+# === MARKET CONTEXT ======================================================== #
+
+def test_context_features_are_lagged_and_joined_as_of():
+    from eventstudy.features.market_context import (
+        build_market_context,
+        build_ticker_context,
+        join_context,
+    )
+
+    prices = synthetic_market(np, pd, n_days=120)
+    dates = prices["date"].drop_duplicates().sort_values().reset_index(drop=True)
+    vix = pd.DataFrame({"date": dates, "vix": np.arange(len(dates), dtype=float) + 10})
+
+    market_ctx = build_market_context(prices, vix, lookbacks=(20,), vix_changes=(1,))
+    ticker_ctx = build_ticker_context(prices, lookbacks=(20,))
+
+    # Value on day t is the VIX close of t - 1
+    assert market_ctx["vix"].iloc[50] == 10 + 49
+    assert market_ctx["vix_chg_1d"].iloc[50] == 1.0
+
+    ea = prices[prices["ticker"] == "EA"].reset_index(drop=True)
+    past = ea["return"].iloc[30:50]
+    row = ticker_ctx[(ticker_ctx["ticker"] == "EA") & (ticker_ctx["date"] == ea["date"].iloc[50])]
+    assert np.isclose(row["vol_20d"].iloc[0], past.std() * np.sqrt(252))
+    assert np.isclose(row["mom_20d"].iloc[0], np.prod(1 + past) - 1)
+    assert np.isclose(
+        market_ctx["mkt_vol_20d"].iloc[50],
+        prices.loc[prices["ticker"] == "SP500", "return"].iloc[30:50].std() * np.sqrt(252),
+    )
+
+    events = pd.DataFrame({
+        "ticker": ["EA", "TTWO", "NOPE"],
+        # Saturday resolves to the Friday before
+        "trading_date": [ea["date"].iloc[50], pd.Timestamp("2020-02-01"), ea["date"].iloc[50]],
+    })
+    joined = join_context(events, market_ctx, ticker_ctx)
+    assert np.isclose(joined["vol_20d"].iloc[0], row["vol_20d"].iloc[0])
+    assert joined["vix"].iloc[1] == market_ctx.loc[dates == pd.Timestamp("2020-01-31"), "vix"].iloc[0]
+    assert np.isnan(joined["mom_20d"].iloc[2]) and not np.isnan(joined["vix"].iloc[2])
+
+
+# === CAR REGRESSION ======================================================== #
+
+def test_nested_regressions_match_separate_ols():
+    from eventstudy.features.car_regression import regression_table
+
+    rng = np.random.default_rng(5)
+    n = 80
+    events = pd.DataFrame({
+        "event_type": rng.choice(["Trailer", "Release", "Delay"], n),
+        "publisher": rng.choice(["EA", "Take-Two"], n),
+        "vix": rng.uniform(12, 35, n),
+        "trading_date": pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 30, n), "D"),
+    })
+    # Perfectly aliased with publisher: must be dropped, not break the fit
+    events["franchise"] = events["publisher"].map({"EA": "FIFA", "Take-Two": "GTA"})
+    events["CAR_a"] = 0.01 * (events["event_type"] == "Release") - 0.001 * events["vix"] + rng.normal(0, 0.01, n)
+    events["CAR_b"] = rng.normal(0, 0.02, n)
+
+    table = regression_table(events, windows={"CAR_a": (0, 1), "CAR_b": (0, 5)})
+    assert set(table["spec"]) == {
+        "event_type", "event_type+publisher", "event_type+publisher+franchise",
+        "event_type+publisher+franchise+vix",
+    }
+    assert not table["term"].str.startswith("franchise").any()
+
+    full = table[(table["spec"] == "event_type+publisher+franchise+vix") & (table["window"] == "CAR_a")]
+    X = np.column_stack([
+        np.ones(n),
+        pd.get_dummies(events["event_type"], drop_first=True, dtype=float),
+        pd.get_dummies(events["publisher"], drop_first=True, dtype=float),
+        events["vix"],
+    ])
+    y = events["CAR_a"].to_numpy()
+    beta = np.linalg.lstsq(X, y, rcond=None)[0]
+    assert np.allclose(full["coef"], beta)
+
+    # HC1 sandwich computed directly
+    e = y - X @ beta
+    bread = np.linalg.inv(X.T @ X)
+    cov = bread @ (X.T * e ** 2) @ X @ bread * n / (n - X.shape[1])
+    assert np.allclose(full["se_hc1"], np.sqrt(np.diag(cov)))
+
+    # Clustered by date
+    meat = sum(
+        np.outer(X[g].T @ e[g], X[g].T @ e[g])
+        for g in [events["trading_date"] == d for d in events["trading_date"].unique()]
+    )
+    G = events["trading_date"].nunique()
+    cov_cl = bread @ meat @ bread * G / (G - 1) * (n - 1) / (n - X.shape[1])
+    assert np.allclose(full["se_cluster"], np.sqrt(np.diag(cov_cl)))
+
+def test_regression_keeps_terms_past_the_row_count(capsys):
+    from eventstudy.features.car_regression import regression_table
+
+    rng = np.random.default_rng(6)
+    n, n_sales = 60, 20
+    events = pd.DataFrame({
+        "event_type": rng.choice(["Trailer", "Release", "Delay"], n),
+        "publisher": rng.choice(["EA", "Take-Two"], n),
+        # 30 franchises, but only three among the events with sales
+        "franchise": [f"F{i % 30:02d}" for i in range(n)],
+        "vix": rng.uniform(12, 35, n),
+        "trading_date": pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 40, n), "D"),
+    })
+    sales = np.arange(n) % 3 == 0
+    events.loc[sales, "franchise"] = rng.choice(["F00", "F01", "F02"], n_sales)
+    events["log_sales"] = np.where(sales, rng.uniform(0, 3, n), np.nan)
+    events["CAR_a"] = 0.002 * events["vix"] + rng.normal(0, 0.01, n)
+
+    table = regression_table(events, windows={"CAR_a": (0, 1)})
+    n_by_spec = table.groupby("spec", sort=False)["n"].first()
+
+    # Each spec on its own complete cases: sales only cut the last one
+    assert n_by_spec.tolist() == [n, n, n, n, n_sales]
+
+    # 36 design columns for 20 rows: the all-zero franchise dummies go,
+    # vix and log_sales stay
+    full = table[table["spec"] == "event_type+publisher+franchise+vix+log_sales"]
+    assert {"vix", "log_sales"} <= set(full["term"])
+    sub = events[sales]
+    X = pd.concat([
+        pd.get_dummies(sub[["event_type", "publisher", "franchise"]], drop_first=True, dtype=float),
+        sub[["vix", "log_sales"]],
+    ], axis=1)
+    X.insert(0, "const", 1.0)
+    beta = np.linalg.lstsq(X.to_numpy(), sub["CAR_a"].to_numpy(), rcond=None)[0]
+    assert full["term"].tolist() == X.columns.tolist()
+    assert np.allclose(full["coef"], beta)
+
+    # No residual degrees of freedom: the spec is skipped with a warning
+    few = pd.DataFrame({
+        "event_type": ["Trailer", "Release", "Trailer", "Release"],
+        "franchise": ["F00", "F00", "F01", "F02"],
+        "trading_date": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-06"]),
+        "CAR_a": [0.01, -0.02, 0.03, 0.0],
+    })
+    table = regression_table(few, windows={"CAR_a": (0, 1)})
+    assert set(table["spec"]) == {"event_type"}
+    assert "[WARN] Skipping spec event_type+franchise: 4 independent regressors for 4 events" \
+        in capsys.readouterr().out
+
+
+# === TITLE MATCHING ======================================================== #
+
+def test_events_match_aggregated_vgsales_titles():
+    from eventstudy.features.title_matching import (
+        MIN_SCORE,
+        TitleIndex,
+        aggregate_sales,
+        match_events,
+        normalize_title,
+    )
+
+    assert normalize_title("GTA V (PS5/Xbox Series)") == "grand theft auto 5"
+    assert normalize_title("Pokémon Scarlet & Violet") == "pokemon scarlet and violet"
+
+    vgsales = pd.DataFrame({
+        "Name": ["Grand Theft Auto V", "Grand Theft Auto V", "Grand Theft Auto V",
+                 "Grand Theft Auto IV", "Red Dead Redemption 2", "Star Wars Battlefront II",
+                 "FIFA 14"],
+        "Platform": ["PS3", "X360", "X360", "PS3", "PS4", "PS4", "PS4"],
+        "Year": [2013, 2013, 2013, 2008, 2018, 2017, 2013],
+        "Publisher": ["Take-Two Interactive"] * 5 + ["Electronic Arts"] * 2,
+        "Global_Sales": [21.4, 16.38, 16.38, 11.0, 13.94, 7.0, 6.5],
+    })
+    catalogue = aggregate_sales(vgsales)
+    gta5 = catalogue[catalogue["title"] == "Grand Theft Auto V"]
+    assert gta5["global_sales"].iloc[0] == pytest.approx(21.4 + 16.38)
+
+    events = pd.DataFrame({
+        "event_id": ["e1", "e2", "e3", "e4", "e5", "e6", "e7", "e8"],
+        "game": ["GTA V", "GTA VI", "RDR2", "Star Wars Battlefront 2", "FIFA 23", "Multiple titles", None,
+                 "Battlefront II"],
+        "publisher": ["Take-Two", "Take-Two", "Take-Two", "Electronic Arts", "EA", "Ubisoft", "EA",
+                      "Electronic Arts"],
+    })
+    matches = match_events(events, catalogue).set_index("event_id")
+
+    assert matches.loc["e1", "matched_title"] == "Grand Theft Auto V"
+    assert matches.loc["e1", "match_score"] == 1.0
+    assert matches.loc["e3", "matched_title"] == "Red Dead Redemption 2"
+    assert matches.loc["e4", "matched_title"] == "Star Wars Battlefront II"
+    # Unreleased sequels and non-titles stay unmatched
+    assert matches.loc[["e2", "e5", "e6", "e7"], "matched_title"].isna().all()
+    # The publisher does not lift a weak title over the threshold
+    _, score = TitleIndex(catalogue).match("Battlefront II", "Electronic Arts", min_score=0.0)
+    assert score < MIN_SCORE and np.isnan(matches.loc["e8", "match_score"])
+    assert matches["match_score"].max() <= 1.0
+
+    # Lookups only touch titles sharing a trigram
+    ids, _ = TitleIndex(catalogue).candidates(normalize_title("Battlefront II"))
+    assert len(ids) < len(catalogue)
+
+def test_franchise_titles_need_the_same_subtitle_and_release():
+    from eventstudy.features.title_matching import aggregate_sales, match_events
+
+    # Catalogue titles of the franchises the events are about, none of them
+    # the events' own game apart from GTA V and Battlefront
+    vgsales = pd.DataFrame({
+        "Name": ["Call of Duty: Ghosts", "Call of Duty: Modern Warfare Trilogy",
+                 "The Legend of Zelda: The Wind Waker", "Animal Crossing: Amiibo Festival",
+                 "Assassin's Creed: Rogue", "Grand Theft Auto V", "Star Wars Battlefront (2015)"],
+        "Year": [2013, 2016, 2013, 2015, 2014, 2013, 2015],
+        "Publisher": ["Activision", "Activision", "Nintendo", "Nintendo", "Ubisoft",
+                      "Take-Two Interactive", "Electronic Arts"],
+        "Global_Sales": [27.4, 0.9, 1.77, 0.5, 1.2, 55.9, 11.7],
+    })
+    events = pd.DataFrame([
+        ("cod_mobile", "Call of Duty: Mobile", "Activision", "2019-10-01"),
+        ("cod_mw", "Call of Duty: Modern Warfare", "Activision", "2019-10-25"),
+        ("cod_warzone", "Call of Duty: Warzone", "Activision", "2020-03-10"),
+        ("zelda_botw", "The Legend of Zelda: Breath of the Wild", "Nintendo", "2017-03-03"),
+        ("zelda_totk", "The Legend of Zelda: Tears of the Kingdom", "Nintendo", "2023-05-12"),
+        ("acnh", "Animal Crossing: New Horizons", "Nintendo", "2020-03-20"),
+        ("ac_valhalla", "Assassin's Creed Valhalla", "Ubisoft", "2020-11-10"),
+        ("ac_mirage", "Assassin's Creed Mirage", "Ubisoft", "2022-09-10"),
+        # Announced two years before release: linked through its later events
+        ("gta5_reveal", "GTA V", "Take-Two", "2011-10-25"),
+        ("gta5_release", "GTA V", "Take-Two", "2013-09-17"),
+        # Every event before the catalogue game came out
+        ("swbf_reveal", "Battlefront", "Electronic Arts", "2013-06-10"),
+        ("swbf_release", "Star Wars Battlefront", "Electronic Arts", "2015-11-17"),
+    ], columns=["event_id", "game", "publisher", "event_date"])
+
+    matches = match_events(events, aggregate_sales(vgsales)).set_index("event_id")
+
+    assert matches.loc[["gta5_reveal", "gta5_release"], "matched_title"].eq("Grand Theft Auto V").all()
+    assert matches.loc["swbf_release", "matched_title"] == "Star Wars Battlefront (2015)"
+    others = matches.index.difference(["gta5_reveal", "gta5_release", "swbf_release"])
+    assert matches.loc[others, "matched_title"].isna().all(), matches.loc[others].dropna()
+
+
+# === STREAMING CLEANER ===================================================== #
+
+def test_streaming_cleaner_writes_partitioned_table(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.data_cleaner_vgs import stream_clean
+    from eventstudy.data.store import read_table
+
+    # VGChartz layout: other column names, full release dates, extra columns
+    raw = tmp_path / "vgchartz.csv"
+    raw.write_text(
+        "img,title,console,publisher,total_sales,release_date\n"
+        "a.png,Grand Theft Auto V,PS3,Take-Two Interactive,20.3,2013-09-17\n"
+        "b.png,Old Game,PS2,Ubisoft,1.0,2005-03-01\n"
+        "c.png,Indie Game,PC,Small Studio,0.2,2019-01-01\n"
+        "d.png,FIFA 14,PS4,Electronic Arts,,2013-09-24\n"
+        "e.png,Splatoon 2,NS,Nintendo,4.9,2017-07-21\n"
+    )
+    root = tmp_path / "processed"
+    stats = stream_clean(raw, "vg", min_year=2013,
+                         publishers=["Take-Two Interactive", "Nintendo", "Electronic Arts"],
+                         chunk_rows=2, root=root)
+
+    assert len(list((root / "vg").glob("part-*.parquet"))) == 3
+    assert (stats["rows"], stats["kept"]) == (5, 2)
+    assert (stats["min_year"], stats["max_year"]) == (2013, 2017)
+
+    cleaned = read_table("vg", root=root)
+    assert cleaned["Name"].tolist() == ["Grand Theft Auto V", "Splatoon 2"]
+    assert cleaned["Year"].tolist() == [2013, 2017]
+    assert str(cleaned["Global_Sales"].dtype) == "float32"
+    assert isinstance(cleaned["Publisher"].dtype, pd.CategoricalDtype)
+
+
+# === CATEGORY ENCODER ====================================================== #
+
+def test_category_encoder_keeps_training_feature_space(tmp_path):
+    pytest.importorskip("scipy")
+    from eventstudy.features.category_encoder import CategoryEncoder
+
+    train = pd.DataFrame({
+        "publisher": ["EA", "Ubisoft", "EA ", "Nintendo"],
+        "sentiment": ["Positive", "negative", "positive", None],
+    })
+    encoder = CategoryEncoder.fit(train, ["publisher", "sentiment", "studio"], lower=("sentiment",))
+    assert encoder.columns == ["publisher", "sentiment"]
+    assert encoder.feature_names == [
+        "publisher_Nintendo", "publisher_Ubisoft", "publisher___other__",
+        "sentiment_positive", "sentiment___other__",
+    ]
+
+    X = encoder.transform(train).toarray()
+    assert X.dtype == "uint8"
+    # EA and negative are the dropped reference levels; None goes to other
+    assert X.tolist() == [
+        [0, 0, 0, 1, 0],
+        [0, 1, 0, 0, 0],
+        [0, 0, 0, 1, 0],
+        [1, 0, 0, 0, 1],
+    ]
+
+    # Scoring frame: unseen category, missing column, same feature space
+    encoder = CategoryEncoder.load(encoder.save(tmp_path / "encoder.json"))
+    score = pd.DataFrame({"publisher": ["Activision", "Ubisoft"]})
+    Y = encoder.transform(score)
+    assert Y.shape == (2, len(encoder.feature_names))
+    assert Y.toarray().tolist() == [[0, 0, 1, 0, 1], [0, 1, 0, 0, 1]]
+
+
+# === DAILY UPDATE ========================================================== #
+
+def test_daily_update_matches_full_run_on_affected_events():
+    from eventstudy.features.compute_ar_car import (
+        build_alpha_beta_table,
+        compute_events_car,
+        compute_prices_ar,
+    )
+    from eventstudy.features.daily_update import build_state, run_update
+    from eventstudy.features.merge_event_returns import attach_trading_days
+
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2020-01-01", periods=400)
+    market = rng.normal(0.0, 0.01, len(dates))
+    stock = 0.0002 + 1.3 * market + rng.normal(0.0, 0.01, len(dates))
+    bars = pd.concat([
+        pd.DataFrame({"date": dates, "ticker": "SP500", "adj_close": 100 * np.cumprod(1 + market)}),
+        pd.DataFrame({"date": dates, "ticker": "AAA", "adj_close": 50 * np.cumprod(1 + stock)}),
+    ], ignore_index=True)
+
+    def full_run(bars):
+        prices = bars.sort_values(["ticker", "date"]).reset_index(drop=True)
+        prices["return"] = prices.groupby("ticker")["adj_close"].pct_change()
+        market_return = prices[prices["ticker"] == "SP500"].set_index("date")["return"]
+        prices["market_return"] = prices["date"].map(market_return)
+        return compute_prices_ar(prices, build_alpha_beta_table(prices))
+
+    cut = dates[379]
+    events = pd.DataFrame({
+        "event_id": ["old", "recent", "after_close", "late"], "ticker": "AAA",
+        # Dated after the last bar of the full run: aligned to that bar
+        # (backward) or unmatched (after the close), until new bars come
+        "event_date": [dates[300], dates[376], cut + pd.Timedelta(hours=17), dates[383]],
+    })
+
+    def event_run(prices):
+        return compute_events_car(attach_trading_days(events, prices)[0], prices)
+
+    history = full_run(bars[bars["date"] <= cut])
+    state, tail = build_state(history)
+    stored_events = event_run(history)
+    assert stored_events["trading_date"].tolist()[2:] == [pd.NaT, cut]
+
+    state, tail, new, updated, n_events = run_update(
+        bars[bars["date"] > cut], state, tail, stored_events
+    )
+
+    # Events whose window reaches the new bars are recomputed, the late
+    # ones on their own trading day, and match a full run over the whole history
+    assert n_events == 3
+    expected = event_run(full_run(bars))
+    assert updated["trading_date"].tolist() == expected["trading_date"].tolist()
+    assert updated["trading_date"].tolist()[2:] == [dates[380], dates[383]]
+    for col in ["adj_close", "return", "alpha", "beta", "AR_event", "CAR_m1_p1", "CAR_m5_p5"]:
+        np.testing.assert_allclose(updated[col], expected[col])
+
+    full = full_run(bars)
+    full_new = full[full["date"] > cut].sort_values(["ticker", "date"])
+    np.testing.assert_allclose(new["return"], full_new["return"])
+    np.testing.assert_allclose(new["market_return"], full_new["market_return"])
+
+    # ARs use the stored alpha/beta and continue the cumulative AR
+    aaa = new[new["ticker"] == "AAA"]
+    last_cum = history.loc[history["ticker"] == "AAA", "cum_AR"].iloc[-1]
+    assert aaa["cum_AR"].iloc[-1] == pytest.approx(last_cum + aaa["AR"].sum())
+    assert state["tickers"]["AAA"]["last_date"] == str(dates[-1].date())
+    assert (tail.groupby("ticker").size() <= 256).all()
+
+
+# === LIVE MONITOR ========================================================== #
+
+def test_live_monitor_streams_the_batch_car(tmp_path):
+    import asyncio
+    import json
+
+    from eventstudy.features.compute_ar_car import compute_events_car
+    from eventstudy.features.live_monitor import (
+        JsonlSink,
+        LiveMonitor,
+        QueueFeed,
+        ReplayFeed,
+    )
+    from eventstudy.features.market_model import MarketModel
+
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2023-01-02", periods=320)
+    market = rng.normal(0.0, 0.01, len(dates))
+    stock = 1.2 * market + rng.normal(0.0, 0.01, len(dates))
+    prices = pd.concat([
+        pd.DataFrame({"date": dates, "ticker": "SP500", "adj_close": 100 * np.cumprod(1 + market)}),
+        pd.DataFrame({"date": dates, "ticker": "AAA", "adj_close": 20 * np.cumprod(1 + stock)}),
+    ], ignore_index=True).sort_values(["ticker", "date"], ignore_index=True)
+    prices["return"] = prices.groupby("ticker")["adj_close"].pct_change()
+    prices["market_return"] = prices["date"].map(
+        prices[prices["ticker"] == "SP500"].set_index("date")["return"]
+    )
+
+    history = prices[prices["date"] <= dates[299]]
+    # Stock bars before their market bar: they wait for it
+    feed = prices[prices["date"] > dates[299]].sort_values(["date", "ticker"])
+    events = pd.DataFrame({
+        "event_id": ["live", "past"], "ticker": ["AAA", "AAA"],
+        "event_date": [dates[305], dates[100]],
+    })
+
+    updates = []
+    monitor = LiveMonitor.from_history(history, events, window=(-2, 3), sink=updates.append)
+    assert monitor.n_open == 1    # the past event is the batch pipeline's
+    live = monitor.open["AAA"][0]
+
+    asyncio.run(monitor.run(ReplayFeed(feed)))
+    assert monitor.n_open == 0
+    assert [u["day"] for u in updates if u["status"] != "pre"] == [0, 1, 2, 3]
+    assert updates[-1]["status"] == "closed" and updates[-1]["date"] == str(dates[308].date())
+
+    # Same alpha/beta and CAR as the batch run once the bars are stored
+    event = pd.DataFrame({"ticker": ["AAA"], "trading_date": [dates[305]]})
+    batch = compute_events_car(event, prices)
+    assert live.alpha == pytest.approx(batch["alpha"].iloc[0], rel=1e-12)
+    assert live.beta == pytest.approx(batch["beta"].iloc[0], rel=1e-12)
+    model = MarketModel.from_prices(prices)
+    pos = model.calendar.locate(event["ticker"], event["trading_date"])
+    expected = model.car_at(pos, -2, 3, batch["alpha"], batch["beta"])
+    assert updates[-1]["car"] == pytest.approx(expected[0])
+
+    # Queue feed: bars pushed by another coroutine
+    async def push_and_run():
+        monitor = LiveMonitor.from_history(history, events, window=(0, 0), sink=updates.append)
+        feed_q = QueueFeed()
+        for bar in feed[["date", "ticker", "adj_close"]].itertuples(index=False):
+            feed_q.queue.put_nowait(tuple(bar))
+        feed_q.queue.put_nowait(None)
+        await monitor.run(feed_q)
+        return monitor
+
+    assert asyncio.run(push_and_run()).n_open == 0
+
+    # JSONL sink: the first bar has no previous close, its NaN AR is null
+    with JsonlSink(tmp_path / "updates.jsonl") as sink:
+        sink({**updates[0], "ar": float("nan"), "car": float("nan")})
+    line = json.loads((tmp_path / "updates.jsonl").read_text())
+    assert line["ar"] is None and line["car"] is None and line["event_id"] == "live"
+
+
+# === INTRADAY ============================================================== #
+
+def test_intraday_windows_resolve_on_lazily_loaded_sessions(tmp_path):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.intraday import sessions, write_sessions
+    from eventstudy.features.intraday_car import (
+        event_sessions,
+        intraday_car,
+        intraday_returns,
+        load_event_bars,
+        minutes_to_offsets,
+    )
+    from eventstudy.features.price_panel import PricePanel
+
+    rng = np.random.default_rng(11)
+    days = pd.bdate_range("2025-04-01", periods=20)
+    stamps = pd.DatetimeIndex([
+        d + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(minutes=5 * k)
+        for d in days for k in range(78)
+    ])
+    market = rng.normal(0.0, 0.001, len(stamps))
+    stock = 1.5 * market + rng.normal(0.0, 0.001, len(stamps))
+    bars = pd.concat([
+        pd.DataFrame({"date": stamps, "ticker": "SPY", "close": 500 * np.cumprod(1 + market)}),
+        pd.DataFrame({"date": stamps, "ticker": "TTWO", "close": 200 * np.cumprod(1 + stock)}),
+        # Pre-market bar: outside the session, dropped
+        pd.DataFrame({"date": [days[0] + pd.Timedelta(hours=8)], "ticker": "TTWO", "close": [1.0]}),
+    ], ignore_index=True)
+    assert write_sessions(bars, tmp_path) == 40
+    assert len(sessions("TTWO", tmp_path)) == 20
+
+    # Event at 11:02 on the 19th session: only its estimation sessions load
+    events = pd.DataFrame({
+        "event_id": ["delay"], "ticker": ["TTWO"],
+        "timestamp": [days[18] + pd.Timedelta(hours=11, minutes=2)],
+    })
+    windows = {"CAR": (-30, 120)}
+    needed = event_sessions(events, windows=windows, root=tmp_path)
+    assert 0 < len(needed["TTWO"]) < 20 and needed["SPY"] == needed["TTWO"]
+
+    raw = load_event_bars(events, root=tmp_path, windows=windows)
+    intraday_only = intraday_returns(raw, overnight=False)
+    first_bars = intraday_only["date"].dt.time == pd.Timestamp("09:30").time()
+    assert intraday_only.loc[first_bars, "return"].isna().all()
+    assert intraday_only.loc[~first_bars, "return"].notna().all()
+
+    # Opening bars return against the previous session's close, except the
+    # first loaded session's
+    loaded = intraday_returns(raw)
+    first_session = loaded["date"].dt.normalize() == loaded["date"].min().normalize()
+    assert loaded.loc[first_bars & first_session, "return"].isna().all()
+    assert loaded.loc[~(first_bars & first_session), "return"].notna().all()
+    ttwo = loaded[loaded["ticker"] == "TTWO"].reset_index(drop=True)
+    opening = ttwo.index[(ttwo["date"].dt.time == pd.Timestamp("09:30").time()).to_numpy()][1:]
+    close = ttwo["close"].to_numpy()
+    assert np.allclose(ttwo.loc[opening, "return"], close[opening] / close[opening - 1] - 1)
+
+    out = intraday_car(loaded, events, windows=windows)
+    assert out["event_bar"].iloc[0] == days[18] + pd.Timedelta(hours=11, minutes=5)
+    assert minutes_to_offsets((-30, 120), 5) == (-6, 24)
+
+    ttwo = loaded[loaded["ticker"] == "TTWO"].reset_index(drop=True)
+    at = ttwo.index[ttwo["date"] == out["event_bar"].iloc[0]][0]
+    window = ttwo.iloc[at - 6:at + 25]
+    ar = window["return"] - out["alpha"].iloc[0] - out["beta"].iloc[0] * window["market_return"]
+    assert out["CAR"].iloc[0] == pytest.approx(ar.sum())
+
+    # Panels keep intraday timestamps through save/load
+    panel = PricePanel.from_long(loaded, value_col="close")
+    reloaded = PricePanel.load(panel.save(tmp_path / "intraday_panel"))
+    assert (reloaded.dates == panel.dates).all()
+
+
+def test_intraday_after_close_event_keeps_the_overnight_reaction():
+    from eventstudy.features.intraday_car import intraday_car, intraday_returns
+
+    rng = np.random.default_rng(12)
+    days = pd.bdate_range("2025-04-01", periods=8)
+    stamps = pd.DatetimeIndex([
+        d + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(minutes=5 * k)
+        for d in days for k in range(78)
+    ])
+    market = rng.normal(0.0, 0.001, len(stamps))
+    stock = 1.5 * market + rng.normal(0.0, 0.001, len(stamps))
+    stock[stamps == days[7] + pd.Timedelta(hours=9, minutes=30)] += 0.08    # gap up at the open
+    bars = pd.concat([
+        pd.DataFrame({"date": stamps, "ticker": "SPY", "close": 500 * np.cumprod(1 + market)}),
+        pd.DataFrame({"date": stamps, "ticker": "TTWO", "close": 200 * np.cumprod(1 + stock)}),
+    ], ignore_index=True)
+
+    # Earnings after the close: day 0 is the next session's opening bar
+    events = pd.DataFrame({
+        "event_id": ["earnings"], "ticker": ["TTWO"],
+        "timestamp": [days[6] + pd.Timedelta(hours=16, minutes=5)],
+    })
+    windows = {"CAR_0_30min": (0, 30)}
+    out = intraday_car(intraday_returns(bars), events, windows=windows)
+    assert out["event_bar"].iloc[0] == days[7] + pd.Timedelta(hours=9, minutes=30)
+    assert out["CAR_0_30min"].iloc[0] > 0.07
+
+    # Without overnight returns the reaction is lost
+    missed = intraday_car(intraday_returns(bars, overnight=False), events, windows=windows)
+    assert abs(missed["CAR_0_30min"].iloc[0]) < 0.02
+
+
+# === OUT-OF-CORE =========================================================== #
+
+def test_out_of_core_partitions_match_in_memory_run(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from eventstudy.data.store import read_table, write_table
+    from eventstudy.features import out_of_core
+    from eventstudy.features.car_into_label import add_car_windows, add_impact_labels
+    from eventstudy.features.compute_ar_car import (
+        build_alpha_beta_table,
+        compute_events_car,
+        compute_prices_ar,
+    )
+    from eventstudy.features.compute_returns import (
+        add_market_returns,
+        add_returns,
+        clean_tickers,
+    )
+    from eventstudy.features.merge_event_returns import attach_trading_days
+    from eventstudy.features.out_of_core import (
+        partition_prices,
+        run_out_of_core,
+        source_dataset,
+    )
+
+    rng = np.random.default_rng(11)
+    dates = pd.bdate_range("2019-01-01", periods=420)
+    market = rng.normal(0.0, 0.01, len(dates))
+    frames = [pd.DataFrame({"date": dates, "ticker": "^GSPC", "adj_close": 100 * np.cumprod(1 + market)})]
+    for i, ticker in enumerate(["EA", "TTWO", "UBI.PA"]):
+        stock = 1.1 * market + rng.normal(0.0, 0.01, len(dates))
+        keep = rng.random(len(dates)) > 0.05 * i    # gaps the panel returns bridge
+        frames.append(pd.DataFrame({
+            "date": dates[keep], "ticker": ticker, "adj_close": 40 * np.cumprod(1 + stock)[keep],
+        }))
+    write_table(pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0), "prices_long", tmp_path)
+
+    events = pd.DataFrame({
+        "event_id": ["a", "b", "c", "d", "e"],
+        "date": [dates[300], dates[350], dates[310], dates[400], dates[330]],
+        "ticker": ["TTWO", "EA", "UBSFY", "NOPE", "EA"],
+        "publisher": "x",
+    })
+
+    # In-memory path: one frame through every stage
+    prices = clean_tickers(read_table("prices_long", tmp_path))
+    prices = add_market_returns(add_returns(prices))
+    prices = compute_prices_ar(prices, build_alpha_beta_table(prices))
+    merged, unmatched = attach_trading_days(events.copy(), prices)
+    expected = add_impact_labels(add_car_windows(compute_events_car(merged, prices), prices))
+
+    assert partition_prices("prices_long", tmp_path, by_year=True, batch_rows=500) == len(prices)
+    stats = run_out_of_core(events, tmp_path, columns=source_dataset("prices_long", tmp_path).schema.names)
+    assert stats["tickers"] == 4 and stats["max_partition_rows"] == len(dates)
+    assert stats["peak_rss_mb"] > 0
+
+    labeled = read_table("events_labeled", tmp_path)
+    assert labeled["event_id"].tolist() == expected["event_id"].tolist()
+    # Bit-identical, not just close: sums run in the same order on both paths
+    for col in ["return", "alpha", "beta", "AR_event", "CAR_m1_p1", "CAR_m5_p5", "CAR_0_5"]:
+        np.testing.assert_array_equal(labeled[col], expected[col])
+    assert labeled["impact_label"].tolist() == expected["impact_label"].tolist()
+    assert read_table("events_unmatched", tmp_path)["event_id"].tolist() == unmatched["event_id"].tolist()
+
+    stored = read_table("prices_with_ar", tmp_path)
+    expected_prices = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
+    assert stored["ticker"].astype(str).tolist() == expected_prices["ticker"].tolist()
+    for col in ["return", "market_return", "AR", "cum_AR"]:
+        np.testing.assert_array_equal(stored[col], expected_prices[col])
+    assert "AR" not in read_table("prices_with_returns", tmp_path).columns
+
+    # The run stops at the partition that pushed the peak RSS past the limit
+    # (checked before the loop, after the market and after EA, SP500, TTWO)
+    readings = iter([100.0] * 4 + [5000.0])
+    monkeypatch.setattr(out_of_core, "peak_rss_mb", lambda: next(readings))
+    with pytest.raises(MemoryError, match="partition 'TTWO'"):
+        run_out_of_core(events, tmp_path, memory_limit_mb=1000)
+
+
+# === SHARDED EXECUTION ===================================================== #
+
+def test_sharded_stages_match_one_job(monkeypatch, tmp_path, capsys):
+    from eventstudy.features.car_into_label import add_car_windows
+    from eventstudy.features.compute_ar_car import (
+        build_alpha_beta_table,
+        compute_events_car,
+        compute_prices_ar,
+        load_return_panel,
+    )
+    from eventstudy.features.compute_returns import add_market_returns, add_returns
+    from eventstudy.features.market_context import build_ticker_context
+    from eventstudy.features.merge_event_returns import attach_trading_days
+    from eventstudy.features.price_panel import PricePanel
+    from eventstudy.sharded import (
+        JOBS_ENV,
+        SharedFrame,
+        attach,
+        parse_jobs,
+        shard_frame,
+        ticker_shards,
+        warn_serial,
+    )
+
+    rng = np.random.default_rng(5)
+    dates = pd.bdate_range("2020-01-01", periods=320)
+    market = rng.normal(0.0, 0.01, len(dates))
+    frames = [pd.DataFrame({"date": dates, "ticker": "SP500", "adj_close": 100 * np.cumprod(1 + market)})]
+    for i in range(7):
+        start = 20 * i
+        r = 1.2 * market + rng.normal(0.0, 0.01, len(dates))
+        frames.append(pd.DataFrame({
+            "date": dates[start:], "ticker": f"T{i}", "adj_close": 30 * np.cumprod(1 + r)[start:],
+        }))
+    prices = pd.concat(frames, ignore_index=True).sample(frac=1, random_state=1)
+    events = pd.DataFrame({
+        "event_id": [f"e{k}" for k in range(12)],
+        "ticker": ["T3", "T0", "T6", "NOPE", "T1", "T0", "T5", "T2", "T4", "T6", "T3", "T1"],
+        "date": dates[rng.integers(250, 310, 12)],
+    }, index=np.arange(100, 112))
+
+    def run(jobs):
+        prices_r = add_market_returns(add_returns(prices, jobs=jobs))
+        table = build_alpha_beta_table(prices_r, jobs=jobs)
+        merged, unmatched = attach_trading_days(events, prices_r, jobs=jobs)
+        merged = add_car_windows(compute_events_car(merged, prices_r, jobs=jobs), prices_r, jobs=jobs)
+        return prices_r, table, merged, unmatched, build_ticker_context(prices_r, jobs=jobs)
+
+    serial, sharded = run(1), run(2)
+    np.testing.assert_allclose(sharded[0]["return"], serial[0]["return"], rtol=1e-12)
+    assert sharded[1].keys() == serial[1].keys()
+    assert sharded[1]["T3"]["beta"] == pytest.approx(serial[1]["T3"]["beta"], rel=1e-12)
+    assert sharded[2]["event_id"].tolist() == serial[2]["event_id"].tolist()
+    for col in ["trading_date", "alpha", "beta", "AR_event", "CAR_m5_p5", "CAR_0_5"]:
+        pd.testing.assert_series_equal(sharded[2][col], serial[2][col], check_exact=False, rtol=1e-12)
+    assert sharded[3]["event_id"].tolist() == serial[3]["event_id"].tolist() == ["e3"]
+    pd.testing.assert_frame_equal(sharded[4], serial[4])
+
+    # The saved return panel: pool workers map it, AR is computed on it
+    prices_r = serial[0]
+    panel = PricePanel.from_long(prices, value_col="adj_close")
+    PricePanel(panel.dates, panel.tickers, panel.returns()).save(tmp_path / "return_panel")
+    loaded = load_return_panel(prices_r, tmp_path / "return_panel")
+    assert loaded.path == tmp_path / "return_panel"
+    mapped = build_alpha_beta_table(prices_r, loaded, jobs=2)
+    assert mapped["T3"]["beta"] == pytest.approx(serial[1]["T3"]["beta"], rel=1e-12)
+    with_panel = compute_prices_ar(prices_r.copy(), serial[1], loaded)
+    in_memory = compute_prices_ar(prices_r.copy(), serial[1])
+    pd.testing.assert_frame_equal(with_panel, in_memory)
+    assert load_return_panel(prices_r.assign(ticker="NEW"), tmp_path / "return_panel").path is None
+
+    # Shards are contiguous ticker ranges that cover every row once
+    ordered = prices.sort_values(["ticker", "date"]).reset_index(drop=True)
+    with SharedFrame(ordered, ["adj_close"]) as shared:
+        shards = ticker_shards(shared.bounds, 3)
+        assert shards[0][0] == 0 and shards[-1][1] == len(shared.tickers)
+        assert all(a[1] == b[0] for a, b in pairwise(shards))
+        arrays, blocks = attach(shared.spec())
+        rows = pd.concat([shard_frame(shared.spec(), arrays, *s) for s in shards], ignore_index=True)
+        np.testing.assert_array_equal(rows["adj_close"], ordered["adj_close"])
+        assert rows["ticker"].tolist() == ordered["ticker"].tolist()
+        for block in blocks:
+            block.close()
+
+    monkeypatch.setenv(JOBS_ENV, "3")
+    assert parse_jobs(["targets", "--force"]) == 3
+    assert parse_jobs(["--jobs", "4"]) == 4
+
+    # Serial stages say they ignore the jobs instead of dropping them silently
+    capsys.readouterr()
+    warn_serial("significance")
+    warn_serial("daily_update", 1)
+    assert capsys.readouterr().out == "[WARN] significance runs serially, ignoring --jobs 3\n"